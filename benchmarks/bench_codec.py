@@ -0,0 +1,93 @@
+"""Micro-benchmark of the JSON codecs on large API pages and on request payloads (no network)
+
+Decodes pages of 100 workspaces (with their current run included) and of 100 runs, and
+encodes workspace and variable payloads with pydantic `.json()` and with each codec.
+
+Usage (from the repository root): python -m benchmarks.bench_codec [number_of_pages]
+"""
+
+import json
+import sys
+import timeit
+
+from tfc_client.codec import JSONCodec, OrjsonCodec, orjson
+from tfc_client.enums import VarCat
+from tfc_client.models.data import DataModel, RootModel
+from tfc_client.models.var import VarModel
+from tfc_client.models.workspace import VCSRepoModel, WorkspaceModel
+
+from .fake_tfc import FakeTFC
+
+
+def codecs():
+    return [JSONCodec()] + ([OrjsonCodec()] if orjson is not None else [])
+
+
+def pages():
+    fake = FakeTFC(workspaces=100, runs=1, variables=0)
+    query = {"page[size]": ["100"]}
+    workspaces = fake.page(
+        dict(query, include=["current_run"]), 100, fake.workspace_resource
+    )
+    runs = fake.page(query, 100, lambda index: fake.run_resource(fake.run_id(index, 0)))
+    return {
+        "workspaces page": json.dumps(workspaces).encode("utf-8"),
+        "runs page": json.dumps(runs).encode("utf-8"),
+    }
+
+
+def payloads():
+    return {
+        "workspace payload": RootModel(
+            data=DataModel(
+                type="workspaces",
+                attributes=WorkspaceModel(
+                    name="my-workspace",
+                    auto_apply=True,
+                    terraform_version="0.12.29",
+                    vcs_repo=VCSRepoModel(
+                        identifier="my-org/my-repo", oauth_token_id="ot-123"
+                    ),
+                ),
+            )
+        ),
+        "var payload": RootModel(
+            data=DataModel(
+                type="vars",
+                attributes=VarModel(
+                    key="AWS_REGION", value="eu-west-1", category=VarCat.env
+                ),
+            )
+        ),
+    }
+
+
+def measure(function, number):
+    return min(timeit.repeat(function, number=number, repeat=3)) / number
+
+
+def bench(number=200):
+    results = {}
+    for name, content in pages().items():
+        for codec in codecs():
+            duration = measure(lambda: codec.loads(content), number)
+            results[f"decode-{name.split()[0]}-page-{codec.name}-mb-per-second"] = (
+                len(content) / 1e6 / duration
+            )
+    for name, payload in payloads().items():
+        kind = name.split()[0]
+        results[f"encode-{kind}-pydantic-us"] = measure(payload.json, number * 10) * 1e6
+        for codec in codecs():
+            results[f"encode-{kind}-{codec.name}-us"] = (
+                measure(lambda: codec.encode(payload), number * 10) * 1e6
+            )
+    return results
+
+
+def main(number=200):
+    for metric, value in bench(number).items():
+        print(f"{metric:48} {value:10.2f}")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,92 @@
+"""Micro-benchmark of the type dispatch of TFCClient.factory and of the model of
+the objects built from API data (no network)
+
+Usage (from the repository root): python -m benchmarks.bench_factory [number_of_objects]
+"""
+
+import importlib
+import sys
+import timeit
+
+from tfc_client import TFCClient
+from tfc_client.models.workspace import WorkspaceModel
+from tfc_client.tfc_object import TFCObject
+from tfc_client.util import InflectionStr
+
+from .fake_tfc import FakeTFC
+
+
+def legacy_resolution(object_type):
+    """Type dispatch as done before the TypeRegistry: 3 inflections + imports per object"""
+    class_name = "TFC{}".format(
+        InflectionStr(object_type).singularize.underscore.camelize
+    )
+    getattr(importlib.import_module(TFCClient.OBJECTS_MODULE), class_name, TFCObject)
+    model_class_name = "{}Model".format(
+        InflectionStr(object_type).underscore.singularize.camelize
+    )
+    getattr(importlib.import_module(TFCObject.MODELS_MODULE), model_class_name, None)
+
+
+def registry_resolution(object_type):
+    TFCClient.object_classes.get(object_type)
+    TFCObject.model_classes.get(object_type)
+
+
+def workspace_data(index):
+    return {
+        "id": f"ws-{index}",
+        "type": "workspaces",
+        "attributes": {"name": f"workspace-{index}", "locked": False},
+        "relationships": {
+            "organization": {"data": {"id": "my-org", "type": "organizations"}}
+        },
+    }
+
+
+def model_timings(client, data):
+    """us/object to read a datetime field of objects built from API data: with a
+    validated model (as before the trusted models) and with the trusted model
+    """
+    validated = timeit.timeit(
+        lambda: [
+            WorkspaceModel(**client.factory(item).attributes).created_at
+            for item in data
+        ],
+        number=1,
+    )
+    trusted = timeit.timeit(
+        lambda: [client.factory(item).created_at for item in data], number=1
+    )
+    return validated / len(data) * 1e6, trusted / len(data) * 1e6
+
+
+def main(number=20000):
+    types = ["workspaces", "runs", "vars", "organizations", "plans", "ssh-keys"]
+    for name, resolution in [
+        ("legacy", legacy_resolution),
+        ("registry", registry_resolution),
+    ]:
+        duration = timeit.timeit(
+            lambda: [resolution(object_type) for object_type in types], number=number
+        )
+        print(
+            f"type dispatch ({name}): {duration / (number * len(types)) * 1e6:.2f} us/object"
+        )
+
+    client = TFCClient(token="token")
+    data = [workspace_data(index) for index in range(number)]
+    duration = timeit.timeit(lambda: [client.factory(item) for item in data], number=1)
+    print(
+        f"factory (workspace + organization stub): {duration / number * 1e6:.2f} us/object"
+    )
+
+    fake = FakeTFC(workspaces=number, runs=1, variables=0)
+    data = [fake.workspace_resource(index) for index in range(number)]
+    validated, trusted = model_timings(client, data)
+    print(f"factory + created_at (validated model): {validated:.2f} us/object")
+    print(f"factory + created_at (trusted model): {trusted:.2f} us/object")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,87 @@
+"""Memory used by TFC objects on top of the decoded JSON, measured with tracemalloc (no network)
+
+Usage (from the repository root): python -m benchmarks.bench_memory [number_of_objects]
+"""
+
+import copy
+import gc
+import sys
+import tracemalloc
+
+from tfc_client import TFCClient
+
+WORKSPACE_DATA = {
+    "id": "ws-SihZTyXKfNXUWuUa",
+    "type": "workspaces",
+    "attributes": {
+        "auto-apply": False,
+        "can-queue-destroy-plan": True,
+        "created-at": "2017-11-02T23:55:16.142Z",
+        "description": None,
+        "environment": "default",
+        "file-triggers-enabled": True,
+        "latest-change-at": "2017-11-02T23:55:16.142Z",
+        "locked": False,
+        "name": "workspace-1",
+        "permissions": {
+            "can-update": True,
+            "can-destroy": False,
+            "can-queue-destroy": False,
+            "can-queue-run": False,
+            "can-update-variable": False,
+            "can-lock": False,
+            "can-read-settings": True,
+        },
+        "queue-all-runs": False,
+        "source": "tfe-ui",
+        "source-name": None,
+        "source-url": None,
+        "terraform-version": "0.12.28",
+        "trigger-prefixes": [],
+        "vcs-repo": {
+            "identifier": "skierkowski/terraform-test-proj",
+            "branch": "",
+            "oauth-token-id": "ot-hmAyP66qk2AMVdbJ",
+            "ingress-submodules": False,
+        },
+        "working-directory": None,
+    },
+    "relationships": {
+        "organization": {"data": {"id": "my-organization", "type": "organizations"}},
+        "ssh-key": {"data": None},
+        "latest-run": {"data": {"id": "run-CZcmD7eagjhyX0vN", "type": "runs"}},
+    },
+    "links": {"self": "/api/v2/organizations/my-organization/workspaces/workspace-1"},
+}
+
+
+def workspace_data(index):
+    data = copy.deepcopy(WORKSPACE_DATA)
+    data["id"] = f"ws-{index:016d}"
+    data["attributes"]["name"] = f"workspace-{index}"
+    return data
+
+
+def measure(number, typed_access):
+    client = TFCClient(token="token")
+    pages = [workspace_data(index) for index in range(number)]
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    workspaces = [client.factory(data) for data in pages]
+    if typed_access:
+        for workspace in workspaces:
+            workspace.created_at
+    gc.collect()
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (end - start) / number
+
+
+def main(number=10000):
+    print(f"bytes per workspace (attributes untouched): {measure(number, False):.0f}")
+    print(f"bytes per workspace (typed access):         {measure(number, True):.0f}")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,183 @@
+"""Benchmark suite of the client against the local fake TFC API (no network)
+
+Measures the pagination throughput, the cost of factory() and the memory by object,
+the number of requests to wait for runs, the log processing throughput, the
+handling of throttled calls and the JSON codecs. Results can be saved and compared between commits:
+
+    python -m benchmarks.bench_suite --json before.json
+    (change the client)
+    python -m benchmarks.bench_suite --compare before.json
+
+Usage (from the repository root): python -m benchmarks.bench_suite [--quick] [--json FILE] [--compare FILE]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+import timeit
+
+from tfc_client import TFCClient
+from tfc_client.plan_log import PlanLogSummary
+from tfc_client.util import ANSI_ESCAPE
+
+from .bench_codec import bench as codec_bench
+from .bench_factory import model_timings, workspace_data
+from .bench_memory import measure
+from .fake_tfc import FakeTFC, FakeTFCServer
+
+
+def bench_pagination(scale):
+    results = {}
+    fake = FakeTFC(workspaces=500 * scale, runs=1, variables=0)
+    with FakeTFCServer(fake, latency=0.005) as server:
+        for page_workers in (0, 4):
+            client = TFCClient(
+                "token", url=server.url, rate_limit=None, page_workers=page_workers
+            )
+            organization = client.get("organization", id=fake.organization)
+            start = time.perf_counter()
+            count = sum(1 for _ in organization.workspaces)
+            duration = time.perf_counter() - start
+            results[f"workspaces-per-second-{page_workers}-workers"] = count / duration
+            client.close()
+    return results
+
+
+def bench_factory(scale):
+    number = 10000 * scale
+    client = TFCClient("token")
+    data = [workspace_data(index) for index in range(number)]
+    duration = timeit.timeit(lambda: [client.factory(item) for item in data], number=1)
+    fake = FakeTFC(workspaces=number, runs=1, variables=0)
+    validated, trusted = model_timings(
+        client, [fake.workspace_resource(index) for index in range(number)]
+    )
+    return {
+        "factory-us-per-object": duration / number * 1e6,
+        "model-validated-us-per-object": validated,
+        "model-trusted-us-per-object": trusted,
+        "bytes-per-workspace": measure(number, False),
+        "bytes-per-workspace-typed": measure(number, True),
+    }
+
+
+def bench_wait_runs(scale):
+    results = {}
+    # Waiting for 4 runs in each workspace, then for the current run of each workspace
+    for runs_per_workspace, workspaces in ((4, 5 * scale), (1, 20 * scale)):
+        suffix = "" if runs_per_workspace > 1 else "-one-per-workspace"
+        for name in ("wait-plan", "run-waiter"):
+            fake = FakeTFC(
+                workspaces=workspaces,
+                runs=runs_per_workspace,
+                variables=0,
+                plan_duration=1.0,
+            )
+            with FakeTFCServer(fake) as server:
+                client = TFCClient("token", url=server.url, rate_limit=None)
+                runs = [
+                    client.factory(fake.run_resource(fake.run_id(ws_index, run_index)))
+                    for ws_index in range(workspaces)
+                    for run_index in range(runs_per_workspace)
+                ]
+                server.reset_counts()
+                start = time.perf_counter()
+                if name == "wait-plan":
+                    with ThreadPoolExecutor(max_workers=len(runs)) as executor:
+                        list(
+                            executor.map(
+                                lambda run: run.wait_plan(sleep_time=0.25), runs
+                            )
+                        )
+                else:
+                    client.wait_runs(
+                        runs, sleep_time=0.25, organization=fake.organization
+                    ).wait()
+                results[f"{name}{suffix}-requests"] = server.request_count
+                results[f"{name}{suffix}-seconds"] = time.perf_counter() - start
+                client.close()
+    return results
+
+
+def bench_logs(scale):
+    fake = FakeTFC(
+        workspaces=1, runs=1, variables=0, plan_duration=0, log_lines=5000 * scale
+    )
+    log = fake.plan_log("plan-00000000-0").decode()[1:-1]
+    megabytes = len(log) / 1e6
+    lines = ANSI_ESCAPE.sub("", log).splitlines()
+    duration = timeit.timeit(lambda: PlanLogSummary.parse(lines), number=5) / 5
+    results = {"plan-log-summary-mb-per-second": megabytes / duration}
+    with FakeTFCServer(fake) as server:
+        client = TFCClient("token", url=server.url, rate_limit=None)
+        plan = client.get("plan", id="plan-00000000-0")
+        start = time.perf_counter()
+        sum(1 for _ in plan.tail_log(sleep_time=0))
+        results["tail-log-mb-per-second"] = megabytes / (time.perf_counter() - start)
+        client.close()
+    return results
+
+
+def bench_throttled(scale):
+    fake = FakeTFC(workspaces=200 * scale, runs=1, variables=0)
+    with FakeTFCServer(fake, throttle_every=5) as server:
+        # Small pages: enough calls to be throttled
+        client = TFCClient("token", url=server.url, rate_limit=100, page_size=20)
+        organization = client.get("organization", id=fake.organization)
+        start = time.perf_counter()
+        count = sum(1 for _ in organization.workspaces)
+        duration = time.perf_counter() - start
+        stats = client.stats()["endpoints"]
+        client.close()
+    return {
+        "throttled-workspaces-per-second": count / duration,
+        "throttled-retries": sum(endpoint["retries"] for endpoint in stats.values()),
+    }
+
+
+def bench_codec(scale):
+    return codec_bench(number=50 * scale)
+
+
+BENCHMARKS = [
+    bench_pagination,
+    bench_factory,
+    bench_wait_runs,
+    bench_logs,
+    bench_throttled,
+    bench_codec,
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller data sets")
+    parser.add_argument("--json", help="save the results in this file")
+    parser.add_argument("--compare", help="compare with the results saved in this file")
+    args = parser.parse_args()
+
+    scale = 1 if args.quick else 4
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = {}
+    for benchmark in BENCHMARKS:
+        for metric, value in benchmark(scale).items():
+            results[metric] = value
+            line = f"{metric:40} {value:14.2f}"
+            if metric in baseline and baseline[metric]:
+                line += (
+                    f"   x{value / baseline[metric]:.2f} (was {baseline[metric]:.2f})"
+                )
+            print(line, flush=True)
+
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
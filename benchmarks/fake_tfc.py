@@ -0,0 +1,421 @@
+"""Local fake of the TFC API (JSON:API), to run the benchmarks offline
+
+It serves generated organizations, workspaces, runs, plans (with their logs) and
+vars, with pagination, includes, an optional latency on each request and optional
+throttled (429) responses.
+
+Usage (from the repository root): python -m benchmarks.fake_tfc [port]
+"""
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+MAX_PAGE_SIZE = 100
+
+
+class FakeTFC(object):
+    """Generated data of the fake API
+
+    :param workspaces: Number of workspaces of the organization
+    :param runs: Number of runs by workspace
+    :param variables: Number of vars by workspace
+    :param plan_duration: Mean time in seconds for a run to reach "planned" (from the server start)
+    :param log_lines: Number of resources in each plan log
+    """
+
+    def __init__(
+        self,
+        organization="my-org",
+        workspaces=100,
+        runs=3,
+        variables=10,
+        plan_duration=1.0,
+        log_lines=200,
+    ):
+        self.organization = organization
+        self.workspace_count = workspaces
+        self.run_count = runs
+        self.log_lines = log_lines
+        self.url = ""
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        random_generator = random.Random(42)
+        # Run id -> delay after which it is planned
+        self._plan_delays = {
+            self.run_id(ws_index, run_index): random_generator.uniform(0.5, 1.5)
+            * plan_duration
+            for ws_index in range(workspaces)
+            for run_index in range(runs)
+        }
+        self._vars = {}
+        for ws_index in range(workspaces):
+            for var_index in range(variables):
+                var_id = f"var-{ws_index:08d}-{var_index}"
+                self._vars[var_id] = {
+                    "workspace": self.workspace_id(ws_index),
+                    "attributes": {
+                        "key": f"var_{var_index}",
+                        "value": f"value-{var_index}",
+                        "category": "terraform",
+                        "hcl": False,
+                        "sensitive": False,
+                    },
+                }
+        self._next_var = 0
+
+    # Ids
+
+    @staticmethod
+    def workspace_id(ws_index):
+        return f"ws-{ws_index:08d}"
+
+    @staticmethod
+    def run_id(ws_index, run_index):
+        return f"run-{ws_index:08d}-{run_index}"
+
+    @staticmethod
+    def _indexes(object_id):
+        return [int(part) for part in object_id.split("-")[1:]]
+
+    # Resources
+
+    def organization_resource(self):
+        return {
+            "id": self.organization,
+            "type": "organizations",
+            "attributes": {"name": self.organization, "email": "admin@example.com"},
+            "links": {"self": f"/api/v2/organizations/{self.organization}"},
+        }
+
+    def workspace_resource(self, ws_index):
+        return {
+            "id": self.workspace_id(ws_index),
+            "type": "workspaces",
+            "attributes": {
+                "name": f"workspace-{ws_index}",
+                "auto-apply": False,
+                "locked": False,
+                "terraform-version": "0.12.29",
+                "working-directory": None,
+                "created-at": "2020-01-01T00:00:00.000Z",
+            },
+            "relationships": {
+                "organization": {
+                    "data": {"id": self.organization, "type": "organizations"}
+                },
+                "current-run": {
+                    "data": (
+                        {"id": self.run_id(ws_index, 0), "type": "runs"}
+                        if self.run_count
+                        else None
+                    )
+                },
+            },
+            "links": {"self": f"/api/v2/workspaces/{self.workspace_id(ws_index)}"},
+        }
+
+    def run_status(self, run_id):
+        delay = self._plan_delays.get(run_id, 0)
+        return "planned" if time.monotonic() - self._started_at >= delay else "planning"
+
+    def run_resource(self, run_id):
+        ws_index, _ = self._indexes(run_id)
+        return {
+            "id": run_id,
+            "type": "runs",
+            "attributes": {
+                "status": self.run_status(run_id),
+                "message": "Queued by the benchmarks",
+                "is-destroy": False,
+                "created-at": "2020-01-01T00:00:00.000Z",
+            },
+            "relationships": {
+                "workspace": {
+                    "data": {"id": self.workspace_id(ws_index), "type": "workspaces"}
+                },
+                "plan": {"data": {"id": "plan" + run_id[3:], "type": "plans"}},
+            },
+            "links": {"self": f"/api/v2/runs/{run_id}"},
+        }
+
+    def plan_resource(self, plan_id):
+        status = self.run_status("run" + plan_id[4:])
+        return {
+            "id": plan_id,
+            "type": "plans",
+            "attributes": {
+                "status": "finished" if status == "planned" else "running",
+                "log-read-url": f"{self.url}/logs/{plan_id}",
+            },
+        }
+
+    def var_resource(self, var_id):
+        var = self._vars[var_id]
+        return {
+            "id": var_id,
+            "type": "vars",
+            "attributes": dict(var["attributes"]),
+            "relationships": {
+                "configurable": {"data": {"id": var["workspace"], "type": "workspaces"}}
+            },
+        }
+
+    def plan_log(self, plan_id):
+        lines = [
+            "\x02Terraform v0.12.29",
+            "",
+            "Terraform will perform the following actions:",
+            "",
+        ]
+        for index in range(self.log_lines):
+            lines += [
+                f"  # null_resource.resource_{index} will be created",
+                f'  + resource "null_resource" "resource_{index}" {{',
+                "      \x1b[32m+\x1b[0m id = (known after apply)",
+                "    }",
+                "",
+            ]
+        lines.append(f"Plan: {self.log_lines} to add, 0 to change, 0 to destroy.\x03")
+        return "\n".join(lines).encode("utf-8")
+
+    # Endpoints
+
+    def included(self, resources, include):
+        included = {}
+        for name in include:
+            relationship = name.replace("_", "-")
+            for resource in resources:
+                data = (
+                    resource.get("relationships", {}).get(relationship, {}).get("data")
+                )
+                if not data:
+                    continue
+                builder = {
+                    "organizations": lambda id: self.organization_resource(),
+                    "runs": self.run_resource,
+                    "plans": self.plan_resource,
+                    "workspaces": lambda id: self.workspace_resource(
+                        self._indexes(id)[0]
+                    ),
+                }.get(data["type"])
+                if builder:
+                    included[(data["type"], data["id"])] = builder(data["id"])
+        return list(included.values())
+
+    def page(self, query, count, build):
+        number = int(query.get("page[number]", ["1"])[0])
+        size = min(int(query.get("page[size]", ["20"])[0]), MAX_PAGE_SIZE)
+        total_pages = max((count + size - 1) // size, 1)
+        start = (number - 1) * size
+        data = [build(index) for index in range(start, min(start + size, count))]
+        body = {
+            "data": data,
+            "meta": {
+                "pagination": {
+                    "current-page": number,
+                    "prev-page": number - 1 if number > 1 else None,
+                    "next-page": number + 1 if number < total_pages else None,
+                    "total-pages": total_pages,
+                    "total-count": count,
+                }
+            },
+        }
+        include = query.get("include", [""])[0]
+        if include:
+            body["included"] = self.included(data, include.split(","))
+        return body
+
+    def handle(self, method, path, query, body):
+        """:return: (status, body) of a request on the API (body as JSON or bytes)"""
+        org_workspaces = f"organizations/{self.organization}/workspaces"
+        if method == "GET":
+            if path == "ping":
+                return 204, None
+            if path == "organizations":
+                return 200, {"data": [self.organization_resource()]}
+            if path == f"organizations/{self.organization}":
+                return 200, {"data": self.organization_resource()}
+            if path == org_workspaces:
+                return 200, self.page(
+                    query, self.workspace_count, self.workspace_resource
+                )
+            match = re.fullmatch(rf"{org_workspaces}/workspace-(\d+)", path)
+            if match and int(match[1]) < self.workspace_count:
+                return 200, {"data": self.workspace_resource(int(match[1]))}
+            match = re.fullmatch(r"workspaces/ws-(\d+)(/runs)?", path)
+            if match and int(match[1]) < self.workspace_count:
+                ws_index = int(match[1])
+                if not match[2]:
+                    return 200, {"data": self.workspace_resource(ws_index)}
+                return 200, self.page(
+                    query,
+                    self.run_count,
+                    lambda run_index: self.run_resource(
+                        self.run_id(ws_index, run_index)
+                    ),
+                )
+            if re.fullmatch(r"runs/run-\d+-\d+", path):
+                resource = self.run_resource(path[5:])
+                body = {"data": resource}
+                if "include" in query:
+                    body["included"] = self.included(
+                        [resource], query["include"][0].split(",")
+                    )
+                return 200, body
+            if re.fullmatch(r"plans/plan-\d+-\d+", path):
+                return 200, {"data": self.plan_resource(path[6:])}
+            if path == "vars":
+                name = query.get("filter[workspace][name]", [None])[0]
+                ws_id = self.workspace_id(int(name.split("-")[1])) if name else None
+                with self._lock:
+                    var_ids = [
+                        var_id
+                        for var_id, var in self._vars.items()
+                        if ws_id is None or var["workspace"] == ws_id
+                    ]
+                return 200, {"data": [self.var_resource(var_id) for var_id in var_ids]}
+        if method == "POST" and path == "vars":
+            data = body["data"]
+            with self._lock:
+                self._next_var += 1
+                var_id = f"var-new-{self._next_var}"
+                self._vars[var_id] = {
+                    "workspace": data["relationships"]["workspace"]["data"]["id"],
+                    "attributes": data["attributes"],
+                }
+            return 201, {"data": self.var_resource(var_id)}
+        match = re.fullmatch(r"vars/(var-[\w-]+)", path)
+        if match and match[1] in self._vars:
+            with self._lock:
+                if method == "PATCH":
+                    self._vars[match[1]]["attributes"].update(
+                        body["data"]["attributes"]
+                    )
+                    return 200, {"data": self.var_resource(match[1])}
+                if method == "DELETE":
+                    del self._vars[match[1]]
+                    return 204, None
+        return 404, {"errors": [{"status": "404", "title": "not found"}]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeTFCServer"
+
+    def _handle(self, method):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        split = urlsplit(self.path)
+        path = split.path.strip("/")
+        api_path = path[len("api/v2/") :] if path.startswith("api/v2/") else path
+        with server.lock:
+            server.requests[method, re.sub(r"\d+", "N", api_path)] += 1
+            server.request_count += 1
+            throttled = (
+                server.throttle_every
+                and server.request_count % server.throttle_every == 0
+            )
+        headers = {}
+        if throttled:
+            status, content = 429, b""
+            headers["Retry-After"] = "0"
+        elif path.startswith("logs/"):
+            status, content = self._log(path[5:])
+        else:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            status, response = server.fake.handle(
+                method, api_path, parse_qs(split.query), body
+            )
+            content = json.dumps(response).encode() if response is not None else b""
+            headers["Content-Type"] = "application/vnd.api+json"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _log(self, plan_id):
+        log = self.server.fake.plan_log(plan_id)
+        match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range") or "")
+        if not match:
+            return 200, log
+        start = int(match[1])
+        if start >= len(log):
+            return 416, b""
+        return 206, log[start:]
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTFCServer(ThreadingHTTPServer):
+    """Serve a `FakeTFC` on a local port (in a thread, as a context manager)
+
+    :param fake: Data of the fake API. Default: FakeTFC()
+    :param latency: Delay in seconds added to each request. Default: 0
+    :param throttle_every: Answer 429 to every n-th request (0 to disable). Default: 0
+    """
+
+    daemon_threads = True
+
+    def __init__(self, fake=None, latency=0.0, throttle_every=0, port=0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.fake = fake or FakeTFC()
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.request_count = 0
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.fake.url = self.url
+        self._thread = None
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests.clear()
+            self.request_count = 0
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    with FakeTFCServer(port=port) as server:
+        print(
+            f"Fake TFC API on {server.url} (organization: {server.fake.organization})"
+        )
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -29,7 +29,9 @@ setuptools.setup(
     python_requires=">=3.7",
     extras_require={
         "dev": ["black", "twine", "wheel"],
-        "test": ["pytest", "coverage", "pytest-cov"],
+        "test": ["pytest", "coverage", "pytest-cov", "requests-mock"],
+        "async": ["aiohttp>=3.6"],
+        "fast": ["orjson"],
     },
     tests_require=["pytest", "pytest-cov"],
     install_requires=[
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+
+import tfc_client
+from tfc_client.enums import RunStatus
+
+
+def run_json(run_id, status):
+    return {
+        "data": {
+            "id": run_id,
+            "type": "runs",
+            "attributes": {"status": status, "message": "test"},
+            "relationships": {
+                "workspace": {"data": {"id": "ws-1", "type": "workspaces"}}
+            },
+        }
+    }
+
+
+async def serve(app):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+class TestAsyncTFCClient(object):
+    def test_wait_and_apply_runs(self):
+        status = {f"run-{i}": iter(["planning", "planned"]) for i in range(20)}
+        applied = set()
+
+        async def get_run(request):
+            run_id = request.match_info["id"]
+            if run_id in applied:
+                return web.json_response(run_json(run_id, "applied"))
+            return web.json_response(run_json(run_id, next(status[run_id], "planned")))
+
+        async def apply_run(request):
+            applied.add(request.match_info["id"])
+            return web.Response(status=202)
+
+        async def list_workspaces(request):
+            page = int(request.query["page[number]"])
+            data = [
+                {"id": f"ws-{page}-{i}", "type": "workspaces", "attributes": {}}
+                for i in range(2)
+            ]
+            meta = {"pagination": {"next-page": page + 1 if page < 3 else None}}
+            return web.json_response({"data": data, "meta": meta})
+
+        app = web.Application()
+        app.router.add_get("/api/v2/runs/{id}", get_run)
+        app.router.add_post("/api/v2/runs/{id}/actions/apply", apply_run)
+        app.router.add_get("/api/v2/organizations/org/workspaces", list_workspaces)
+
+        async def scenario():
+            runner, url = await serve(app)
+            try:
+                async with tfc_client.AsyncTFCClient(token="token", url=url) as tfc:
+                    runs = await asyncio.gather(
+                        *(tfc.get("run", id=run_id) for run_id in status)
+                    )
+                    results = await asyncio.gather(
+                        *(run.wait_plan(sleep_time=0.01) for run in runs)
+                    )
+                    assert all(results)
+                    assert await runs[0].do_apply(comment="Apply !")
+                    assert RunStatus(runs[0].status) == RunStatus.applied
+                    # Relationships are stubs until explicitly fetched
+                    with pytest.raises(tfc_client.exception.TFCObjectException):
+                        runs[0].workspace.name
+
+                    org = tfc.build({"id": "org", "type": "organizations"})
+                    ws_ids = [ws.id async for ws in org.workspaces]
+                    assert len(ws_ids) == 6
+            finally:
+                await runner.cleanup()
+
+        asyncio.run(scenario())
+
+    def test_throttled_calls_are_retried(self):
+        calls = []
+
+        async def list_workspaces(request):
+            calls.append(dict(request.query))
+            if len(calls) == 1:
+                return web.json_response(
+                    {"errors": []}, status=429, headers={"Retry-After": "0.1"}
+                )
+            data = [{"id": "ws-1", "type": "workspaces", "attributes": {}}]
+            return web.json_response({"data": data, "meta": {}})
+
+        app = web.Application()
+        app.router.add_get("/api/v2/organizations/org/workspaces", list_workspaces)
+
+        async def scenario():
+            runner, url = await serve(app)
+            try:
+                async with tfc_client.AsyncTFCClient(token="token", url=url) as tfc:
+                    org = tfc.build({"id": "org", "type": "organizations"})
+                    ws_ids = [ws.id async for ws in org.workspaces]
+                    assert ws_ids == ["ws-1"]
+                    # The throttled page is not used to tune the page size
+                    assert tfc._api.page_size_tuner.snapshot() == {}
+            finally:
+                await runner.cleanup()
+
+        asyncio.run(scenario())
+        assert len(calls) == 2
+        assert calls[1]["page[size]"] == "100"
@@ -1,12 +1,28 @@
 import pytest
 import datetime
+import hashlib
+import io
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
 from unittest.mock import patch, Mock, MagicMock
 from string import Template
 
+import pydantic
 import requests
 
 import tfc_client
 from tfc_client.models.workspace import VCSRepoModel
+from tfc_client.exception import APIException
+from tfc_client.instrumentation import NPlusOneDetector, NPlusOneWarning
+from tfc_client.notification_receiver import NotificationReceiver
+from tfc_client.response_cache import ResponseCache
+from tfc_client.api_caller import ValidatorCache
+from tfc_client.codec import JSONCodec, OrjsonCodec
+from tfc_client.exception import TransportException
+from tfc_client.transport import RecordingTransport, ReplayTransport, Transport
 
 
 def get_organization_json(org_id):
@@ -107,6 +123,24 @@ def get_workspace_json(name, org_id):
     return SAMPLE_WORKSPACE.substitute(name=name, org_id=org_id, ws_id=ws_id)
 
 
+def get_workspaces_page_json(page, total_pages, page_size=2, with_total=True):
+    data = [
+        {
+            "id": f"ws-{page}-{i}",
+            "type": "workspaces",
+            "attributes": {"name": f"workspace-{page}-{i}"},
+        }
+        for i in range(page_size)
+    ]
+    pagination = {
+        "current-page": page,
+        "next-page": page + 1 if page < total_pages else None,
+    }
+    if with_total:
+        pagination["total-pages"] = total_pages
+    return json.dumps({"data": data, "meta": {"pagination": pagination}})
+
+
 def register_requests_mock(requests_mock, method, url, text):
     getattr(requests_mock, method)(url, text=text)
 
@@ -126,6 +160,100 @@ class TestTFCClient(object):
         assert org.name == org_id
         assert isinstance(org.created_at, datetime.datetime)
 
+    @pytest.mark.parametrize("codec_class", [JSONCodec, OrjsonCodec])
+    def test_codec(self, requests_mock, codec_class):
+        if codec_class is OrjsonCodec:
+            pytest.importorskip("orjson")
+        codec = codec_class()
+        org_id = "hashicorp"
+        requests_mock.get(
+            f"/api/v2/organizations/{org_id}", text=get_organization_json(org_id=org_id)
+        )
+        requests_mock.post(
+            f"/api/v2/organizations/{org_id}/workspaces",
+            text=get_workspace_json("workspace1", org_id),
+        )
+        tfc = tfc_client.TFCClient(token="token", codec=codec)
+        assert tfc.codec is codec
+        org = tfc.get("organization", id=org_id)
+        assert isinstance(org.created_at, datetime.datetime)
+        vcs_repo = VCSRepoModel(identifier="github/repo", oauth_token_id="ot-1")
+        ws = org.create("workspace", name="workspace1", vcs_repo=vcs_repo)
+        assert ws.name == "workspace1"
+        # Same body as the pydantic JSON encoding
+        assert requests_mock.last_request.json() == {
+            "data": {
+                "type": "workspaces",
+                "attributes": {
+                    "name": "workspace1",
+                    "vcs-repo": {"identifier": "github/repo", "oauth-token-id": "ot-1"},
+                },
+                "relationships": None,
+            }
+        }
+
+    def test_trusted_model(self):
+        tfc = tfc_client.TFCClient(token="token")
+        run = tfc.factory(
+            {
+                "id": "run-1",
+                "type": "runs",
+                "attributes": {
+                    "status": "new-status",
+                    "created-at": "2020-01-01T00:00:00Z",
+                    "status-timestamps": {"planned-at": "2020-01-01T00:01:00Z"},
+                    "is-destroy": False,
+                },
+            }
+        )
+        assert run.is_destroy is False
+        assert run.created_at.year == 2020
+        # Parsed on first access only
+        assert run._unparsed == {"status", "status_timestamps"}
+        # Unknown to RunStatus: kept as sent by the API
+        assert run.status == "new-status"
+        assert isinstance(run.model.status_timestamps["planned-at"], datetime.datetime)
+        assert run._unparsed == set()
+
+        var = tfc.factory({"id": "var-1", "type": "vars", "attributes": {"key": "foo"}})
+        # The payloads sent to the API are still validated
+        with pytest.raises(pydantic.ValidationError):
+            var.modify(category="not-a-category")
+
+    def test_factory_dispatch(self):
+        tfc = tfc_client.TFCClient(token="token")
+        for object_type, class_name in [
+            ("workspaces", "TFCWorkspace"),
+            ("ssh-keys", "TFCSshKey"),
+            ("applies", "TFCApply"),
+            ("oauth-tokens", "TFCOauthToken"),
+            ("unknown-things", "TFCObject"),
+        ]:
+            tfc_object = tfc.factory({"id": "id-1", "type": object_type})
+            assert type(tfc_object).__name__ == class_name
+        var = tfc.factory({"id": "var-1", "type": "vars", "attributes": {"key": "foo"}})
+        assert var.model.key == "foo"
+
+    def test_identity_map(self, requests_mock):
+        org_id = "hashicorp"
+        requests_mock.get(
+            f"/api/v2/organizations/{org_id}", text=get_organization_json(org_id=org_id)
+        )
+        requests_mock.delete("/api/v2/workspaces/ws-workspace1")
+        tfc = tfc_client.TFCClient(token="token", identity_map=True)
+        workspaces = [
+            tfc.factory(json.loads(get_workspace_json(f"workspace{i}", org_id))["data"])
+            for i in range(5)
+        ]
+        assert len({id(ws.organization) for ws in workspaces}) == 1
+        assert all(ws.organization.name == org_id for ws in workspaces)
+        assert requests_mock.call_count == 1
+        assert tfc.get("organization", id=org_id) is workspaces[0].organization
+
+        workspaces[0].organization.delete(workspaces[1])
+        assert tfc.identity_map.get("workspaces", "ws-workspace1") is None
+        assert tfc.identity_map.get("workspaces", "ws-workspace2") is workspaces[2]
+
 
 class TestTFCOrganization(object):
     def test_create_workspace(self, requests_mock):
@@ -150,3 +278,971 @@ class TestTFCOrganization(object):
         )
         assert ws.name == ws_name
         assert isinstance(ws.created_at, datetime.datetime)
+
+    @pytest.mark.parametrize("with_total", [True, False])
+    @pytest.mark.parametrize("page_workers", [0, 3])
+    def test_workspaces_pages_in_order(self, requests_mock, page_workers, with_total):
+        org_id = "hashicorp"
+        total_pages = 7
+        requests_mock.get(
+            f"/api/v2/organizations/{org_id}/workspaces",
+            text=lambda request, context: get_workspaces_page_json(
+                int(request.qs["page[number]"][0]),
+                total_pages,
+                with_total=with_total,
+            ),
+        )
+        tfc = tfc_client.TFCClient(token="token", page_workers=page_workers)
+        org = tfc.factory({"id": org_id, "type": "organizations"})
+        names = [ws.name for ws in org.workspaces]
+        assert names == [
+            f"workspace-{page}-{i}"
+            for page in range(1, total_pages + 1)
+            for i in range(2)
+        ]
+        assert requests_mock.call_count == total_pages
+
+    def test_workspaces_by_name(self, requests_mock):
+        org_id = "hashicorp"
+        requests_mock.get(
+            f"/api/v2/organizations/{org_id}/workspaces",
+            text=lambda request, context: get_workspaces_page_json(
+                int(request.qs["page[number]"][0]), 3
+            ),
+        )
+        requests_mock.delete("/api/v2/workspaces/ws-2-0")
+        tfc = tfc_client.TFCClient(token="token", page_workers=0)
+        org = tfc.factory(
+            {"id": org_id, "type": "organizations", "attributes": {"name": org_id}}
+        )
+        names = [
+            "workspace-1-1",
+            "workspace-2-0",
+            "workspace-2-1",
+            "workspace-3-0",
+            "unknown",
+        ]
+        found = org.workspaces_by_name(names)
+        assert {name: ws.id for name, ws in found.items()} == {
+            "workspace-1-1": "ws-1-1",
+            "workspace-2-0": "ws-2-0",
+            "workspace-2-1": "ws-2-1",
+            "workspace-3-0": "ws-3-0",
+        }
+        assert requests_mock.call_count == 3
+        # Served by the index
+        assert org.workspace("workspace-2-1") is found["workspace-2-1"]
+        assert set(org.workspaces_by_name(names[:4])) == set(names[:4])
+        assert requests_mock.call_count == 3
+        org.delete(found["workspace-2-0"])
+        assert "workspace-2-0" not in org.attrs["workspace-ids"]
+
+    def test_count_and_meta(self, requests_mock):
+        org_id = "hashicorp"
+        meta = {
+            "pagination": {"current-page": 1, "total-pages": 42, "total-count": 42},
+            "status-counts": {"errored": 2, "applied": 40},
+        }
+        requests_mock.get(
+            f"/api/v2/organizations/{org_id}/workspaces",
+            json={"data": [], "meta": meta},
+        )
+        requests_mock.get(
+            "/api/v2/workspaces/ws-1/runs",
+            json={"data": [], "meta": {"pagination": {"total-count": 7}}},
+        )
+        tfc = tfc_client.TFCClient(token="token")
+        org = tfc.get("organization", id=org_id)
+        assert org.count("workspaces") == 42
+        assert org.pagination["total-count"] == 42
+        assert org.status_counts["errored"] == 2
+        # One metadata-only request shared by the count, the pagination and the status counts
+        assert requests_mock.call_count == 1
+        assert requests_mock.request_history[0].qs["page[size]"] == ["1"]
+
+        org.count("workspaces", filters={"current-run": {"status": "errored"}})
+        assert requests_mock.call_count == 2
+        assert "filter[current-run][status]" in requests_mock.request_history[1].qs
+        org.count("workspaces", max_age=0)
+        assert requests_mock.call_count == 3
+
+        ws = tfc.factory({"id": "ws-1", "type": "workspaces"})
+        assert ws.pagination["total-count"] == 7
+        assert requests_mock.last_request.path == "/api/v2/workspaces/ws-1/runs"
+
+    def test_listing_meta_expires(self, requests_mock):
+        org_id = "hashicorp"
+        counts = iter([1, 2, 3])
+
+        def list_workspaces(request, context):
+            count = next(counts)
+            return {
+                "data": [],
+                "meta": {
+                    "pagination": {"total-count": count},
+                    "status-counts": {"applied": count},
+                },
+            }
+
+        requests_mock.get(
+            f"/api/v2/organizations/{org_id}/workspaces", json=list_workspaces
+        )
+        requests_mock.delete("/api/v2/workspaces/ws-1")
+        tfc = tfc_client.TFCClient(token="token")
+        org = tfc.factory(
+            {"id": org_id, "type": "organizations", "attributes": {"name": org_id}}
+        )
+        list(org.workspaces)
+        assert org.pagination["total-count"] == org.status_counts["applied"] == 1
+        # The values of a listing expire like the other meta
+        later = time.monotonic() + org.meta_ttl
+        with patch("tfc_client.tfc_objects.time") as fake_time:
+            fake_time.monotonic.return_value = later
+            assert org.pagination["total-count"] == 2
+        # And are read again after a delete
+        org.delete(tfc.factory({"id": "ws-1", "type": "workspaces"}))
+        assert org.status_counts["applied"] == 3
+
+    def test_workspaces_search_include(self, requests_mock):
+        org_id = "hashicorp"
+
+        def ws_data(i):
+            return {
+                "id": f"ws-{i}",
+                "type": "workspaces",
+                "attributes": {"name": f"workspace{i}"},
+                "relationships": {
+                    "organization": {"data": {"id": org_id, "type": "organizations"}},
+                    "current-run": {"data": {"id": f"run-{i}", "type": "runs"}},
+                    "latest-runs": {
+                        "data": [
+                            {"id": f"run-{i}", "type": "runs"},
+                            {"id": "run-old", "type": "runs"},
+                        ]
+                    },
+                },
+            }
+
+        requests_mock.get(
+            f"/api/v2/organizations/{org_id}/workspaces",
+            text=json.dumps(
+                {
+                    "data": [ws_data(1), ws_data(2)],
+                    "included": [
+                        {
+                            "id": "run-1",
+                            "type": "runs",
+                            "attributes": {"status": "applied"},
+                        },
+                        {
+                            "id": "run-2",
+                            "type": "runs",
+                            "attributes": {"status": "errored"},
+                        },
+                        {
+                            "id": org_id,
+                            "type": "organizations",
+                            "attributes": {"name": org_id},
+                        },
+                    ],
+                }
+            ),
+        )
+        tfc = tfc_client.TFCClient(token="token")
+        org = tfc.factory(
+            {"id": org_id, "type": "organizations", "attributes": {"name": org_id}}
+        )
+        workspaces = list(org.workspaces_search(include="current-run, organization"))
+        assert requests_mock.last_request.qs["include"] == ["current_run,organization"]
+        assert [ws.current_run.status for ws in workspaces] == ["applied", "errored"]
+        assert workspaces[0].organization.name == org_id
+        latest_runs = workspaces[1].relationships["latest-runs"]
+        assert latest_runs[0].status == "errored"
+        assert "attributes" not in latest_runs[1].attrs
+        assert requests_mock.call_count == 1
+
+    def test_export_workspaces(self, requests_mock):
+        org_id = "hashicorp"
+        requests_mock.get(
+            f"/api/v2/organizations/{org_id}/workspaces",
+            text=json.dumps(
+                {
+                    "data": [
+                        {
+                            "id": f"ws-{i}",
+                            "type": "workspaces",
+                            "attributes": {
+                                "name": f"workspace{i}",
+                                "vcs-repo": {"identifier": f"org/repo{i}"},
+                            },
+                            "relationships": {
+                                "current-run": {
+                                    "data": {"id": f"run-{i}", "type": "runs"}
+                                }
+                            },
+                        }
+                        for i in range(2)
+                    ],
+                    "included": [
+                        {
+                            "id": "run-0",
+                            "type": "runs",
+                            "attributes": {"status": "applied"},
+                        }
+                    ],
+                }
+            ),
+        )
+        tfc = tfc_client.TFCClient(token="token")
+        org = tfc.factory({"id": org_id, "type": "organizations"})
+        exporter = org.export_workspaces(
+            {
+                "name": "name",
+                "repo": "vcs_repo.identifier",
+                "run": "current_run.status",
+            },
+            include="current-run",
+        )
+        output = io.StringIO()
+        assert exporter.to_ndjson(output) == 2
+        assert [json.loads(line) for line in output.getvalue().splitlines()] == [
+            {"name": "workspace0", "repo": "org/repo0", "run": "applied"},
+            {"name": "workspace1", "repo": "org/repo1", "run": None},
+        ]
+        assert requests_mock.last_request.qs["page[size]"] == ["100"]
+        output = io.StringIO()
+        exporter.to_csv(output)
+        assert output.getvalue().splitlines() == [
+            "name,repo,run",
+            "workspace0,org/repo0,applied",
+            "workspace1,org/repo1,",
+        ]
+
+
+class TestTFCWorkspace(object):
+    def test_sync_vars(self, requests_mock):
+        def var_data(id, key, value, sensitive=False):
+            return {
+                "id": id,
+                "type": "vars",
+                "attributes": {
+                    "key": key,
+                    "value": None if sensitive else value,
+                    "category": "terraform",
+                    "hcl": False,
+                    "sensitive": sensitive,
+                },
+            }
+
+        requests_mock.get(
+            "/api/v2/vars",
+            text=json.dumps(
+                {
+                    "data": [
+                        var_data("var-same", "same", "1"),
+                        var_data("var-changed", "changed", "old"),
+                        var_data("var-secret", "secret", "s3cr3t", sensitive=True),
+                        var_data("var-gone", "gone", "x"),
+                    ]
+                }
+            ),
+        )
+        requests_mock.post(
+            "/api/v2/vars", text=json.dumps({"data": var_data("var-new", "new", "2")})
+        )
+        requests_mock.patch(
+            "/api/v2/vars/var-changed",
+            text=json.dumps({"data": var_data("var-changed", "changed", "new")}),
+        )
+        requests_mock.delete("/api/v2/vars/var-gone")
+        tfc = tfc_client.TFCClient(token="token")
+        ws = tfc.factory(
+            json.loads(get_workspace_json("workspace1", "hashicorp"))["data"]
+        )
+        report = ws.sync_vars(
+            [
+                {"key": "same", "value": "1"},
+                {"key": "changed", "value": "new"},
+                {"key": "secret", "value": "s3cr3t", "sensitive": True},
+                {"key": "new", "value": "2"},
+            ],
+            update_sensitive=False,
+        )
+        assert [var.id for var in report.created] == ["var-new"]
+        assert [var.id for var in report.updated] == ["var-changed"]
+        assert [var.id for var in report.deleted] == ["var-gone"]
+        assert {var.id for var in report.unchanged} == {"var-same", "var-secret"}
+        # Objects are built from the responses: no other call
+        assert report.updated[0].value == "new"
+        assert sorted(request.method for request in requests_mock.request_history) == [
+            "DELETE",
+            "GET",
+            "PATCH",
+            "POST",
+        ]
+
+    def test_runs_include(self, requests_mock):
+        def run_data(i):
+            return {
+                "id": f"run-{i}",
+                "type": "runs",
+                "attributes": {"status": "planned"},
+                "relationships": {
+                    "plan": {"data": {"id": f"plan-{i}", "type": "plans"}},
+                    "apply": {"data": {"id": f"apply-{i}", "type": "applies"}},
+                },
+            }
+
+        included = [
+            {"id": f"plan-{i}", "type": "plans", "attributes": {"status": "finished"}}
+            for i in range(3)
+        ]
+        requests_mock.get(
+            "/api/v2/workspaces/ws-1/runs",
+            text=json.dumps(
+                {"data": [run_data(i) for i in range(3)], "included": included}
+            ),
+        )
+        requests_mock.get(
+            "/api/v2/runs/run-0",
+            text=json.dumps({"data": run_data(0), "included": included[:1]}),
+        )
+        tfc = tfc_client.TFCClient(token="token")
+        ws = tfc.factory({"id": "ws-1", "type": "workspaces"})
+        runs = list(ws.get_list("runs", include="plan"))
+        assert requests_mock.last_request.qs["include"] == ["plan"]
+        assert [run.plan.status for run in runs] == ["finished"] * 3
+        run = tfc.get("run", id="run-0", include=["plan", "apply"])
+        assert requests_mock.last_request.qs["include"] == ["plan,apply"]
+        assert run.plan.status == "finished"
+        assert requests_mock.call_count == 2
+
+
+class TestAPICaller(object):
+    def test_session_reused(self, requests_mock):
+        org_id = "hashicorp"
+        requests_mock.get(
+            f"/api/v2/organizations/{org_id}", text=get_organization_json(org_id=org_id)
+        )
+        requests_mock.get("https://archivist.example/log", text="\x02log\x03")
+        tfc = tfc_client.TFCClient(token="token", timeout=(3.05, 27))
+        session = tfc._api._session
+        org = tfc.get("organization", id=org_id)
+        assert org.name == org_id
+        assert tfc._api.get_raw(path="https://archivist.example/log") == "\x02log\x03"
+        assert tfc._api._session is session
+        assert requests_mock.request_history[0].timeout == (3.05, 27)
+        assert "Authorization" in requests_mock.request_history[0].headers
+        # Pre-signed raw URLs must never receive the API token
+        assert "Authorization" not in requests_mock.request_history[1].headers
+
+    def test_retry_throttled_calls(self, requests_mock):
+        org_id = "hashicorp"
+        requests_mock.get(
+            f"/api/v2/organizations/{org_id}",
+            [
+                {"status_code": 429, "headers": {"Retry-After": "0"}},
+                {"status_code": 503},
+                {
+                    "text": get_organization_json(org_id=org_id),
+                    "headers": {
+                        "X-RateLimit-Limit": "30",
+                        "X-RateLimit-Remaining": "29",
+                        "X-RateLimit-Reset": "0.033",
+                    },
+                },
+            ],
+        )
+        requests_mock.post(
+            f"/api/v2/organizations/{org_id}/workspaces", status_code=503
+        )
+        tfc = tfc_client.TFCClient(token="token")
+        tfc.rate_limiter.backoff_base = 0.01
+        org = tfc.get("organization", id=org_id)
+        assert org.name == org_id
+        assert requests_mock.call_count == 3
+        assert tfc.rate_limiter.budget["remaining"] == 29
+        # A failed POST may have been processed: it is never sent again
+        with pytest.raises(tfc_client.exception.APIException):
+            org.create("workspace", name="workspace1")
+        assert requests_mock.call_count == 4
+
+    def test_conditional_get(self, requests_mock):
+        org_id = "hashicorp"
+
+        def get_organization(request, context):
+            if request.headers.get("If-None-Match") == '"v1"':
+                context.status_code = 304
+                return ""
+            context.headers["ETag"] = '"v1"'
+            return get_organization_json(org_id=org_id)
+
+        requests_mock.get(f"/api/v2/organizations/{org_id}", text=get_organization)
+        tfc = tfc_client.TFCClient(token="token")
+        org = tfc.get("organization", id=org_id)
+        assert org.name == org_id
+        org.refresh()
+        assert org.name == org_id
+        assert isinstance(org.created_at, datetime.datetime)
+        assert [
+            r.headers.get("If-None-Match") for r in requests_mock.request_history
+        ] == [
+            None,
+            '"v1"',
+        ]
+
+    def test_conditional_cache_bytes(self):
+        cache = ValidatorCache(max_size=10, max_bytes=100)
+
+        def response(size):
+            return Mock(headers={"ETag": '"v1"'}, content=b"x" * size)
+
+        cache.store("/a", None, response(60))
+        cache.store("/b", None, response(30))
+        # Too big to be kept at all
+        cache.store("/c", None, response(101))
+        assert cache.body("/c", None) is None
+        assert cache.size == 90
+        # The least recently used body is dropped to make room
+        cache.store("/d", None, response(40))
+        assert cache.body("/a", None) is None
+        assert cache.body("/b", None) is not None
+        assert cache.size == 70
+
+    def test_response_cache(self, requests_mock, tmp_path):
+        org_id = "hashicorp"
+        requests_mock.get(
+            f"/api/v2/organizations/{org_id}", text=get_organization_json(org_id=org_id)
+        )
+        requests_mock.patch(
+            f"/api/v2/organizations/{org_id}", text=get_organization_json(org_id=org_id)
+        )
+        cache = ResponseCache(
+            str(tmp_path / "cache.sqlite"), ttl_policies={"runs/*": 0}
+        )
+        for _ in range(2):
+            # Like two cron jobs sharing the cache
+            tfc = tfc_client.TFCClient(token="token", response_cache=cache)
+            org = tfc.get("organization", id=org_id)
+            assert org.name == org_id
+        assert requests_mock.call_count == 1
+
+        org.modify(email="admin@example.com")
+        assert org.name == org_id
+        assert [r.method for r in requests_mock.request_history] == [
+            "GET",
+            "PATCH",
+            "GET",
+        ]
+
+        other_token = tfc_client.TFCClient(token="other", response_cache=cache)
+        assert other_token.get("organization", id=org_id).name == org_id
+        assert requests_mock.call_count == 4
+
+    def test_response_cache_skips_polls(self, requests_mock, tmp_path):
+        run_json = json.dumps(
+            {
+                "data": {
+                    "id": "run-1",
+                    "type": "runs",
+                    "attributes": {"status": "planning"},
+                }
+            }
+        )
+        requests_mock.get("/api/v2/runs/run-1", text=run_json)
+        requests_mock.get(
+            "/api/v2/organizations/org/workspaces", text=json.dumps({"data": []})
+        )
+        cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+        tfc = tfc_client.TFCClient(token="token", response_cache=cache)
+        for _ in range(2):
+            tfc._api.get(path="runs/run-1")
+            tfc._api.get(path="organizations/org/workspaces", bypass_cache=True)
+        assert requests_mock.call_count == 4
+        # Polls fill the cache for the other calls
+        tfc._api.get(path="organizations/org/workspaces")
+        assert requests_mock.call_count == 4
+
+    def test_page_size_and_limit(self, requests_mock):
+        total = 330
+
+        def list_workspaces(request, context):
+            number = int(request.qs["page[number]"][0])
+            size = int(request.qs["page[size]"][0])
+            ids = range((number - 1) * size, min(number * size, total))
+            total_pages = -(-total // size)
+            return {
+                "data": [
+                    {
+                        "id": f"ws-{i}",
+                        "type": "workspaces",
+                        "attributes": {"name": f"ws{i}"},
+                    }
+                    for i in ids
+                ],
+                "meta": {
+                    "pagination": {
+                        "current-page": number,
+                        "next-page": number + 1 if number < total_pages else None,
+                        "total-pages": total_pages,
+                    }
+                },
+            }
+
+        requests_mock.get(
+            "/api/v2/organizations/hashicorp",
+            text=get_organization_json(org_id="hashicorp"),
+        )
+        requests_mock.get(
+            "/api/v2/organizations/hashicorp/workspaces", json=list_workspaces
+        )
+        for page_workers in (0, 4):
+            tfc = tfc_client.TFCClient(token="token", page_workers=page_workers)
+            org = tfc.get("organization", id="hashicorp")
+            assert org.name == "hashicorp"
+            requests_mock.reset_mock()
+            names = [ws.name for ws in org.workspaces_search(limit=250)]
+            assert names == [f"ws{i}" for i in range(250)]
+            pages = [
+                (r.qs["page[number]"][0], r.qs["page[size]"][0])
+                for r in requests_mock.request_history
+            ]
+            # The 50 workspaces after the first 200 are page 5 of 50
+            if not page_workers:
+                assert pages == [("1", "100"), ("2", "100"), ("5", "50")]
+            # Pages read ahead are fetched concurrently: in any order
+            assert sorted(pages) == [("1", "100"), ("2", "100"), ("5", "50")]
+
+            requests_mock.reset_mock()
+            assert len(list(org.get_list("workspaces", page_size=30, limit=7))) == 7
+            assert len(list(org.workspaces)) == total
+            assert [r.qs["page[size]"][0] for r in requests_mock.request_history] == [
+                "7"
+            ] + ["100"] * 4
+            # 0 is the default size
+            assert len(list(org.get_list("workspaces", page_size=0, limit=3))) == 3
+            assert requests_mock.last_request.qs["page[size]"] == ["3"]
+            with pytest.raises(ValueError):
+                list(org.get_list("workspaces", page_size=-1))
+
+        tuner = tfc._api.page_size_tuner
+        tuner.observe("organizations/{id}/workspaces", 100, 8.0, 1000)
+        assert tfc._api.page_size("organizations/hashicorp/workspaces") == 20
+        tuner.observe("organizations/{id}/workspaces", 20, 0.1, 1000)
+        assert tfc._api.page_size("organizations/hashicorp/workspaces") == 40
+        assert (
+            tfc_client.TFCClient(token="token", page_size=250)._api.page_size("runs")
+            == 100
+        )
+
+    def test_page_size_tuner_ignores_throttling(self, requests_mock):
+        path = "organizations/hashicorp/workspaces"
+        requests_mock.get(
+            f"/api/v2/{path}",
+            [
+                {"status_code": 429, "headers": {"Retry-After": "0.2"}},
+                {"json": {"data": [], "meta": {"pagination": {"current-page": 1}}}},
+            ],
+        )
+        tfc = tfc_client.TFCClient(token="token", page_workers=0)
+        tuner = tfc._api.page_size_tuner
+        tuner.target_latency = 0.1
+        # Retried after a 429
+        list(tfc._api.get_list(path=path))
+        # Held by the rate limiter
+        tfc.rate_limiter.pause(0.2)
+        list(tfc._api.get_list(path=path))
+        assert tuner.snapshot() == {}
+        assert tfc._api.page_size(path) == 100
+
+
+class TestRunWaiter(object):
+    def test_wait_runs(self, requests_mock):
+        def run_data(run_id, status, ws_id):
+            return {
+                "id": run_id,
+                "type": "runs",
+                "attributes": {"status": status},
+                "relationships": {
+                    "workspace": {"data": {"id": ws_id, "type": "workspaces"}}
+                },
+            }
+
+        def runs_page(*runs):
+            return {"text": json.dumps({"data": list(runs), "meta": {}})}
+
+        requests_mock.get(
+            "/api/v2/workspaces/ws-1/runs",
+            [
+                runs_page(
+                    run_data("run-a", "planned", "ws-1"),
+                    run_data("run-b", "planning", "ws-1"),
+                ),
+                runs_page(
+                    run_data("run-a", "planned", "ws-1"),
+                    run_data("run-b", "errored", "ws-1"),
+                ),
+            ],
+        )
+        # run-c is too old to be in the first page of its workspace
+        requests_mock.get("/api/v2/workspaces/ws-2/runs", **runs_page())
+        requests_mock.get(
+            "/api/v2/runs/run-c",
+            text=json.dumps({"data": run_data("run-c", "planned", "ws-2")}),
+        )
+        tfc = tfc_client.TFCClient(token="token")
+        runs = [
+            tfc.factory(run_data(run_id, "pending", ws_id))
+            for run_id, ws_id in [
+                ("run-a", "ws-1"),
+                ("run-b", "ws-1"),
+                ("run-c", "ws-2"),
+            ]
+        ]
+        waiter = tfc.wait_runs(runs, sleep_time=0)
+        assert [run.id for run in waiter] == ["run-a", "run-c", "run-b"]
+        assert waiter.pending == []
+        paths = [request.path for request in requests_mock.request_history]
+        # Both workspaces are polled concurrently: only the second poll of ws-1 is
+        # known to come last
+        assert sorted(paths) == [
+            "/api/v2/runs/run-c",
+            "/api/v2/workspaces/ws-1/runs",
+            "/api/v2/workspaces/ws-1/runs",
+            "/api/v2/workspaces/ws-2/runs",
+        ]
+        assert paths[-1] == "/api/v2/workspaces/ws-1/runs"
+
+    def test_wait_current_runs_of_organization(self, requests_mock):
+        def run_data(run_id, status):
+            return {"id": run_id, "type": "runs", "attributes": {"status": status}}
+
+        def workspaces_page(statuses):
+            workspaces = [
+                {
+                    "id": f"ws-{index}",
+                    "type": "workspaces",
+                    "attributes": {},
+                    "relationships": {
+                        "current-run": {"data": {"id": f"run-{index}", "type": "runs"}}
+                    },
+                }
+                for index in range(len(statuses))
+            ]
+            included = [
+                run_data(f"run-{index}", status)
+                for index, status in enumerate(statuses)
+            ]
+            meta = {"pagination": {"total-pages": 1, "next-page": None}}
+            return {
+                "text": json.dumps(
+                    {"data": workspaces, "included": included, "meta": meta}
+                )
+            }
+
+        requests_mock.get(
+            "/api/v2/organizations/my-org/workspaces",
+            [
+                workspaces_page(["planned", "planning", "planning"]),
+                workspaces_page(["planned", "planned", "planned"]),
+            ],
+        )
+        # run-3 is queued behind the current run of its workspace (page without meta)
+        requests_mock.get(
+            "/api/v2/workspaces/ws-3/runs",
+            text=json.dumps({"data": [run_data("run-3", "planned")]}),
+        )
+        tfc = tfc_client.TFCClient(token="token")
+        runs = [
+            tfc.factory(
+                {
+                    "id": f"run-{index}",
+                    "type": "runs",
+                    "attributes": {"status": "pending"},
+                    "relationships": {
+                        "workspace": {
+                            "data": {"id": f"ws-{index}", "type": "workspaces"}
+                        }
+                    },
+                }
+            )
+            for index in range(4)
+        ]
+        waiter = tfc.wait_runs(runs, sleep_time=0, organization="my-org")
+        assert sorted(run.id for run in waiter) == ["run-0", "run-1", "run-2", "run-3"]
+        # One page for the runs of 3 workspaces at each poll
+        assert [request.path for request in requests_mock.request_history] == [
+            "/api/v2/organizations/my-org/workspaces",
+            "/api/v2/workspaces/ws-3/runs",
+            "/api/v2/organizations/my-org/workspaces",
+        ]
+        assert requests_mock.request_history[0].qs["include"] == ["current_run"]
+
+
+class TestNotificationReceiver(object):
+    def test_wait_run_notified(self, requests_mock):
+        requests_mock.get(
+            "/api/v2/runs/run-1",
+            text=json.dumps(
+                {
+                    "data": {
+                        "id": "run-1",
+                        "type": "runs",
+                        "attributes": {"status": "planned"},
+                    }
+                }
+            ),
+        )
+        tfc = tfc_client.TFCClient(token="token")
+        run = tfc.factory(
+            {"id": "run-1", "type": "runs", "attributes": {"status": "pending"}}
+        )
+        payload = json.dumps(
+            {
+                "run_id": "run-1",
+                "notifications": [
+                    {"trigger": "run:needs_attention", "run_status": "planned"}
+                ],
+            }
+        ).encode()
+
+        def notify(receiver, signature):
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{receiver.port}/",
+                data=payload,
+                headers={NotificationReceiver.SIGNATURE_HEADER: signature},
+            )
+            try:
+                return urllib.request.urlopen(request).status
+            except urllib.error.HTTPError as error:
+                return error.code
+
+        with NotificationReceiver(host="127.0.0.1", fallback_sleep_time=30) as receiver:
+            assert notify(receiver, "forged") == 401
+            assert receiver.status("run-1") is None
+            threading.Timer(
+                0.1, notify, (receiver, receiver.signature(receiver.token, payload))
+            ).start()
+            start = time.monotonic()
+            assert run.wait_plan(receiver=receiver)
+            assert time.monotonic() - start < 5
+        # One refresh after the notification
+        assert [request.path for request in requests_mock.request_history] == [
+            "/api/v2/runs/run-1"
+        ]
+
+    def test_url_and_statuses(self):
+        receiver = NotificationReceiver(port=8080, max_runs=2)
+        # TFC can't send to 0.0.0.0
+        with pytest.raises(tfc_client.exception.TFCClientException):
+            receiver.url
+        receiver.public_url = "https://ci.example.com/tfc"
+        assert receiver.url == "https://ci.example.com/tfc"
+        assert NotificationReceiver(host="10.0.0.1", port=8080).url == (
+            "http://10.0.0.1:8080/"
+        )
+
+        for run_id in ("run-1", "run-2", "run-1", "run-3"):
+            receiver.receive(
+                {"run_id": run_id, "notifications": [{"run_status": "planned"}]}
+            )
+        # Only the most recently notified runs are kept
+        assert receiver.status("run-2") is None
+        assert receiver.status("run-1") == receiver.status("run-3") == "planned"
+
+
+class TestInstrumentation(object):
+    def test_stats_and_n_plus_one(self, requests_mock):
+        for i in range(4):
+            requests_mock.get(
+                f"/api/v2/runs/run-{i}",
+                text=json.dumps(
+                    {
+                        "data": {
+                            "id": f"run-{i}",
+                            "type": "runs",
+                            "attributes": {"status": "applied"},
+                        }
+                    }
+                ),
+            )
+        requests_mock.get("/api/v2/runs/run-missing", status_code=404)
+        tfc = tfc_client.TFCClient(
+            token="token", detect_n_plus_one=NPlusOneDetector(threshold=3)
+        )
+        events = []
+        tfc.add_listener(events.append)
+        runs = [tfc.get("run", id=f"run-{i}") for i in range(4)]
+        with pytest.warns(NPlusOneWarning, match="GET runs/{id}"):
+            statuses = [run.status for run in runs]
+        assert statuses == ["applied"] * 4
+        with pytest.raises(APIException):
+            tfc.get("run", id="run-missing").status
+        assert events[0].method == "GET"
+        assert events[0].path == "runs/{id}"
+        assert events[0].status == 200
+        stats = tfc.stats(reset=True)
+        assert stats["requests"] == 5
+        endpoint = stats["endpoints"]["GET runs/{id}"]
+        assert endpoint["count"] == 5
+        assert endpoint["errors"] == 1
+        assert sum(endpoint["latency-histogram"].values()) == 5
+        assert tfc.stats()["requests"] == 0
+
+
+class TestTransport(object):
+    def test_record_and_replay(self, requests_mock, tmp_path):
+        cassette = str(tmp_path / "cassette.jsonl.gz")
+        statuses = ["planning", "planned"]
+        requests_mock.get(
+            "/api/v2/runs/run-1",
+            [
+                {
+                    "text": json.dumps(
+                        {
+                            "data": {
+                                "id": "run-1",
+                                "type": "runs",
+                                "attributes": {"status": status},
+                            }
+                        }
+                    )
+                }
+                for status in statuses
+            ],
+        )
+        requests_mock.get("https://archivist.example/log", content=b"\x02log\xff")
+        recorder = RecordingTransport(cassette)
+        tfc = tfc_client.TFCClient(
+            token="secret", transport=recorder, conditional_cache_size=0
+        )
+        assert [tfc.get("run", id="run-1").status for _ in statuses] == statuses
+        assert tfc._api.get_raw_range("https://archivist.example/log") == b"\x02log\xff"
+        tfc.close()
+        calls = requests_mock.call_count
+
+        with open(cassette, "rb") as cassette_file:
+            assert b"secret" not in cassette_file.read()
+        replay = ReplayTransport(cassette)
+        tfc = tfc_client.TFCClient(
+            token="other", transport=replay, conditional_cache_size=0
+        )
+        assert [tfc.get("run", id="run-1").status for _ in range(3)] == statuses + [
+            "planned"
+        ]
+        assert tfc._api.get_raw_range("https://archivist.example/log") == b"\x02log\xff"
+        with pytest.raises(TransportException):
+            tfc.get("run", id="run-2").status
+        assert requests_mock.call_count == calls
+        assert tfc.stats()["endpoints"]["GET runs/{id}"]["count"] == 3
+
+    def test_incomplete_transport(self):
+        class NoRequestTransport(Transport):
+            pass
+
+        with pytest.raises(TypeError):
+            NoRequestTransport()
+
+    def test_record_and_replay_upload(self, requests_mock, tmp_path):
+        cassette = str(tmp_path / "cassette.jsonl.gz")
+        upload_url = "https://archivist.example/v1/object/upload"
+        requests_mock.put(upload_url, status_code=200)
+        cv_data = {
+            "id": "cv-1",
+            "type": "configuration-versions",
+            "attributes": {"upload-url": upload_url},
+        }
+        recorder = RecordingTransport(cassette)
+        tfc = tfc_client.TFCClient(token="secret", transport=recorder)
+        tfc.factory(cv_data).upload(io.BytesIO(b"tarball"))
+        tfc.close()
+        assert requests_mock.last_request.body == b"tarball"
+
+        tfc = tfc_client.TFCClient(token="other", transport=ReplayTransport(cassette))
+        tfc.factory(cv_data).upload(io.BytesIO(b"tarball"))
+        with pytest.raises(TransportException):
+            tfc.factory(cv_data).upload(io.BytesIO(b"other tarball"))
+        assert requests_mock.call_count == 1
+
+
+class TestTFCPlan(object):
+    def test_tail_log(self, requests_mock):
+        log_url = "https://archivist.example/v1/object/plan-log"
+        full_log = "\x02Terraform v0.12\n\x1b[1mRefreshing\x1b[0m state\n\x1b[32m+ null\x1b[0m\nPlan: 1 to add\x03"
+        written = [len(full_log) // 3, len(full_log) // 3 * 2, len(full_log)]
+        ranges = []
+
+        def get_log(request, context):
+            start = int(request.headers.get("Range", "bytes=0-")[6:-1])
+            ranges.append(start)
+            end = written.pop(0) if written else len(full_log)
+            context.status_code = 206 if start else 200
+            return full_log.encode()[start:end]
+
+        requests_mock.get(log_url, content=get_log)
+        requests_mock.get(
+            "/api/v2/plans/plan-1",
+            text=json.dumps(
+                {
+                    "data": {
+                        "id": "plan-1",
+                        "type": "plans",
+                        "attributes": {"status": "running", "log-read-url": log_url},
+                    }
+                }
+            ),
+        )
+        tfc = tfc_client.TFCClient(token="token")
+        plan = tfc.get("plan", id="plan-1")
+        lines = list(plan.tail_log(sleep_time=0))
+        assert lines == [
+            "Terraform v0.12",
+            "Refreshing state",
+            "+ null",
+            "Plan: 1 to add",
+        ]
+        # Each poll only asks for the new bytes
+        assert ranges == sorted(set(ranges))
+        assert plan.log == "\n".join(lines)
+
+    def test_log_summary(self, requests_mock):
+        log = "\n".join(
+            [
+                "Terraform v0.12.29",
+                "",
+                "Terraform will perform the following actions:",
+                "",
+                "  # null_resource.new will be created",
+                '  + resource "null_resource" "new" {',
+                "      + id = (known after apply)",
+                "    }",
+                "",
+                "  # module.app.null_resource.old[0] must be replaced",
+                '-/+ resource "null_resource" "old" {',
+                "    }",
+                "",
+                "Plan: 2 to add, 0 to change, 1 to destroy.",
+            ]
+        )
+        log_url = "https://archivist.example/v1/object/plan-log"
+        requests_mock.get(log_url, text=f"\x02{log}\x03")
+        tfc = tfc_client.TFCClient(token="token")
+        plan = tfc.factory(
+            {"id": "plan-1", "type": "plans", "attributes": {"log-read-url": log_url}}
+        )
+        summary = plan.log_summary
+        assert summary.resources == [
+            ("null_resource.new", "create"),
+            ("module.app.null_resource.old[0]", "replace"),
+        ]
+        assert (summary.add, summary.change, summary.destroy) == (2, 0, 1)
+        assert (
+            plan.log_resume
+            == '  + resource "null_resource" "new" {\n-/+ resource "null_resource" "old" {'
+        )
+        assert plan.log_changes == "\n".join(log.splitlines()[2:]) + "\n"
+        assert (
+            plan.log_signature == hashlib.sha256(plan.log_resume.encode()).hexdigest()
+        )
+        # Parsed once
+        assert plan.log_summary is summary
@@ -1,2 +1,3 @@
 __version__ = "0.7.3"
 from .tfc_client import TFCClient
+from .async_tfc_client import AsyncTFCClient
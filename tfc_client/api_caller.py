@@ -1,9 +1,22 @@
+from collections import OrderedDict, deque
 from collections.abc import Iterable, Mapping
-from typing import Dict, Generator, Union
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Generator, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from .codec import JSONCodec, default_codec
 from .exception import APIException
+from .instrumentation import RequestEvent, template_path, template_url
+from .page_size import MAX_PAGE_SIZE, PageSizeTuner, page_plan
+from .rate_limiter import RateLimiter
+from .response_cache import ResponseCache
+from .transport import Transport
 
 
 class APIResponse(object):
@@ -36,27 +49,381 @@ class APIResponse(object):
             return ", ".join(rval)
 
 
+class ValidatorCache(object):
+    """Bounded LRU cache of the validators (ETag / Last-Modified) and bodies of GET responses,
+    to send conditional requests and reuse the cached body on a "304 Not Modified"
+
+    :param max_size: Maximum number of cached responses
+    :type max_size: int
+    :param max_bytes: Maximum total size of the cached bodies (a bigger body is not cached). Default: 16MB
+    :type max_bytes: int
+    """
+
+    def __init__(self, max_size: int = 256, max_bytes: int = 16 * 1024 * 1024):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple, Tuple[Dict[str, str], bytes]]"
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(url: str, params: Optional[Mapping]) -> Tuple:
+        if not params:
+            return (url,)
+        return (url,) + tuple(sorted((str(k), str(v)) for k, v in params.items()))
+
+    def headers(self, url: str, params: Optional[Mapping]) -> Dict[str, str]:
+        """Conditional headers to send for a GET of `url` with `params`"""
+        with self._lock:
+            entry = self._entries.get(self._key(url, params))
+            return dict(entry[0]) if entry else {}
+
+    def body(self, url: str, params: Optional[Mapping]) -> Optional[bytes]:
+        key = self._key(url, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def store(self, url: str, params: Optional[Mapping], response) -> None:
+        validators = dict()
+        if response.headers.get("ETag"):
+            validators["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = response.headers["Last-Modified"]
+        key = self._key(url, params)
+        content = response.content
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= len(entry[1])
+            if not validators or len(content) > self.max_bytes:
+                return
+            self._entries[key] = (validators, content)
+            self.size += len(content)
+            while len(self._entries) > self.max_size or self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
 class APICaller(object):
-    def __init__(self, host: str, base_url: str, headers: Mapping = None):
+    """Send requests to the TFC API through a shared keep-alive connection pool
+
+    :param host: TFC API URL (like "https://app.terraform.io")
+    :type host: str
+    :param base_url: API path prefix (like "api/v2")
+    :type base_url: str
+    :param headers: Headers sent with every API request (not with raw downloads)
+    :type headers: Mapping
+    :param pool_connections: Number of per-host connection pools to keep
+    :type pool_connections: int
+    :param pool_maxsize: Maximum number of connections kept alive per host
+    :type pool_maxsize: int
+    :param pool_block: Block when all connections of a host are in use instead of opening a throwaway one
+    :type pool_block: bool
+    :param timeout: Request timeout in seconds, a single value or a (connect, read) tuple. Default: no timeout
+    :type timeout: Union[float, Tuple[float, float]]
+    :param page_workers: Number of pages get_list fetches ahead of the consumer, concurrently. 0 to fetch pages one by one, only when needed
+    :type page_workers: int
+    :param rate_limiter: Pace the API requests and retry the throttled ones. None to disable
+    :type rate_limiter: RateLimiter
+    :param conditional_cache_size: Number of GET responses kept to revalidate them with conditional requests. 0 to disable
+    :type conditional_cache_size: int
+    :param conditional_cache_bytes: Maximum total size of the bodies of these responses
+    :type conditional_cache_bytes: int
+    :param response_cache: Persistent cache of the GET responses (not read by the calls with `bypass_cache=True`, like polls). Default: None (no cache)
+    :type response_cache: ResponseCache
+    :param page_size: Number of objects by list page (max 100). None to tune it by endpoint (see `PageSizeTuner`)
+    :type page_size: int
+    :param codec: Decode the response bodies and encode the request ones. Default: the fastest installed (see `default_codec`)
+    :type codec: JSONCodec
+    :param transport: Send the HTTP requests (like a `RecordingTransport` or a `ReplayTransport`). Default: a `requests.Session` with the connection pool settings above (ignored otherwise)
+    :type transport: Transport
+    """
+
+    def __init__(
+        self,
+        host: str,
+        base_url: str,
+        headers: Mapping = None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        timeout: Union[float, Tuple[float, float], None] = None,
+        page_workers: int = 4,
+        rate_limiter: RateLimiter = None,
+        conditional_cache_size: int = 256,
+        conditional_cache_bytes: int = 16 * 1024 * 1024,
+        response_cache: ResponseCache = None,
+        page_size: Optional[int] = None,
+        codec: JSONCodec = None,
+        transport: Transport = None,
+    ):
         self._host = host
         self._base_url = base_url
         self._headers = headers
+        self._timeout = timeout
+        self._page_workers = page_workers
+        self._rate_limiter = rate_limiter
+        self.codec = codec or default_codec()
+        self._page_size = min(page_size, MAX_PAGE_SIZE) if page_size else None
+        self.page_size_tuner = PageSizeTuner() if page_size is None else None
+        self._validators = (
+            ValidatorCache(
+                max_size=conditional_cache_size, max_bytes=conditional_cache_bytes
+            )
+            if conditional_cache_size
+            else None
+        )
+        self._response_cache = response_cache
+        # Responses depend on the token permissions: never share them between tokens
+        self._cache_namespace = hashlib.sha256(
+            "{} {}".format(host, (headers or {}).get("Authorization")).encode()
+        ).hexdigest()[:16]
+        self._listeners: List[Callable[[RequestEvent], None]] = []
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        if transport is None:
+            transport = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block,
+            )
+            transport.mount("https://", adapter)
+            transport.mount("http://", adapter)
+        self._session = transport
+
+    def close(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self._session.close()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._page_workers, thread_name_prefix="tfc-page"
+                )
+            return self._executor
+
+    def prewarm(self, connections: int = 1) -> int:
+        """Open `connections` keep-alive connections to the API host ahead of time,
+        so the first real calls don't pay the TCP+TLS handshake.
+
+        Errors are ignored: a failed prewarm only means a cold first call.
+
+        :return: Number of connections successfully opened
+        """
+
+        def ping(_):
+            try:
+                self._session.request(
+                    "GET",
+                    url=self._url("ping"),
+                    headers=self._headers,
+                    timeout=self._timeout,
+                )
+                return True
+            except requests.RequestException:
+                return False
+
+        if connections <= 1:
+            return int(ping(None))
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            return sum(executor.map(ping, range(connections)))
+
+    def _url(self, path: str) -> str:
+        if path.startswith("/"):
+            return "/".join([self._host, path])
+        else:
+            return "/".join([self._host, self._base_url, path])
+
+    def _send(
+        self, method: str, url: str, headers: Mapping, *args, **kwargs
+    ) -> Tuple[requests.Response, int, Optional[float]]:
+        """Send a request, retried as allowed by the rate limiter
+
+        :return: The response, the number of retries and the duration in seconds of
+            the HTTP round trip (None when the call waited for the rate limiter or
+            was retried: the duration would not be the server's)
+        """
+        attempt = 0
+        waited = False
+        while True:
+            if self._rate_limiter:
+                waited = self._rate_limiter.acquire() > 0 or waited
+            sent_at = time.perf_counter()
+            response = self._session.request(
+                method.upper(), url=url, headers=headers, *args, **kwargs
+            )
+            round_trip = time.perf_counter() - sent_at
+            if not self._rate_limiter:
+                return response, attempt, round_trip
+            self._rate_limiter.update(response.headers)
+            if not self._rate_limiter.should_retry(
+                method, response.status_code, attempt
+            ):
+                if waited or attempt:
+                    round_trip = None
+                return response, attempt, round_trip
+            delay = self._rate_limiter.retry_delay(
+                attempt, response.headers.get("Retry-After")
+            )
+            if response.status_code == 429:
+                # The whole token is throttled, not only this call
+                self._rate_limiter.pause(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+    def add_listener(self, listener: Callable[[RequestEvent], None]) -> None:
+        """Call `listener` with a `RequestEvent` after each request (in the thread of the request)"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[RequestEvent], None]) -> None:
+        self._listeners.remove(listener)
+
+    def _emit(
+        self,
+        method: str,
+        url: str,
+        status: Optional[int],
+        size: int,
+        started: float,
+        retries: int = 0,
+        cache: str = None,
+        params: Mapping = None,
+        path: str = None,
+    ) -> None:
+        if not self._listeners:
+            return
+        page = (params or {}).get("page[number]")
+        event = RequestEvent(
+            method=method.upper(),
+            path=path or template_path(self._cache_path(url)),
+            status=status,
+            bytes=size,
+            latency=time.perf_counter() - started,
+            retries=retries,
+            cache=cache,
+            page=int(page) if page is not None else None,
+        )
+        for listener in self._listeners:
+            listener(event)
+
+    def _emit_raw(
+        self, method: str, url: str, response: requests.Response, started: float
+    ) -> None:
+        self._emit(
+            method,
+            url,
+            response.status_code,
+            len(response.content),
+            started,
+            path=template_url(url),
+        )
+
+    def _cache_path(self, url: str) -> str:
+        path = urlsplit(url).path.lstrip("/")
+        prefix = self._base_url.strip("/") + "/"
+        return path[len(prefix) :] if path.startswith(prefix) else path
 
     def _call(
         self, method: str = "get", path: str = "/", *args, **kwargs
     ) -> Union[APIResponse, bool]:
-        message = ""
-        requester = getattr(requests, method.lower())
-        if path.startswith("/"):
-            url = "/".join([self._host, path])
-        else:
-            url = "/".join([self._host, self._base_url, path])
+        started = time.perf_counter()
+        url = self._url(path)
+        kwargs.setdefault("timeout", self._timeout)
+        params = kwargs.get("params")
+        # Polls want the current state: they don't read the response cache (but fill it)
+        bypass_cache = kwargs.pop("bypass_cache", False)
+
+        if self._response_cache and method == "get":
+            cache_path = self._cache_path(url)
+            content = (
+                None
+                if bypass_cache
+                else self._response_cache.get(self._cache_namespace, cache_path, params)
+            )
+            if content is not None:
+                self._emit(
+                    method, url, None, 0, started, cache="response-cache", params=params
+                )
+                response_json = self.codec.loads(content)
+                if response_json and "data" in response_json:
+                    return APIResponse(response_json)
+                return True
 
-        response = requester(url=url, headers=self._headers, *args, **kwargs)
+        headers = self._headers
+        conditional = method == "get" and self._validators is not None
+        if conditional:
+            validators = self._validators.headers(url, params)
+            if validators:
+                headers = dict(self._headers or {}, **validators)
+
+        response, retries, round_trip = self._send(
+            method, url, headers, *args, **kwargs
+        )
+
+        content = response.content
+        cache = None
+        if conditional:
+            if response.status_code == 304:
+                cache = "not-modified"
+                content = self._validators.body(url, params)
+                if content is None:
+                    # Evicted meanwhile: get the full body
+                    cache = None
+                    response, more_retries, round_trip = self._send(
+                        method, url, self._headers, *args, **kwargs
+                    )
+                    retries += more_retries
+                    content = response.content
+            if response.status_code < 300:
+                self._validators.store(url, params, response)
+        self._emit(
+            method,
+            url,
+            response.status_code,
+            len(response.content),
+            started,
+            retries=retries,
+            cache=cache,
+            params=params,
+        )
+        if (
+            self.page_size_tuner
+            and params
+            and "page[size]" in params
+            and response.status_code < 300
+            and round_trip is not None
+            and cache is None
+        ):
+            # Only the HTTP round trip: the waits for the rate limiter are not the
+            # server's latency, and smaller pages would only mean more throttling
+            self.page_size_tuner.observe(
+                template_path(self._cache_path(url)),
+                int(params["page[size]"]),
+                round_trip,
+                len(content or b""),
+            )
+
+        if self._response_cache and response.status_code < 400:
+            if method == "get":
+                self._response_cache.set(
+                    self._cache_namespace, cache_path, params, content
+                )
+            else:
+                self._response_cache.invalidate(self._cache_path(url))
 
         if response.status_code < 400:
             if method in ["get", "post", "patch", "put"]:
-                response_json = response.json()
+                response_json = self.codec.loads(content) if content else None
                 if response_json and "data" in response_json:
                     return APIResponse(response_json)
                 else:
@@ -74,8 +441,9 @@ class APICaller(object):
                 filters[f"{object_name}[{object_type}][{field_name}]"] = field_value
         return filters
 
-    def get_list(
-        self,
+    @classmethod
+    def _list_params(
+        cls,
         params: Dict[str, str] = None,
         page_number=1,
         page_size=20,
@@ -83,13 +451,11 @@ class APICaller(object):
         filters: Mapping = None,
         include: str = None,
         sort: str = None,
-        *args,
-        **kwargs,
-    ) -> Generator[Union[APIResponse, bool], None, None]:
+    ) -> Dict[str, str]:
         if not params:
             params = dict()
         if filters:
-            params.update(self._dict_to_params("filter", filters))
+            params.update(cls._dict_to_params("filter", filters))
 
         if page_size:
             params["page[size]"] = page_size
@@ -101,35 +467,204 @@ class APICaller(object):
             params["include"] = include
         if sort:
             params["sort"] = sort
+        return params
 
-        api_response = self._call(method="get", params=params, **kwargs)
+    def page_size(self, path: str) -> int:
+        """Page size of the list calls of `path`: the client one, else the tuned one"""
+        if self._page_size:
+            return self._page_size
+        return self.page_size_tuner.size(template_path(path))
+
+    def get_list(
+        self,
+        params: Dict[str, str] = None,
+        page_number=1,
+        page_size: int = None,
+        search: str = None,
+        filters: Mapping = None,
+        include: str = None,
+        sort: str = None,
+        limit: int = None,
+        *args,
+        **kwargs,
+    ) -> Generator[Union[APIResponse, bool], None, None]:
+        """Pages of a list endpoint
+
+        :param page_size: Number of objects by page (max 100). Default (None or 0): the client one (see `page_size`)
+        :type page_size: int
+        :param limit: Maximum number of objects listed: no page is fetched past it, and the last page is shrunk to the remaining objects
+        :type limit: int
+        """
+        if not page_size:
+            page_size = self.page_size(kwargs.get("path", "/"))
+        elif page_size < 0:
+            raise ValueError(f"Invalid page size: {page_size}")
+        page_size = min(page_size, MAX_PAGE_SIZE)
+        if limit is not None and limit <= 0:
+            return
+        pages = page_plan(page_number, page_size, limit)
+        page_number, first_size, _ = next(pages)
+        params = self._list_params(
+            params, page_number, first_size, search, filters, include, sort
+        )
+        # The following pages are requested with the plan size
+        params["page[size]"] = page_size
+
+        api_response = self._call(
+            method="get", params=dict(params, **{"page[size]": first_size}), **kwargs
+        )
+
+        if not isinstance(api_response, APIResponse):
+            raise TypeError("api_response is not an APIResponse instance")
+
+        if self._page_workers > 0:
+            responses = self._get_pages_ahead(
+                api_response, params, pages, page_size, **kwargs
+            )
+        else:
+            responses = self._get_pages(api_response, params, pages, **kwargs)
+        if limit is None:
+            yield from responses
+            return
 
-        if isinstance(api_response, APIResponse):
-            while True:
+        remaining = limit
+        try:
+            for api_response in responses:
+                if isinstance(api_response.data, list):
+                    # The last page may hold more objects than the remaining ones
+                    api_response.data = api_response.data[:remaining]
+                    remaining -= len(api_response.data)
                 yield api_response
+                if remaining <= 0:
+                    break
+        finally:
+            responses.close()
 
-                if (
-                    api_response.meta  # type: ignore
-                    and "pagination" in api_response.meta  # type: ignore
-                ):
-                    params["page[number]"] = api_response.meta[  # type: ignore
-                        "pagination"
-                    ].get("next-page")
-                    if params["page[number]"]:
-                        api_response = self._call(method="get", params=params, **kwargs)
-                        continue
+    def _get_pages(
+        self,
+        api_response: APIResponse,
+        params: Mapping,
+        pages: Iterator[Tuple[int, int, int]],
+        **kwargs,
+    ) -> Generator[APIResponse, None, None]:
+        """Yield `api_response` then the next pages of the plan, fetched one by one"""
+        while True:
+            yield api_response
 
+            if not self._pagination(api_response).get("next-page"):
                 break
-        else:
-            raise TypeError("api_response is not an APIResponse instance")
+            page = next(pages, None)
+            if page is None:
+                break
+            api_response = self._get_page(params, page[0], page[1], **kwargs)
+
+    @staticmethod
+    def _pagination(api_response: APIResponse) -> Mapping:
+        if isinstance(api_response.meta, Mapping):
+            return api_response.meta.get("pagination") or {}
+        return {}
+
+    def _get_page(
+        self, params: Mapping, page_number: int, page_size: int = None, **kwargs
+    ) -> APIResponse:
+        page_params = dict(params)
+        page_params["page[number]"] = page_number
+        if page_size:
+            page_params["page[size]"] = page_size
+        return self._call(method="get", params=page_params, **kwargs)
+
+    def _get_pages_ahead(
+        self,
+        api_response: APIResponse,
+        params: Mapping,
+        pages: Iterator[Tuple[int, int, int]],
+        page_size: int,
+        **kwargs,
+    ) -> Generator[APIResponse, None, None]:
+        """Yield `api_response` then the next pages of the plan, in order, while
+        fetching them ahead.
+
+        When the first page tells the total number of pages, the following pages are
+        fetched concurrently (at most `page_workers` pages ahead of the consumer).
+        Otherwise, the next page is fetched while the consumer processes the current one.
+        """
+        executor = self._get_executor()
+        total_pages = self._pagination(api_response).get("total-pages")
+        pending: deque = deque()
+
+        def submit_next() -> bool:
+            page = next(pages, None)
+            # The total is counted in pages of the plan size
+            if page is None or (total_pages and page[2] >= total_pages * page_size):
+                return False
+            pending.append(
+                executor.submit(self._get_page, params, page[0], page[1], **kwargs)
+            )
+            return True
+
+        try:
+            if total_pages:
+                while len(pending) < self._page_workers and submit_next():
+                    pass
+                yield api_response
+                while pending:
+                    api_response = pending.popleft().result()
+                    submit_next()
+                    yield api_response
+            else:
+                while True:
+                    if self._pagination(api_response).get("next-page"):
+                        submit_next()
+                    yield api_response
+                    if not pending:
+                        break
+                    api_response = pending.popleft().result()
+        finally:
+            # The consumer stopped early: don't fetch pages nobody will read
+            for future in pending:
+                future.cancel()
 
     def get_raw(self, path: str, *args, **kwargs) -> str:
-        response = requests.get(path)
+        # Raw URLs (like log_read_url) are pre-signed and may point to another host:
+        # never send the API headers (and the token) with them
+        started = time.perf_counter()
+        response = self._session.request("GET", path, timeout=self._timeout)
+        self._emit_raw("get", path, response, started)
         if response.status_code < 400:
             return response.text
         else:
             raise APIException("Error: {}".format(response.status_code), response)
 
+    def get_raw_range(self, path: str, offset: int = 0, *args, **kwargs) -> bytes:
+        """Bytes of a raw URL from `offset`: only the new bytes are transferred when the
+        server supports ranges (else they are cut from the full body)
+        """
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+        started = time.perf_counter()
+        response = self._session.request(
+            "GET", path, headers=headers, timeout=self._timeout
+        )
+        self._emit_raw("get", path, response, started)
+        if response.status_code == 416:
+            # Nothing after offset yet
+            return b""
+        if response.status_code < 400:
+            if response.status_code == 206:
+                return response.content
+            return response.content[offset:]
+        else:
+            raise APIException("Error: {}".format(response.status_code), response)
+
+    def put_raw(
+        self, path: str, data, headers: Mapping = None, *args, **kwargs
+    ) -> requests.Response:
+        started = time.perf_counter()
+        response = self._session.request(
+            "PUT", path, data=data, headers=headers, timeout=self._timeout
+        )
+        self._emit_raw("put", path, response, started)
+        return response
+
     def get(self, *args, **kwargs) -> Union[APIResponse, bool]:
         return self._call(method="get", **kwargs)
 
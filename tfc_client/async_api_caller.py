@@ -0,0 +1,227 @@
+import asyncio
+from collections.abc import Mapping
+import time
+from typing import AsyncGenerator, Dict, Optional, Tuple, Union
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from .api_caller import APICaller, APIResponse
+from .codec import JSONCodec, default_codec
+from .exception import APIException
+from .instrumentation import template_path
+from .page_size import MAX_PAGE_SIZE, PageSizeTuner
+from .rate_limiter import RateLimiter
+
+
+class AsyncAPICaller(object):
+    """asyncio counterpart of APICaller, based on aiohttp (`pip install tfc_client[async]`)
+
+    The aiohttp session is created on first use, inside the running event loop.
+
+    :param host: TFC API URL (like "https://app.terraform.io")
+    :type host: str
+    :param base_url: API path prefix (like "api/v2")
+    :type base_url: str
+    :param headers: Headers sent with every API request (not with raw downloads)
+    :type headers: Mapping
+    :param limit: Maximum number of simultaneous connections
+    :type limit: int
+    :param limit_per_host: Maximum number of simultaneous connections per host
+    :type limit_per_host: int
+    :param timeout: Request timeout in seconds, a single value or a (connect, read) tuple. Default: no timeout
+    :type timeout: Union[float, Tuple[float, float]]
+    :param codec: Decode the response bodies and encode the request ones. Default: the fastest installed (see `default_codec`)
+    :type codec: JSONCodec
+    :param rate_limiter: Pace the API requests and retry the throttled ones (waiting with `asyncio.sleep`). None to disable
+    :type rate_limiter: RateLimiter
+    :param page_size: Number of objects by list page (max 100). None to tune it by endpoint (see `PageSizeTuner`)
+    :type page_size: int
+    """
+
+    def __init__(
+        self,
+        host: str,
+        base_url: str,
+        headers: Mapping = None,
+        limit: int = 100,
+        limit_per_host: int = 30,
+        timeout: Union[float, Tuple[float, float], None] = None,
+        codec: JSONCodec = None,
+        rate_limiter: RateLimiter = None,
+        page_size: Optional[int] = None,
+    ):
+        if aiohttp is None:
+            raise ImportError(
+                "aiohttp is required for the asyncio client: pip install tfc_client[async]"
+            )
+        self._host = host
+        self._base_url = base_url
+        self._headers = headers
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self.codec = codec or default_codec()
+        self._rate_limiter = rate_limiter
+        self._page_size = min(page_size, MAX_PAGE_SIZE) if page_size else None
+        self.page_size_tuner = PageSizeTuner() if page_size is None else None
+        if isinstance(timeout, tuple):
+            self._timeout = aiohttp.ClientTimeout(
+                sock_connect=timeout[0], sock_read=timeout[1]
+            )
+        else:
+            self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit, limit_per_host=self._limit_per_host
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self._timeout
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _url(self, path: str) -> str:
+        if path.startswith("/"):
+            return "/".join([self._host, path])
+        else:
+            return "/".join([self._host, self._base_url, path])
+
+    async def _send(
+        self, method: str, path: str, **kwargs
+    ) -> Tuple["aiohttp.ClientResponse", bytes, Optional[float]]:
+        """Send a request, paced and retried as allowed by the rate limiter (like
+        `APICaller._send`)
+
+        :return: The response, its body and the duration in seconds of the HTTP round
+            trip (None when the call waited for the rate limiter or was retried)
+        """
+        session = self._get_session()
+        attempt = 0
+        waited = False
+        while True:
+            if self._rate_limiter:
+                wait = self._rate_limiter.reserve()
+                if wait:
+                    waited = True
+                    await asyncio.sleep(wait)
+            sent_at = time.perf_counter()
+            async with session.request(
+                method.upper(), self._url(path), headers=self._headers, **kwargs
+            ) as response:
+                body = await response.read()
+            round_trip = time.perf_counter() - sent_at
+            if not self._rate_limiter:
+                return response, body, round_trip
+            self._rate_limiter.update(response.headers)
+            if not self._rate_limiter.should_retry(method, response.status, attempt):
+                if waited or attempt:
+                    round_trip = None
+                return response, body, round_trip
+            delay = self._rate_limiter.retry_delay(
+                attempt, response.headers.get("Retry-After")
+            )
+            if response.status == 429:
+                # The whole token is throttled, not only this call
+                self._rate_limiter.pause(delay)
+            else:
+                await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _call(
+        self, method: str = "get", path: str = "/", **kwargs
+    ) -> Union[APIResponse, bool]:
+        response, body, round_trip = await self._send(method, path, **kwargs)
+        params = kwargs.get("params")
+        if (
+            self.page_size_tuner
+            and params
+            and "page[size]" in params
+            and response.status < 300
+            and round_trip is not None
+        ):
+            self.page_size_tuner.observe(
+                template_path(path), int(params["page[size]"]), round_trip, len(body)
+            )
+        if response.status < 400:
+            if method in ["get", "post", "patch", "put"]:
+                response_json = self.codec.loads(body) if body else None
+                if response_json and "data" in response_json:
+                    return APIResponse(response_json)
+                else:
+                    return True
+            elif method in ["delete"]:
+                return True
+        else:
+            raise APIException(f"APIError code: {response.status}", response)
+
+    def page_size(self, path: str) -> int:
+        """Page size of the list calls of `path`: the client one, else the tuned one"""
+        if self._page_size:
+            return self._page_size
+        return self.page_size_tuner.size(template_path(path))
+
+    async def get_list(
+        self,
+        params: Dict[str, str] = None,
+        page_number=1,
+        page_size: int = None,
+        search: str = None,
+        filters: Mapping = None,
+        include: str = None,
+        sort: str = None,
+        **kwargs,
+    ) -> AsyncGenerator[APIResponse, None]:
+        if not page_size:
+            page_size = self.page_size(kwargs.get("path", "/"))
+        elif page_size < 0:
+            raise ValueError(f"Invalid page size: {page_size}")
+        page_size = min(page_size, MAX_PAGE_SIZE)
+        params = APICaller._list_params(
+            params, page_number, page_size, search, filters, include, sort
+        )
+
+        while True:
+            api_response = await self._call(method="get", params=params, **kwargs)
+            if not isinstance(api_response, APIResponse):
+                raise TypeError("api_response is not an APIResponse instance")
+            yield api_response
+
+            next_page = None
+            if api_response.meta and "pagination" in api_response.meta:
+                next_page = api_response.meta["pagination"].get("next-page")
+            if not next_page:
+                break
+            params["page[number]"] = next_page
+
+    async def get_raw(self, path: str, **kwargs) -> str:
+        # Raw URLs (like log_read_url) are pre-signed and may point to another host:
+        # never send the API headers (and the token) with them
+        async with self._get_session().get(path) as response:
+            if response.status < 400:
+                return await response.text()
+            else:
+                raise APIException("Error: {}".format(response.status), response)
+
+    async def get(self, **kwargs) -> Union[APIResponse, bool]:
+        return await self._call(method="get", **kwargs)
+
+    async def put(self, **kwargs) -> Union[APIResponse, bool]:
+        return await self._call(method="put", **kwargs)
+
+    async def post(self, **kwargs) -> Union[APIResponse, bool]:
+        return await self._call(method="post", **kwargs)
+
+    async def patch(self, **kwargs) -> Union[APIResponse, bool]:
+        return await self._call(method="patch", **kwargs)
+
+    async def delete(self, **kwargs) -> Union[APIResponse, bool]:
+        return await self._call(method="delete", **kwargs)
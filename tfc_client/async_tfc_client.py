@@ -0,0 +1,129 @@
+from typing import (
+    AsyncGenerator,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NoReturn,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .async_api_caller import AsyncAPICaller
+from .async_tfc_objects import ASYNC_OBJECT_CLASSES, AsyncTFCObject
+from .codec import JSONCodec
+from .exception import UnmanagedObjectTypeException
+from .rate_limiter import RateLimiter
+from .util import include_param, index_included, type_name
+
+
+class AsyncTFCClient(object):
+    """The asyncio Terraform Cloud Client (`pip install tfc_client[async]`)
+
+    One event loop can drive many workspaces and runs concurrently:
+
+    Examples:
+     - `run = await client.get("run", id="run-12344321")`
+     - `await asyncio.gather(*(run.wait_plan() for run in runs))`
+
+    :param token: TFC API Token
+    :type token: str
+    :param url: TFC API URL. Default: "https://app.terraform.io"
+    :type url: str
+    :param limit: Maximum number of simultaneous connections. Default: 100
+    :type limit: int
+    :param limit_per_host: Maximum number of simultaneous connections per host. Default: 30
+    :type limit_per_host: int
+    :param timeout: Request timeout in seconds, a single value or a (connect, read) tuple. Default: no timeout
+    :type timeout: Union[float, Tuple[float, float]]
+    :param rate_limit: Maximum number of API requests per second (None to disable pacing and retries). Default: 30
+    :type rate_limit: float
+    :param max_retries: Number of retries of throttled (429) and failed (5xx) idempotent calls. Default: 5
+    :type max_retries: int
+    :param page_size: Number of objects by list page (max 100). Default: None (100, shrunk by endpoint when the pages are slow or big)
+    :type page_size: int
+    :param codec: JSON codec of the request and response bodies. Default: orjson when installed, else the stdlib json
+    :type codec: JSONCodec
+    """
+
+    def __init__(
+        self,
+        token: str,
+        url: str = "https://app.terraform.io",
+        *,
+        limit: int = 100,
+        limit_per_host: int = 30,
+        timeout: Union[float, Tuple[float, float], None] = None,
+        rate_limit: Optional[float] = 30,
+        max_retries: int = 5,
+        page_size: Optional[int] = None,
+        codec: JSONCodec = None,
+    ):
+        headers = {
+            "Content-Type": "application/vnd.api+json",
+            "Authorization": "Bearer {}".format(token),
+        }
+        self.rate_limiter = (
+            RateLimiter(rate=rate_limit, max_retries=max_retries)
+            if rate_limit
+            else None
+        )
+        self._api = AsyncAPICaller(
+            host=url,
+            base_url="api/v2",
+            headers=headers,
+            limit=limit,
+            limit_per_host=limit_per_host,
+            timeout=timeout,
+            codec=codec,
+            rate_limiter=self.rate_limiter,
+            page_size=page_size,
+        )
+        self.codec = self._api.codec
+
+    async def close(self) -> NoReturn:
+        await self._api.close()
+
+    async def __aenter__(self) -> "AsyncTFCClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> NoReturn:
+        await self.close()
+
+    async def get(
+        self, object_type: str, id: str, include: Union[str, Iterable[str]] = None
+    ) -> AsyncTFCObject:
+        object_type = type_name(object_type)
+        if include:
+            api_response = await self._api.get(
+                path=f"{object_type}/{id}", params={"include": include_param(include)}
+            )
+            return self.build(
+                api_response.data, include=index_included(api_response.included)
+            )
+        return await self.factory({"type": object_type, "id": id})
+
+    @property
+    async def organizations(self) -> AsyncGenerator[AsyncTFCObject, None]:
+        async for api_response in self._api.get_list(path="organizations"):
+            for org_data in api_response.data:
+                yield self.build(org_data)
+
+    def build(
+        self, data: dict, include: Union[List[Dict[str, dict]], Mapping] = None
+    ) -> AsyncTFCObject:
+        """Build an object from `data` without any API call (stub objects are not loaded)"""
+        if "id" not in data or "type" not in data:
+            raise UnmanagedObjectTypeException("No type and/or id in data")
+        tfc_class = ASYNC_OBJECT_CLASSES.get(data["type"], AsyncTFCObject)
+        return tfc_class(client=self, data=data, include=include)
+
+    async def factory(
+        self, data: dict, include: Union[List[Dict[str, dict]], Mapping] = None
+    ) -> AsyncTFCObject:
+        """Build an object from `data`, fetching its attributes when `data` is only a reference"""
+        tfc_object = self.build(data, include=include)
+        if "attributes" not in data:
+            await tfc_object.fetch()
+        return tfc_object
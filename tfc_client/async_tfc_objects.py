@@ -0,0 +1,199 @@
+import asyncio
+import inspect
+import time
+from collections.abc import Mapping
+from typing import (
+    AsyncGenerator,
+    Callable,
+    Iterable,
+    List,
+    NoReturn,
+    TYPE_CHECKING,
+    Union,
+)
+
+from .enums import RunStatus
+from .exception import TFCObjectException
+from .models.data import RootModel, DataModel
+from .models.relationship import RelationshipsModel
+from .models.run import RunModel
+from .tfc_object import TFCObject
+from .tfc_objects import TFCRun
+from .util import include_param, index_included, type_name
+
+if TYPE_CHECKING:
+    from .async_tfc_client import AsyncTFCClient
+
+
+class AsyncTFCObject(TFCObject):
+    """asyncio flavor of TFCObject.
+
+    Attributes can't be lazy loaded on access (that would block the event loop):
+    objects returned by the AsyncTFCClient are already loaded, and stub objects
+    (like relationships) must be loaded explicitly with `await obj.fetch()`.
+    """
+
+    __slots__ = ()
+
+    def _build_related(self, data: Mapping) -> "AsyncTFCObject":
+        return self.client.build(data)
+
+    def _get_data(self, object_type) -> NoReturn:
+        if "attributes" not in self.attrs:
+            raise TFCObjectException(
+                f"{self.type}/{self.id} is not loaded: use 'await obj.fetch()' first"
+            )
+
+    async def fetch(self) -> "AsyncTFCObject":
+        if self.links and "related" in self.links:
+            data_url = self.links["related"]
+        else:
+            data_url = f"{self.type}/{self.id}"
+
+        api_response = await self.client._api.get(path=data_url)
+        self.refresh()
+        self._init_from_data(api_response.data)
+        return self
+
+    async def get_list(
+        self, object_type: str, include: Union[str, Iterable[str]] = None, **kwargs
+    ) -> AsyncGenerator["AsyncTFCObject", None]:
+        object_type = type_name(object_type)
+        path = f"{self.type}/{self.id}/{object_type}"
+        async for api_response in self.client._api.get_list(
+            path=path, include=include_param(include), **kwargs
+        ):
+            included = index_included(api_response.included)
+            for element in api_response.data:
+                yield self.client.build(element, include=included)
+
+
+class AsyncTFCRun(AsyncTFCObject):
+    __slots__ = ()
+    type = "runs"
+
+    async def wait_run(
+        self,
+        target_status: List[RunStatus],
+        sleep_time=3,
+        timeout=600,
+        progress_callback: Callable = None,
+    ) -> bool:
+        if not progress_callback or not callable(progress_callback):
+            progress_callback = None
+
+        start_time = time.time()
+        while True:
+            duration = int(time.time() - start_time)
+            if self.status in target_status:
+                return True
+
+            if duration <= timeout:
+                if progress_callback:
+                    result = progress_callback(run=self, duration=duration)
+                    if inspect.isawaitable(result):
+                        await result
+                await asyncio.sleep(sleep_time)
+                await self.fetch()
+            else:
+                return False
+
+    async def wait_plan(
+        self, sleep_time=3, timeout=600, progress_callback: Callable = None
+    ) -> bool:
+        return await self.wait_run(
+            sleep_time=sleep_time,
+            timeout=timeout,
+            target_status=TFCRun.PLAN_TARGET_STATUS,
+            progress_callback=progress_callback,
+        )
+
+    async def wait_apply(
+        self, sleep_time=3, timeout=600, progress_callback: Callable = None
+    ) -> bool:
+        return await self.wait_run(
+            sleep_time=sleep_time,
+            timeout=timeout,
+            target_status=TFCRun.APPLY_TARGET_STATUS,
+            progress_callback=progress_callback,
+        )
+
+    async def _do_action(self, action: str, payload_json: Mapping = None) -> bool:
+        if await self.client._api.post(
+            path=f"runs/{self.id}/actions/{action}", json=payload_json
+        ):
+            await self.fetch()
+            return True
+
+    async def do_apply(self, comment: str = None) -> bool:
+        return await self._do_action("apply", {"comment": comment} if comment else None)
+
+    async def do_discard(self, comment: str = None) -> bool:
+        return await self._do_action(
+            "discard", {"comment": comment} if comment else None
+        )
+
+    async def do_cancel(self, comment: str = None, force: bool = False) -> bool:
+        return await self._do_action(
+            "force-cancel" if force else "cancel",
+            {"comment": comment} if comment else None,
+        )
+
+    async def do_force_execute(self) -> bool:
+        return await self._do_action("force-execute")
+
+
+class AsyncTFCWorkspace(AsyncTFCObject):
+    __slots__ = ()
+    type = "workspaces"
+
+    @property
+    def runs(self) -> AsyncGenerator[AsyncTFCRun, None]:
+        return self.get_list("runs")
+
+    @property
+    def vars(self) -> AsyncGenerator[AsyncTFCObject, None]:
+        return self.get_list("vars")
+
+    async def create_run(
+        self, message: str = None, is_destroy: bool = False, **kwargs
+    ) -> AsyncTFCRun:
+        model = RunModel(
+            message=message or "Queued manually via the Terraform Enterprise API",
+            is_destroy=is_destroy,
+            **kwargs,
+        )
+        payload = RootModel(
+            data=DataModel(
+                type="runs",
+                attributes=model,
+                relationships=RelationshipsModel(
+                    workspace=RootModel(data=DataModel(type=self.type, id=self.id))
+                ),
+            )
+        )
+        api_response = await self.client._api.post(
+            path="runs", data=self.client.codec.encode(payload)
+        )
+        return self.client.build(api_response.data)
+
+
+class AsyncTFCOrganization(AsyncTFCObject):
+    __slots__ = ()
+    type = "organizations"
+
+    @property
+    def workspaces(self) -> AsyncGenerator[AsyncTFCWorkspace, None]:
+        return self.get_list("workspaces")
+
+    async def workspace(self, name: str) -> AsyncTFCWorkspace:
+        api_response = await self.client._api.get(
+            path=f"organizations/{self.id}/workspaces/{name}"
+        )
+        return self.client.build(api_response.data)
+
+
+ASYNC_OBJECT_CLASSES = {
+    object_class.type: object_class
+    for object_class in (AsyncTFCRun, AsyncTFCWorkspace, AsyncTFCOrganization)
+}
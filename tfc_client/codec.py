@@ -0,0 +1,60 @@
+import json
+from typing import Any, Union
+
+from pydantic.json import pydantic_encoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from .models import KebabCaseBaseModel
+
+
+class JSONCodec(object):
+    """Encode the request bodies and decode the response bodies of the API (stdlib json)
+
+    Models are encoded from their dict (dashed keys, only the fields set), like
+    `model.json()`, without the pydantic JSON path.
+    """
+
+    name = "json"
+
+    def loads(self, content: Union[bytes, str]) -> Any:
+        return json.loads(content)
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=pydantic_encoder, separators=(",", ":")).encode(
+            "utf-8"
+        )
+
+    def encode(self, obj: Any) -> bytes:
+        """Body of a request: a model (like a RootModel payload) or plain data"""
+        if isinstance(obj, KebabCaseBaseModel):
+            obj = obj.dict()
+        return self.dumps(obj)
+
+
+class OrjsonCodec(JSONCodec):
+    """JSONCodec based on orjson (`pip install orjson`): bytes are decoded without
+    any intermediate str, and dicts are encoded natively (enums and datetimes included)
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError(
+                "orjson is required for the OrjsonCodec: pip install orjson"
+            )
+
+    def loads(self, content: Union[bytes, str]) -> Any:
+        return orjson.loads(content)
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=pydantic_encoder)
+
+
+def default_codec() -> JSONCodec:
+    """The fastest codec installed: OrjsonCodec when orjson is installed, else JSONCodec"""
+    return OrjsonCodec() if orjson is not None else JSONCodec()
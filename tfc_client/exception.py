@@ -14,3 +14,7 @@ class TFCObjectException(TFCClientException):
 
 class UnmanagedObjectTypeException(TFCObjectException):
     pass
+
+
+class TransportException(TFCClientException):
+    pass
@@ -0,0 +1,154 @@
+import csv
+import json
+from collections.abc import Mapping
+from typing import Any, Dict, Generator, Iterable, List, TextIO, TYPE_CHECKING, Union
+
+from .util import dasherize, include_param, index_included
+
+if TYPE_CHECKING:
+    from .tfc_client import TFCClient
+
+
+class Exporter(object):
+    """Stream the objects of a list endpoint as NDJSON or CSV rows, built straight
+    from the JSON of each page: no object is created, and the memory used doesn't
+    depend on the number of objects.
+
+    A field is a dotted path in the JSON of an object:
+    - "id", "type", or an attribute like "name" or "vcs-repo.identifier"
+    - a relationship, then a path in the related resource, like "current-run.status"
+      (the relationship must be included to get more than "id" and "type")
+    A list relationship gives the list of the values of each related resource.
+
+    For example:
+        exporter = Exporter(
+            client,
+            "organizations/my-org/workspaces",
+            fields=["id", "name", "terraform-version", "current-run.status"],
+            include="current-run",
+        )
+        with open("workspaces.ndjson", "w") as output:
+            exporter.to_ndjson(output)
+
+    :param client: The TFC Client instance
+    :type client: TFCClient
+    :param path: Path of the list endpoint, like "organizations/my-org/workspaces"
+    :type path: str
+    :param fields: Paths of the exported fields, or a mapping of column name -> path
+    :type fields: Union[Iterable[str], Mapping[str, str]]
+    :param include: Related resources to include, like "current-run,organization"
+    :type include: Union[str, Iterable[str]]
+    :param filters: Filters of the list endpoint
+    :type filters: Mapping
+    :param search: Search of the list endpoint
+    :type search: str
+    :param page_size: Number of objects by page (max 100). Default: 100
+    :type page_size: int
+    """
+
+    def __init__(
+        self,
+        client: "TFCClient",
+        path: str,
+        fields: Union[Iterable[str], Mapping],
+        include: Union[str, Iterable[str]] = None,
+        filters: Mapping = None,
+        search: str = None,
+        page_size: int = 100,
+    ):
+        self.client = client
+        self.path = path
+        if not isinstance(fields, Mapping):
+            fields = {field: field for field in fields}
+        self.columns: List[str] = list(fields)
+        self._paths: List[List[str]] = [
+            [dasherize(segment) for segment in field_path.split(".")]
+            for field_path in fields.values()
+        ]
+        self.include = include_param(include)
+        self.filters = filters
+        self.search = search
+        self.page_size = min(page_size, 100)
+
+    @classmethod
+    def _resolve(cls, resource: Any, path: List[str], included: Mapping) -> Any:
+        value = resource
+        for position, segment in enumerate(path):
+            if isinstance(value, list):
+                return [cls._resolve(item, path[position:], included) for item in value]
+            if not isinstance(value, Mapping):
+                return None
+            if "type" in value and "id" in value:
+                # A resource: its id, type, attributes, then relationships
+                if segment in ("id", "type"):
+                    value = value[segment]
+                    continue
+                attributes = value.get("attributes") or {}
+                if segment in attributes:
+                    value = attributes[segment]
+                    continue
+                relationship = (value.get("relationships") or {}).get(segment)
+                if relationship is None:
+                    return None
+                value = cls._related(relationship.get("data"), included)
+            else:
+                value = value.get(segment)
+        return value
+
+    @staticmethod
+    def _related(data: Any, included: Mapping) -> Any:
+        if isinstance(data, list):
+            return [included.get((item["type"], item["id"]), item) for item in data]
+        if isinstance(data, Mapping):
+            return included.get((data["type"], data["id"]), data)
+        return None
+
+    def rows(self) -> Generator[Dict[str, Any], None, None]:
+        for api_response in self.client._api.get_list(
+            path=self.path,
+            page_size=self.page_size,
+            include=self.include,
+            filters=self.filters,
+            search=self.search,
+        ):
+            included = index_included(api_response.included)
+            for resource in api_response.data:
+                yield {
+                    column: self._resolve(resource, path, included)
+                    for column, path in zip(self.columns, self._paths)
+                }
+
+    def to_ndjson(self, output: TextIO) -> int:
+        """Write one JSON object by line in `output`
+
+        :return: Number of rows written
+        """
+        count = 0
+        for row in self.rows():
+            output.write(json.dumps(row, separators=(",", ":")))
+            output.write("\n")
+            count += 1
+        return count
+
+    def to_csv(self, output: TextIO, header: bool = True) -> int:
+        """Write the rows in `output` as CSV (lists and mappings are written as JSON)
+
+        :return: Number of rows written
+        """
+        writer = csv.writer(output)
+        if header:
+            writer.writerow(self.columns)
+        count = 0
+        for row in self.rows():
+            writer.writerow(
+                [
+                    (
+                        json.dumps(value)
+                        if isinstance(value, (list, Mapping))
+                        else "" if value is None else value
+                    )
+                    for value in row.values()
+                ]
+            )
+            count += 1
+        return count
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import Optional, Tuple, TYPE_CHECKING
+import weakref
+
+if TYPE_CHECKING:
+    from .tfc_object import TFCObject
+
+
+class IdentityMap(object):
+    """Keep at most one live TFCObject per (type, id), so every reference to the same
+    organization or workspace shares one instance (and one lazy fetch of its attributes).
+
+    Objects are held by weak references: the map never keeps an object alive.
+    An entry expires `ttl` seconds after it was added (or its object refreshed), and
+    the least recently used entries are dropped above `max_size` entries.
+
+    :param ttl: Lifetime of an entry in seconds. Default: 300
+    :type ttl: float
+    :param max_size: Maximum number of entries. Default: 10000
+    :type max_size: int
+    """
+
+    def __init__(self, ttl: float = 300, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[weakref.ref, float]]"
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove_dead(self, key: Tuple[str, str], ref: weakref.ref) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] is ref:
+                del self._entries[key]
+
+    def get(self, object_type: str, object_id: str) -> Optional["TFCObject"]:
+        key = (object_type, object_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            ref, expires_at = entry
+            tfc_object = ref()
+            if tfc_object is None or expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return tfc_object
+
+    def add(self, tfc_object: "TFCObject") -> "TFCObject":
+        """Register `tfc_object`, unless another live instance is already registered
+
+        :return: The registered instance
+        """
+        registered = self.get(tfc_object.type, tfc_object.id)
+        if registered is not None:
+            return registered
+        key = (tfc_object.type, tfc_object.id)
+        ref = weakref.ref(tfc_object, lambda ref: self._remove_dead(key, ref))
+        with self._lock:
+            self._entries[key] = (ref, time.monotonic() + self.ttl)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return tfc_object
+
+    def touch(self, tfc_object: "TFCObject") -> None:
+        """Restart the TTL of the entry of `tfc_object` (like after a refresh)"""
+        key = (tfc_object.type, tfc_object.id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0]() is tfc_object:
+                self._entries[key] = (entry[0], time.monotonic() + self.ttl)
+
+    def discard(self, object_type: str, object_id: str) -> None:
+        with self._lock:
+            self._entries.pop((object_type, object_id), None)
+
+    def rekey(self, tfc_object: "TFCObject", old_id: str) -> None:
+        """Register `tfc_object` under its new id (like a renamed organization)"""
+        self.discard(tfc_object.type, old_id)
+        self.add(tfc_object)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
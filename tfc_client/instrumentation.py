@@ -0,0 +1,184 @@
+from collections import defaultdict
+import os
+import sys
+import threading
+from typing import Callable, Dict, NamedTuple, Optional
+from urllib.parse import urlsplit
+import warnings
+
+# Path segments followed by a name, not by an id
+NOT_ID_PARENTS = ("actions", "relationships")
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+THREAD_FILES = (
+    os.path.join("concurrent", "futures"),
+    os.path.join("", "threading.py"),
+)
+
+
+class RequestEvent(NamedTuple):
+    """One HTTP call (or one response served from the `ResponseCache`) of the client"""
+
+    method: str
+    # Templated path, like "workspaces/{id}/runs" ("{host}/*" for the raw URLs)
+    path: str
+    # None when served from the response cache
+    status: Optional[int]
+    # Size of the received body (0 when served from the response cache)
+    bytes: int
+    # Seconds, retries included
+    latency: float
+    retries: int
+    # "response-cache" (no HTTP call), "not-modified" (304 revalidation) or None
+    cache: Optional[str]
+    # Page number of a list call
+    page: Optional[int]
+
+
+def template_path(path: str) -> str:
+    """Replace the ids of an API path by "{id}"
+    (like "organizations/{id}/workspaces/{id}" for "organizations/my-org/workspaces/my-ws")
+    """
+    segments = path.strip("/").split("/")
+    for position in range(1, len(segments), 2):
+        if segments[position - 1] not in NOT_ID_PARENTS:
+            segments[position] = "{id}"
+    return "/".join(segments)
+
+
+def template_url(url: str) -> str:
+    """Template of a raw URL (like a pre-signed log URL): its host"""
+    return f"{urlsplit(url).netloc}/*"
+
+
+class RequestStats(object):
+    """Aggregate the request events by method and templated path: counts, errors,
+    retries, cache hits, bytes and a latency histogram
+
+    :param buckets: Upper bounds in seconds of the latency histogram buckets
+    :type buckets: Tuple[float, ...]
+    """
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, dict] = {}
+
+    def _new_endpoint(self) -> dict:
+        return {
+            "count": 0,
+            "errors": 0,
+            "retries": 0,
+            "cache-hits": 0,
+            "bytes": 0,
+            "latency-total": 0.0,
+            "latency-max": 0.0,
+            "latency-histogram": [0] * (len(self.buckets) + 1),
+        }
+
+    def __call__(self, event: RequestEvent) -> None:
+        key = f"{event.method} {event.path}"
+        bucket = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if event.latency <= bound:
+                bucket = position
+                break
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                endpoint = self._endpoints[key] = self._new_endpoint()
+            endpoint["count"] += 1
+            endpoint["errors"] += event.status is not None and event.status >= 400
+            endpoint["retries"] += event.retries
+            endpoint["cache-hits"] += event.cache is not None
+            endpoint["bytes"] += event.bytes
+            endpoint["latency-total"] += event.latency
+            endpoint["latency-max"] = max(endpoint["latency-max"], event.latency)
+            endpoint["latency-histogram"][bucket] += 1
+
+    def snapshot(self) -> dict:
+        """Copy of the aggregates: {"requests": total, "endpoints": {"GET runs/{id}": {...}}}"""
+        labels = [str(bound) for bound in self.buckets] + ["+Inf"]
+        with self._lock:
+            endpoints = {
+                key: dict(
+                    endpoint,
+                    **{
+                        "latency-histogram": dict(
+                            zip(labels, endpoint["latency-histogram"])
+                        )
+                    },
+                )
+                for key, endpoint in self._endpoints.items()
+            }
+        return {
+            "requests": sum(endpoint["count"] for endpoint in endpoints.values()),
+            "endpoints": endpoints,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+class NPlusOneWarning(UserWarning):
+    pass
+
+
+class NPlusOneDetector(object):
+    """Flag the code issuing the same GET (same templated path) again and again, like
+    the lazy load of the attributes of each object of a list: an `include` or a list
+    call would do it in one request.
+
+    The pages of a list call are not counted.
+
+    :param threshold: Number of GETs of a path from one line of code to flag. Default: 10
+    :type threshold: int
+    :param callback: Called with `call_site` ("file:line"), `path` and `count` when flagged. Default: emit a `NPlusOneWarning`
+    :type callback: Callable
+    """
+
+    def __init__(self, threshold: int = 10, callback: Callable = None):
+        self.threshold = threshold
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._counts: Dict[tuple, int] = defaultdict(int)
+
+    @staticmethod
+    def call_site() -> Optional[str]:
+        """First line of code out of this package in the current stack"""
+        frame = sys._getframe(1)
+        while frame is not None:
+            filename = os.path.abspath(frame.f_code.co_filename)
+            if not filename.startswith(PACKAGE_DIR):
+                if any(thread_file in filename for thread_file in THREAD_FILES):
+                    # A call of a worker thread (like a page read ahead)
+                    return None
+                return f"{filename}:{frame.f_lineno}"
+            frame = frame.f_back
+        return None
+
+    def __call__(self, event: RequestEvent) -> None:
+        if event.method != "GET" or event.page is not None:
+            return
+        call_site = self.call_site()
+        if call_site is None:
+            return
+        with self._lock:
+            self._counts[(call_site, event.path)] += 1
+            count = self._counts[(call_site, event.path)]
+        if count == self.threshold:
+            if self.callback:
+                self.callback(call_site=call_site, path=event.path, count=count)
+            else:
+                warnings.warn(
+                    f"{count} GET {event.path} from {call_site}: "
+                    "use an include or a list call instead",
+                    NPlusOneWarning,
+                    stacklevel=2,
+                )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
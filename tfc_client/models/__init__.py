@@ -1,17 +1,109 @@
+from copy import deepcopy
+from enum import Enum
+from typing import Any, Dict, FrozenSet, Mapping, NamedTuple
+
 import inflection
 from pydantic import BaseModel
 
+from ..util import dasherize
+
+# Types of the values used as sent by the API, without parsing
+PLAIN_TYPES = (str, bool, int, float)
+# Defaults shared by all the instances, without copy
+IMMUTABLE_TYPES = (type(None), str, bool, int, float, Enum)
+
+
+class TrustedMaps(NamedTuple):
+    """What `construct_trusted` needs to know about a model class, computed once"""
+
+    # Alias (dashed name) -> field name
+    aliases: Dict[str, str]
+    # Fields whose values must be parsed (like datetimes, enums and nested models)
+    parsed: FrozenSet[str]
+    defaults: Dict[str, Any]
+    # Defaults copied for each instance (like lists)
+    mutable_defaults: Dict[str, Any]
+
+
+# Model class -> TrustedMaps
+_TRUSTED_MAPS: Dict[type, TrustedMaps] = {}
+
 
 class KebabCaseBaseModel(BaseModel):
     class Config:
         alias_generator = inflection.dasherize
 
     def __init__(self, *args, **kwargs):
-        dashed_kwargs = {
-            inflection.dasherize(key): value for key, value in kwargs.items()
-        }
+        dashed_kwargs = {dasherize(key): value for key, value in kwargs.items()}
         super().__init__(*args, **dashed_kwargs)
 
+    @classmethod
+    def trusted_maps(cls) -> TrustedMaps:
+        maps = _TRUSTED_MAPS.get(cls)
+        if maps is None:
+            fields = cls.__fields__
+            defaults = {
+                name: field.default
+                for name, field in fields.items()
+                if not field.required
+            }
+            maps = _TRUSTED_MAPS[cls] = TrustedMaps(
+                aliases={field.alias: name for name, field in fields.items()},
+                parsed=frozenset(
+                    name
+                    for name, field in fields.items()
+                    if field.type_ not in PLAIN_TYPES
+                ),
+                defaults={
+                    name: default
+                    for name, default in defaults.items()
+                    if isinstance(default, IMMUTABLE_TYPES)
+                },
+                mutable_defaults={
+                    name: default
+                    for name, default in defaults.items()
+                    if not isinstance(default, IMMUTABLE_TYPES)
+                },
+            )
+        return maps
+
+    @classmethod
+    def construct_trusted(cls, attributes: Mapping) -> "KebabCaseBaseModel":
+        """Model of attributes sent by the API (dashed keys), built without validation
+        (like `construct`): values are kept as sent, the ones to parse are parsed by
+        `parse_field`
+        """
+        maps = cls.trusted_maps()
+        aliases = maps.aliases
+        set_values = {
+            aliases[key]: value for key, value in attributes.items() if key in aliases
+        }
+        values = dict(maps.defaults)
+        values.update(set_values)
+        for name, default in maps.mutable_defaults.items():
+            if name not in set_values:
+                values[name] = deepcopy(default)
+        model = cls.__new__(cls)
+        object.__setattr__(model, "__dict__", values)
+        object.__setattr__(model, "__fields_set__", set(set_values))
+        if getattr(cls, "__private_attributes__", None):
+            model._init_private_attributes()
+        return model
+
+    def parse_field(self, name: str) -> Any:
+        """Parse the value of a field of a `construct_trusted` model, in place
+
+        :return: The parsed value (the value as sent when the model rejects it)
+        """
+        field = self.__fields__[name]
+        value, errors = field.validate(
+            self.__dict__[name], {}, loc=field.alias, cls=self.__class__
+        )
+        if errors:
+            return self.__dict__[name]
+        self.__dict__[name] = value
+        return value
+
     def json(self, *, by_alias=True, **kwargs):
         # Manage pydantic<v1.0 compatibility
         # https://pydantic-docs.helpmanual.io/usage/exporting_models/#modeljson
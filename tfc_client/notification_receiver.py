@@ -0,0 +1,216 @@
+from collections import OrderedDict
+import hashlib
+import hmac
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import secrets
+import threading
+import time
+from typing import Iterable, List, Optional, TYPE_CHECKING
+
+from .enums import NotificationTrigger, NotificationsDestinationType
+from .exception import TFCClientException
+
+if TYPE_CHECKING:
+    from .tfc_objects import TFCNotificationConfiguration, TFCWorkspace
+
+
+class _NotificationHandler(BaseHTTPRequestHandler):
+    server: "_NotificationServer"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        receiver = self.server.receiver
+        if not receiver.verify(
+            body, self.headers.get(NotificationReceiver.SIGNATURE_HEADER)
+        ):
+            self.send_response(401)
+        else:
+            try:
+                receiver.receive(json.loads(body))
+            except (ValueError, TypeError, AttributeError):
+                self.send_response(400)
+            else:
+                self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _NotificationServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, receiver: "NotificationReceiver"):
+        self.receiver = receiver
+        super().__init__(address, _NotificationHandler)
+
+
+class NotificationReceiver(object):
+    """Small HTTP server receiving the run notifications of TFC ("generic"
+    destination), so the waits of the runs end as soon as TFC notifies a new status.
+
+    The payloads are authenticated with the HMAC-SHA512 signature TFC computes with
+    the notification token. TFC must be able to reach `url`: set `public_url` when
+    the receiver runs behind a NAT, a proxy or a tunnel.
+
+    For example:
+        with NotificationReceiver(port=8080, public_url="https://ci.example.com/tfc") as receiver:
+            receiver.register(my_ws)
+            run = my_ws.create("run", message="Push based")
+            run.wait_plan(receiver=receiver)
+
+    :param token: Secret shared with TFC to sign the notifications. Default: a random token
+    :type token: str
+    :param host: Address to listen on. Default: "0.0.0.0"
+    :type host: str
+    :param port: Port to listen on. Default: a free port
+    :type port: int
+    :param public_url: URL of the receiver for TFC, required when `host` is a wildcard address (like "0.0.0.0"). Default: "http://{host}:{port}/"
+    :type public_url: str
+    :param fallback_sleep_time: Delay in seconds between two polls of a waited run, in case a notification is lost. Default: 60
+    :type fallback_sleep_time: float
+    :param max_runs: Number of runs whose last notified status is kept (the least recently notified ones are dropped). Default: 1024
+    :type max_runs: int
+    """
+
+    SIGNATURE_HEADER = "X-TFE-Notification-Signature"
+    # Addresses listening on all the interfaces: not reachable as such by TFC
+    WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+
+    def __init__(
+        self,
+        token: str = None,
+        host: str = "0.0.0.0",
+        port: int = 0,
+        public_url: str = None,
+        fallback_sleep_time: float = 60,
+        max_runs: int = 1024,
+    ):
+        self.token = token or secrets.token_hex(32)
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self.fallback_sleep_time = fallback_sleep_time
+        self.max_runs = max_runs
+        self.configurations: List["TFCNotificationConfiguration"] = []
+        # Last status notified by run id, least recently notified first
+        self._statuses: "OrderedDict[str, str]" = OrderedDict()
+        self._condition = threading.Condition()
+        self._server: Optional[_NotificationServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        if self.public_url:
+            return self.public_url
+        if self.host in self.WILDCARD_HOSTS:
+            raise TFCClientException(
+                f"TFC can't reach a receiver listening on {self.host!r}: set public_url"
+            )
+        return f"http://{self.host}:{self.port}/"
+
+    def start(self) -> "NotificationReceiver":
+        if self._server is None:
+            self._server = _NotificationServer((self.host, self.port), self)
+            self.port = self._server.server_address[1]
+            self._thread = threading.Thread(
+                target=self._server.serve_forever,
+                name="tfc-notifications",
+                daemon=True,
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Delete the registered notification configurations and stop the server"""
+        for configuration in self.configurations:
+            configuration.client._api.delete(
+                path=f"{configuration.type}/{configuration.id}"
+            )
+        self.configurations = []
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+    def __enter__(self) -> "NotificationReceiver":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def register(
+        self,
+        workspace: "TFCWorkspace",
+        triggers: Iterable[NotificationTrigger] = None,
+        name: str = "tfc-client-receiver",
+    ) -> "TFCNotificationConfiguration":
+        """Create a generic notification configuration on `workspace` sending to
+        this receiver (deleted by `stop`)
+
+        :param triggers: Notified events. Default: all the run events
+        :type triggers: Iterable[NotificationTrigger]
+        """
+        self.start()
+        configuration = workspace.create(
+            "notification-configuration",
+            enabled=True,
+            name=name,
+            url=self.url,
+            destination_type=NotificationsDestinationType.generic,
+            token=self.token,
+            triggers=list(triggers if triggers is not None else NotificationTrigger),
+        )
+        self.configurations.append(configuration)
+        return configuration
+
+    @staticmethod
+    def signature(token: str, body: bytes) -> str:
+        return hmac.new(token.encode("utf-8"), body, hashlib.sha512).hexdigest()
+
+    def verify(self, body: bytes, signature: Optional[str]) -> bool:
+        if not signature:
+            return False
+        return hmac.compare_digest(self.signature(self.token, body), signature)
+
+    def receive(self, payload: dict) -> None:
+        """Record the run statuses of a (verified) notification payload"""
+        run_id = payload.get("run_id")
+        if not run_id:
+            # Verification payload of a new configuration
+            return
+        with self._condition:
+            for notification in payload.get("notifications") or []:
+                if notification.get("run_status"):
+                    self._statuses[run_id] = notification["run_status"]
+                    self._statuses.move_to_end(run_id)
+            while len(self._statuses) > self.max_runs:
+                self._statuses.popitem(last=False)
+            self._condition.notify_all()
+
+    def status(self, run_id: str) -> Optional[str]:
+        """Last status notified for the run `run_id`"""
+        with self._condition:
+            return self._statuses.get(run_id)
+
+    def wait(
+        self, run_id: str, target_status: Iterable[str], timeout: float = None
+    ) -> Optional[str]:
+        """Wait for a notification of the run `run_id` in one of the `target_status`
+
+        :return: The notified status, or None after `timeout` seconds
+        """
+        target_status = [getattr(status, "value", status) for status in target_status]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._statuses.get(run_id) not in target_status:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            return self._statuses[run_id]
@@ -0,0 +1,106 @@
+import threading
+from typing import Dict, Generator, Optional, Tuple
+
+# Maximum page[size] accepted by the TFC API
+MAX_PAGE_SIZE = 100
+
+
+def limited_page(offset: int, remaining: int, page_size: int) -> Tuple[int, int]:
+    """Page number and size to get the `remaining` objects following the first `offset`
+    ones (a multiple of `page_size`), with as few extra objects as possible.
+
+    Pages are numbered from the size (the objects of page n start at (n - 1) * size):
+    the smallest size dividing `offset` and holding `remaining` objects is used, like
+    page 5 of 50 objects for the 50 objects after the first 200 (2 pages of 100).
+    """
+    if remaining >= page_size:
+        return offset // page_size + 1, page_size
+    if offset == 0:
+        return 1, remaining
+    for size in range(remaining, page_size):
+        if offset % size == 0:
+            return offset // size + 1, size
+    return offset // page_size + 1, page_size
+
+
+def page_plan(
+    page_number: int, page_size: int, limit: int = None
+) -> Generator[Tuple[int, int, int], None, None]:
+    """Page number, page size and offset of the pages to get, from `page_number`, to
+    list at most `limit` objects (the last page is shrunk to the remaining objects)
+    """
+    offset = (page_number - 1) * page_size
+    end = None if limit is None else offset + limit
+    while end is None or offset < end:
+        if end is None or end - offset >= page_size:
+            yield offset // page_size + 1, page_size, offset
+            offset += page_size
+        else:
+            number, size = limited_page(offset, end - offset, page_size)
+            yield number, size, offset
+            return
+
+
+class PageSizeTuner(object):
+    """Page size of the list calls, tuned by endpoint (templated path) from the latency
+    and the size of the pages: the biggest pages (fewest requests) unless they take
+    more than `target_latency` or `max_bytes`, then smaller ones.
+
+    Sizes are multiples of 10 and only change when the pages are off target by more
+    than 25%, to keep the same URLs (and the conditional/response cache entries).
+
+    :param initial: Page size of an endpoint not observed yet. Default: 100
+    :type initial: int
+    :param min_size: Smallest tuned page size. Default: 10
+    :type min_size: int
+    :param target_latency: Seconds a page should take at most. Default: 2
+    :type target_latency: float
+    :param max_bytes: Size a page should have at most. Default: 2 MB
+    :type max_bytes: int
+    """
+
+    def __init__(
+        self,
+        initial: int = MAX_PAGE_SIZE,
+        min_size: int = 10,
+        target_latency: float = 2.0,
+        max_bytes: int = 2_000_000,
+    ):
+        self.initial = min(initial, MAX_PAGE_SIZE)
+        self.min_size = min_size
+        self.target_latency = target_latency
+        self.max_bytes = max_bytes
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def size(self, path: str) -> int:
+        return self._sizes.get(path, self.initial)
+
+    def observe(self, path: str, page_size: int, latency: float, size: int) -> None:
+        """Adjust the page size of `path` after a page of `page_size` objects took
+        `latency` seconds and `size` bytes (pages of another size are ignored)
+        """
+        with self._lock:
+            current = self._sizes.get(path, self.initial)
+            if page_size != current:
+                return
+            factor = min(
+                self.target_latency / latency if latency > 0 else 2.0,
+                self.max_bytes / size if size > 0 else 2.0,
+                2.0,
+            )
+            if 0.8 <= factor <= 1.25:
+                return
+            tuned = int(current * factor) // 10 * 10
+            self._sizes[path] = max(self.min_size, min(tuned, MAX_PAGE_SIZE))
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._sizes)
+
+    def reset(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._sizes.clear()
+            else:
+                self._sizes.pop(path, None)
@@ -0,0 +1,115 @@
+import hashlib
+import re
+from typing import Iterable, List, Optional, Tuple
+
+
+class PlanLogSummary(object):
+    """Structured summary of a plan log (without ANSI escape sequences), built in one
+    pass over its lines. Lines can be fed as they come, like from `TFCPlan.tail_log()`:
+
+        summary = PlanLogSummary()
+        for line in plan.tail_log():
+            summary.feed(line)
+
+    - `resume`: the resource lines ("  + ", "  - ", "-/+ ", "  ~ ")
+    - `changes`: the log from "Terraform will perform the following actions"
+    - `signature`: sha256 of `resume`
+    - `resources`: (address, action) of each planned resource change
+    - `add` / `change` / `destroy`: counts of the "Plan: ..." line (None if absent)
+    """
+
+    RESUME_PREFIXES = ("  + ", "  - ", "-/+ ", "  ~ ")
+    CHANGES_START = "Terraform will perform the following actions"
+    # Terraform >= 0.12: "  # aws_instance.web will be created"
+    RESOURCE_ACTION = re.compile(
+        r"^\s*# (?P<address>\S+) (?:will|must) be "
+        r"(?P<action>created|destroyed|updated in-place|replaced|read during apply)"
+    )
+    # Terraform 0.11: "  + aws_instance.web", "-/+ aws_instance.web (new resource required)"
+    LEGACY_RESOURCE = re.compile(r"^(?P<symbol>  [+~-]|-/\+| <=) (?P<address>[^\s(]+)")
+    PLAN_COUNTS = re.compile(
+        r"^Plan: (?:\d+ to import, )?(?P<add>\d+) to add, "
+        r"(?P<change>\d+) to change, (?P<destroy>\d+) to destroy"
+    )
+    NO_CHANGES = re.compile(r"^No changes\.")
+    ACTIONS = {
+        "created": "create",
+        "destroyed": "delete",
+        "updated in-place": "update",
+        "replaced": "replace",
+        "read during apply": "read",
+        "  +": "create",
+        "  -": "delete",
+        "  ~": "update",
+        "-/+": "replace",
+        " <=": "read",
+    }
+
+    def __init__(self):
+        self.resume_lines: List[str] = []
+        self.changes_lines: List[str] = []
+        self.add: Optional[int] = None
+        self.change: Optional[int] = None
+        self.destroy: Optional[int] = None
+        self._resources: List[Tuple[str, str]] = []
+        self._legacy_resources: List[Tuple[str, str]] = []
+        self._in_changes = False
+        self._signature = hashlib.sha256()
+
+    @classmethod
+    def parse(cls, lines: Iterable[str]) -> "PlanLogSummary":
+        summary = cls()
+        for line in lines:
+            summary.feed(line)
+        return summary
+
+    def feed(self, line: str) -> None:
+        if not self._in_changes and line.startswith(self.CHANGES_START):
+            self._in_changes = True
+        if self._in_changes:
+            self.changes_lines.append(line)
+
+        if line.startswith(self.RESUME_PREFIXES):
+            if self.resume_lines:
+                self._signature.update(b"\n")
+            self._signature.update(line.encode("utf-8"))
+            self.resume_lines.append(line)
+
+        if "#" in line:
+            match = self.RESOURCE_ACTION.match(line)
+            if match:
+                self._resources.append(
+                    (match["address"], self.ACTIONS[match["action"]])
+                )
+                return
+        match = self.LEGACY_RESOURCE.match(line)
+        if match and match["address"] not in ("resource", "data"):
+            self._legacy_resources.append(
+                (match["address"], self.ACTIONS[match["symbol"]])
+            )
+            return
+
+        if line.startswith("Plan: "):
+            match = self.PLAN_COUNTS.match(line)
+            if match:
+                self.add = int(match["add"])
+                self.change = int(match["change"])
+                self.destroy = int(match["destroy"])
+        elif self.NO_CHANGES.match(line):
+            self.add = self.change = self.destroy = 0
+
+    @property
+    def resources(self) -> List[Tuple[str, str]]:
+        return self._resources or self._legacy_resources
+
+    @property
+    def resume(self) -> str:
+        return "\n".join(self.resume_lines)
+
+    @property
+    def changes(self) -> str:
+        return "".join(line + "\n" for line in self.changes_lines)
+
+    @property
+    def signature(self) -> str:
+        return self._signature.hexdigest()
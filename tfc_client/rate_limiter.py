@@ -0,0 +1,153 @@
+from collections.abc import Mapping
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter(object):
+    """Token bucket pacing all the API requests of a client (TFC allows 30 requests
+    per second and per token), with the retry policy for throttled and failed calls.
+
+    The budget is adjusted with the `X-RateLimit-*` headers sent by the API, and a
+    `Retry-After` on a 429 response pauses every caller sharing the bucket.
+
+    :param rate: Sustained number of requests per second. Default: 30
+    :type rate: float
+    :param burst: Number of requests that can be sent at once. Default: `rate`
+    :type burst: int
+    :param max_retries: Number of retries of a throttled (429) or failed (5xx) idempotent call. Default: 5
+    :type max_retries: int
+    :param backoff_base: Base delay in seconds of the exponential backoff. Default: 0.5
+    :type backoff_base: float
+    :param backoff_max: Maximum delay in seconds between two retries. Default: 30
+    :type backoff_max: float
+    """
+
+    IDEMPOTENT_METHODS = ["get", "head", "options", "put", "delete"]
+    RETRY_STATUS_CODES = [500, 502, 503, 504]
+
+    def __init__(
+        self,
+        rate: float = 30,
+        burst: int = None,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30,
+    ):
+        self._configured_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._server_limit = None
+        self._server_remaining = None
+        self._server_reset = None
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """Take a token without waiting (like for an asyncio caller, which sleeps with
+        `asyncio.sleep`)
+
+        :return: Time to wait in seconds before sending the request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            return max(-self._tokens / self.rate, self._paused_until - now, 0.0)
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until one is available
+
+        :return: Time waited in seconds
+        """
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, delay: float) -> None:
+        """Hold every caller for `delay` seconds"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def update(self, headers: Mapping) -> None:
+        """Adjust the budget with the `X-RateLimit-*` headers of a response"""
+        limit = self._parse_float(headers.get("X-RateLimit-Limit"))
+        remaining = self._parse_float(headers.get("X-RateLimit-Remaining"))
+        reset = self._parse_float(headers.get("X-RateLimit-Reset"))
+        if limit:
+            self._server_limit = limit
+            self.rate = min(self._configured_rate, limit)
+        if remaining is not None:
+            self._server_remaining = remaining
+            self._server_reset = reset
+            if remaining <= 0 and reset:
+                self.pause(reset)
+
+    def should_retry(self, method: str, status_code: int, attempt: int) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if status_code == 429:
+            # A throttled request has not been processed: always safe to send again
+            return True
+        return (
+            status_code in self.RETRY_STATUS_CODES
+            and method.lower() in self.IDEMPOTENT_METHODS
+        )
+
+    def retry_delay(self, attempt: int, retry_after: str = None) -> float:
+        """Delay before the retry number `attempt` (from 0): the `Retry-After` value
+        when the API sent one, else an exponential backoff with full jitter
+        """
+        delay = self._parse_retry_after(retry_after)
+        if delay is not None:
+            return min(delay, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    @property
+    def budget(self) -> Mapping:
+        """Current state of the budget: local tokens left and the last values sent by the API"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "rate": self.rate,
+                "tokens": max(self._tokens, 0.0),
+                "paused-for": max(self._paused_until - now, 0.0),
+                "limit": self._server_limit,
+                "remaining": self._server_remaining,
+                "reset": self._server_reset,
+            }
+
+    @staticmethod
+    def _parse_float(value) -> Optional[float]:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def _parse_retry_after(cls, retry_after: str) -> Optional[float]:
+        if retry_after is None:
+            return None
+        delay = cls._parse_float(retry_after)
+        if delay is None:
+            try:
+                retry_date = parsedate_to_datetime(retry_after)
+            except (TypeError, ValueError):
+                return None
+            delay = retry_date.timestamp() - time.time()
+        return max(delay, 0.0)
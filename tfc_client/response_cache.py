@@ -0,0 +1,187 @@
+from collections.abc import Mapping
+from fnmatch import fnmatchcase
+import sqlite3
+import threading
+import time
+from typing import Optional, Set
+from urllib.parse import urlencode
+import zlib
+
+
+class ResponseCache(object):
+    """Persistent cache of the API GET responses, in a SQLite database that many
+    processes (like cron jobs) can share.
+
+    Bodies are stored compressed. Each entry expires after the TTL of the first
+    `ttl_policies` pattern matching its path (`fnmatch` style, like "runs/*"), or
+    after `ttl`. Above `max_size` bytes, the least recently used entries are dropped.
+    Writes through the client (post, put, patch, delete) drop the cached responses
+    of the object types they touch.
+
+    :param path: Path of the SQLite database file
+    :type path: str
+    :param ttl: Default lifetime of an entry in seconds. Default: 300
+    :type ttl: float
+    :param ttl_policies: Lifetime of the entries by path pattern (0 to never cache them). Default: `DEFAULT_TTL_POLICIES` (the polled runs, plans and applies are never cached)
+    :type ttl_policies: Mapping[str, float]
+    :param max_size: Maximum total size of the (compressed) bodies in bytes. Default: 100MB
+    :type max_size: int
+    :param compress_level: zlib compression level. Default: 6
+    :type compress_level: int
+    """
+
+    # A write on a type also changes the responses of these types
+    RELATED_TYPES = {
+        "runs": ("workspaces", "plans", "applies"),
+        "configuration-versions": ("workspaces", "runs"),
+    }
+    NOT_TYPES = ("actions", "relationships")
+    # Polled until they reach a final status: a cached response would be stale
+    DEFAULT_TTL_POLICIES = {
+        "runs/*": 0,
+        "workspaces/*/runs": 0,
+        "plans/*": 0,
+        "applies/*": 0,
+    }
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 300,
+        ttl_policies: Mapping = None,
+        max_size: int = 100 * 1024 * 1024,
+        compress_level: int = 6,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.ttl_policies = (
+            self.DEFAULT_TTL_POLICIES if ttl_policies is None else ttl_policies
+        )
+        self.max_size = max_size
+        self.compress_level = compress_level
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    types TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads: one per thread
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def key(namespace: str, path: str, params: Optional[Mapping]) -> str:
+        query = (
+            urlencode(sorted((str(k), str(v)) for k, v in params.items()))
+            if params
+            else ""
+        )
+        return f"{namespace}:{path}?{query}"
+
+    @classmethod
+    def types_of(cls, path: str) -> Set[str]:
+        """Object types of a path (like {"organizations", "workspaces"} for
+        "organizations/my-org/workspaces/my-ws")
+        """
+        segments = path.strip("/").split("/")
+        return {
+            segment
+            for segment in segments[::2]
+            if segment and segment not in cls.NOT_TYPES
+        }
+
+    def ttl_of(self, path: str) -> float:
+        for pattern, ttl in self.ttl_policies.items():
+            if fnmatchcase(path, pattern):
+                return ttl
+        return self.ttl
+
+    def get(self, namespace: str, path: str, params: Mapping = None) -> Optional[bytes]:
+        key = self.key(namespace, path, params)
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT body, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return zlib.decompress(row[0])
+
+    def set(
+        self, namespace: str, path: str, params: Optional[Mapping], content: bytes
+    ) -> None:
+        ttl = self.ttl_of(path)
+        if ttl <= 0:
+            return
+        body = zlib.compress(content, self.compress_level)
+        now = time.time()
+        types = "".join(
+            f"|{object_type}|" for object_type in sorted(self.types_of(path))
+        )
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.key(namespace, path, params),
+                    types,
+                    body,
+                    len(body),
+                    now + ttl,
+                    now,
+                ),
+            )
+            self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        (total_size,) = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total_size <= self.max_size:
+            return
+        connection.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        (total_size,) = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        to_free = total_size - int(self.max_size * 0.9)
+        for key, size in connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall():
+            if to_free <= 0:
+                break
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            to_free -= size
+
+    def invalidate(self, path: str) -> None:
+        """Drop the cached responses of the object types touched by a write on `path`"""
+        object_types = self.types_of(path)
+        for object_type in list(object_types):
+            object_types |= set(self.RELATED_TYPES.get(object_type, ()))
+        with self._connection() as connection:
+            for object_type in object_types:
+                connection.execute(
+                    "DELETE FROM responses WHERE types LIKE ?", (f"%|{object_type}|%",)
+                )
+
+    def clear(self) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM responses")
@@ -0,0 +1,286 @@
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import itertools
+import time
+from typing import Callable, Dict, Generator, List, Optional, Set, TYPE_CHECKING
+
+from .enums import RunStatus
+from .page_size import MAX_PAGE_SIZE
+from .util import index_included
+
+if TYPE_CHECKING:
+    from .tfc_client import TFCClient
+    from .tfc_objects import TFCRun
+
+
+class RunWaiter(object):
+    """Wait for many runs at once, and get each run as soon as it reaches one of the
+    target statuses.
+
+    The run waited in a workspace is first looked for as its current run: one
+    `organizations/{name}/workspaces?include=current_run` page refreshes the runs of
+    up to 100 workspaces (when the organization of the runs is known). The other
+    runs are grouped by workspace: one `workspaces/{id}/runs` page refreshes the
+    statuses of all the runs waited in a workspace. A run not found in the first
+    `max_pages` pages (an old run of a busy workspace) is fetched on its own. Polls
+    of all the workspaces are scheduled on one timer, so only one thread sleeps, and
+    the polls due at the same time are sent concurrently.
+
+    For example:
+        for run in RunWaiter(client, runs, target_status=TFCRun.PLAN_TARGET_STATUS):
+            print(f"{run.id} is {run.status}")
+
+    Polls don't read the `ResponseCache` of the client: the statuses are never stale.
+
+    :param client: The TFC Client instance
+    :type client: TFCClient
+    :param runs: Runs to wait for
+    :type runs: Iterable[TFCRun]
+    :param target_status: Statuses to wait for. Default: `TFCRun.PLAN_TARGET_STATUS`
+    :type target_status: List[RunStatus]
+    :param sleep_time: Delay in seconds between two polls of a workspace. Default: 3
+    :type sleep_time: float
+    :param timeout: Time in seconds after which the runs still pending are not waited anymore. Default: 600
+    :type timeout: float
+    :param page_size: Number of runs by page of a workspace runs list (max 100). Default: 20
+    :type page_size: int
+    :param max_pages: Number of pages of a workspace runs list read at each poll. Default: 1
+    :type max_pages: int
+    :param progress_callback: Called with `run` and `duration` for each run still pending after a poll
+    :type progress_callback: Callable
+    :param organization: Name of the organization of the runs. Default: the organization of their workspaces, when loaded
+    :type organization: str
+    :param workers: Maximum number of polls sent concurrently. Default: 8
+    :type workers: int
+    """
+
+    def __init__(
+        self,
+        client: "TFCClient",
+        runs: Iterable = (),
+        target_status: List[RunStatus] = None,
+        sleep_time: float = 3,
+        timeout: float = 600,
+        page_size: int = 20,
+        max_pages: int = 1,
+        progress_callback: Callable = None,
+        organization: str = None,
+        workers: int = 8,
+    ):
+        self.client = client
+        if target_status is None:
+            from .tfc_objects import TFCRun
+
+            target_status = TFCRun.PLAN_TARGET_STATUS
+        self.target_status = target_status
+        self.sleep_time = sleep_time
+        self.timeout = timeout
+        self.page_size = min(page_size, 100)
+        self.max_pages = max(max_pages, 1)
+        self.progress_callback = (
+            progress_callback if callable(progress_callback) else None
+        )
+        self.organization = organization
+        self.workers = max(workers, 1)
+        # Workspace id (None for the runs without workspace) -> {run id: run}
+        self._groups: Dict[Optional[str], Dict[str, "TFCRun"]] = {}
+        # Workspace id -> name of its organization, when known
+        self._organizations: Dict[str, str] = {}
+        # Workspaces whose waited run was not their current run: polled on their own
+        self._not_current: Set[str] = set()
+        # Organization name -> number of pages of its workspaces list
+        self._organization_pages: Dict[str, int] = {}
+        for run in runs:
+            self.add(run)
+
+    def add(self, run: "TFCRun") -> None:
+        workspace = (run.relationships or {}).get("workspace")
+        workspace_id = workspace.id if workspace is not None else None
+        self._groups.setdefault(workspace_id, {})[run.id] = run
+        if workspace_id is None:
+            return
+        organization = self.organization
+        if organization is None:
+            # Only from a loaded workspace: don't fetch it for that
+            relationships = workspace.attrs.get("relationships") or {}
+            if relationships.get("organization") is not None:
+                organization = relationships["organization"].id
+        if organization is not None:
+            self._organizations[workspace_id] = organization
+
+    @property
+    def pending(self) -> List["TFCRun"]:
+        """Runs which didn't reach a target status (yet)"""
+        return [run for runs in self._groups.values() for run in runs.values()]
+
+    def _reached(self, run: "TFCRun") -> bool:
+        return run.status in self.target_status
+
+    def _load(self, run: "TFCRun", data: dict) -> None:
+        run.refresh()
+        run._init_from_data(data)
+
+    def _poll_organization(
+        self, organization: str, workspace_ids: List[str], executor: ThreadPoolExecutor
+    ) -> Set[str]:
+        """Refresh the waited runs which are the current run of their workspace, from
+        the workspaces list of `organization` (current runs included)
+
+        :return: Ids of the workspaces whose waited run was refreshed
+        """
+        path = f"organizations/{organization}/workspaces"
+
+        def get_page(page_number: int):
+            return self.client._api.get(
+                path=path,
+                params={
+                    "page[number]": page_number,
+                    "page[size]": MAX_PAGE_SIZE,
+                    "include": "current_run",
+                },
+                bypass_cache=True,
+            )
+
+        api_responses = [get_page(1)]
+        pagination = (api_responses[0].meta or {}).get("pagination", {})
+        total_pages = pagination.get("total-pages") or 1
+        self._organization_pages[organization] = total_pages
+        if total_pages > len(workspace_ids):
+            # More pages than workspace polls: not worth it
+            return set()
+        api_responses += executor.map(get_page, range(2, total_pages + 1))
+
+        wanted = set(workspace_ids)
+        refreshed = set()
+        for api_response in api_responses:
+            included = index_included(api_response.included)
+            for workspace_data in api_response.data:
+                if workspace_data["id"] not in wanted:
+                    continue
+                relationships = workspace_data.get("relationships") or {}
+                run_ref = (relationships.get("current-run") or {}).get("data")
+                runs = self._groups[workspace_data["id"]]
+                if (
+                    run_ref
+                    and run_ref["id"] in runs
+                    and ("runs", run_ref["id"]) in included
+                ):
+                    self._load(runs[run_ref["id"]], included[("runs", run_ref["id"])])
+                    refreshed.add(workspace_data["id"])
+        # The others wait for a run which is not (or not yet) the current one
+        self._not_current.update(wanted - refreshed)
+        return refreshed
+
+    def _poll_due(
+        self, workspace_ids: List[Optional[str]], executor: ThreadPoolExecutor
+    ) -> None:
+        """Refresh the runs of the workspaces due for a poll, concurrently"""
+        # Workspaces waiting for a single run, maybe their current one, by organization
+        by_organization: Dict[str, List[str]] = {}
+        for workspace_id in workspace_ids:
+            organization = self._organizations.get(workspace_id)
+            if (
+                organization is not None
+                and workspace_id not in self._not_current
+                and len(self._groups[workspace_id]) == 1
+            ):
+                by_organization.setdefault(organization, []).append(workspace_id)
+        refreshed = set()
+        for organization, candidates in by_organization.items():
+            if len(candidates) > self._organization_pages.get(organization, 1):
+                refreshed |= self._poll_organization(organization, candidates, executor)
+
+        others = [
+            workspace_id
+            for workspace_id in workspace_ids
+            if workspace_id not in refreshed
+        ]
+        list(
+            executor.map(
+                lambda workspace_id: self._poll(
+                    workspace_id, self._groups[workspace_id]
+                ),
+                others,
+            )
+        )
+
+    def _poll(self, workspace_id: Optional[str], runs: Dict[str, "TFCRun"]) -> None:
+        missing = set(runs)
+        if workspace_id is not None:
+            path = f"workspaces/{workspace_id}/runs"
+            for page_number in range(1, self.max_pages + 1):
+                api_response = self.client._api.get(
+                    path=path,
+                    params={"page[number]": page_number, "page[size]": self.page_size},
+                    bypass_cache=True,
+                )
+                for run_data in api_response.data:
+                    if run_data["id"] in missing:
+                        self._load(runs[run_data["id"]], run_data)
+                        missing.discard(run_data["id"])
+                pagination = (api_response.meta or {}).get("pagination", {})
+                if not missing or not pagination.get("next-page"):
+                    break
+        for run_id in missing:
+            api_response = self.client._api.get(
+                path=f"runs/{run_id}", bypass_cache=True
+            )
+            self._load(runs[run_id], api_response.data)
+
+    def __iter__(self) -> Generator["TFCRun", None, None]:
+        start_time = time.monotonic()
+        counter = itertools.count()
+        schedule = []
+        for workspace_id, runs in self._groups.items():
+            # Runs already loaded in a target status don't need any call
+            for run_id, run in list(runs.items()):
+                if "attributes" in run.attrs and self._reached(run):
+                    del runs[run_id]
+                    yield run
+            if runs:
+                heapq.heappush(schedule, (start_time, next(counter), workspace_id))
+
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="tfc-runs"
+        ) as executor:
+            while schedule:
+                poll_time = schedule[0][0]
+                if poll_time - start_time > self.timeout:
+                    break
+                delay = poll_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                # All the workspaces due by now are polled together
+                now = time.monotonic()
+                due = []
+                while schedule and schedule[0][0] <= now:
+                    due.append(heapq.heappop(schedule)[2])
+
+                self._poll_due(due, executor)
+                # Polled together, scheduled together: the batches stay whole
+                next_poll_time = time.monotonic() + self.sleep_time
+                duration = int(time.monotonic() - start_time)
+                for workspace_id in due:
+                    runs = self._groups[workspace_id]
+                    for run_id, run in list(runs.items()):
+                        if self._reached(run):
+                            del runs[run_id]
+                            yield run
+                        elif self.progress_callback:
+                            self.progress_callback(run=run, duration=duration)
+                    if runs:
+                        heapq.heappush(
+                            schedule, (next_poll_time, next(counter), workspace_id)
+                        )
+                    else:
+                        del self._groups[workspace_id]
+
+    def wait(self) -> bool:
+        """Wait for all the runs
+
+        :return: True if every run reached a target status before the timeout
+        """
+        for _ in self:
+            pass
+        return not self.pending
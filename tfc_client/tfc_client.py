@@ -1,16 +1,22 @@
-from collections.abc import Mapping, Iterable
+from collections.abc import Mapping
 import hashlib
-import importlib
 import re
 import time
-from typing import Generator, NoReturn
+from typing import Callable, Generator, Iterable, List, NoReturn, Optional, Tuple, Union
 
 from .exception import UnmanagedObjectTypeException
 from .models.data import DataModel, RootModel
 from .models.organization import OrganizationModel
-from .util import InflectionStr
+from .util import TypeRegistry, include_param, index_included, type_name
 
 from .api_caller import APICaller
+from .codec import JSONCodec
+from .identity_map import IdentityMap
+from .instrumentation import NPlusOneDetector, RequestEvent, RequestStats
+from .rate_limiter import RateLimiter
+from .response_cache import ResponseCache
+from .run_waiter import RunWaiter
+from .transport import Transport
 from .tfc_object import TFCObject
 from .tfc_objects import TFCOrganization
 
@@ -28,19 +34,148 @@ class TFCClient(object):
     :type token: str
     :param url: TFC API URL. Default: "https://app.terraform.io"
     :type url: str
+    :param pool_connections: Number of per-host connection pools kept by the HTTP session. Default: 10
+    :type pool_connections: int
+    :param pool_maxsize: Maximum number of keep-alive connections per host. Default: 10
+    :type pool_maxsize: int
+    :param timeout: Request timeout in seconds, a single value or a (connect, read) tuple. Default: no timeout
+    :type timeout: Union[float, Tuple[float, float]]
+    :param prewarm: Number of connections to open to the API at init (0 to disable). Default: 0
+    :type prewarm: int
+    :param page_workers: Number of list pages fetched concurrently, ahead of the consumer (0 to disable). Default: 4
+    :type page_workers: int
+    :param page_size: Number of objects by list page (max 100). Default: None (100, shrunk by endpoint when the pages are slow or big)
+    :type page_size: int
+    :param rate_limit: Maximum number of API requests per second (None to disable pacing and retries). Default: 30
+    :type rate_limit: float
+    :param max_retries: Number of retries of throttled (429) and failed (5xx) idempotent calls. Default: 5
+    :type max_retries: int
+    :param conditional_cache_size: Number of GET responses kept to revalidate them with ETag / Last-Modified (0 to disable). Default: 256
+    :type conditional_cache_size: int
+    :param conditional_cache_bytes: Maximum total size of the bodies of these responses (a bigger body, like a large list page, is not kept). Default: 16MB
+    :type conditional_cache_bytes: int
+    :param response_cache: Persistent cache of the GET responses, shared between processes. Default: None (no cache)
+    :type response_cache: ResponseCache
+    :param identity_map: Share one instance per object type and id (True for the default IdentityMap settings). Default: False
+    :type identity_map: Union[bool, IdentityMap]
+    :param detect_n_plus_one: Warn about the code repeating the same GET (True for the default NPlusOneDetector settings). Default: False
+    :type detect_n_plus_one: Union[bool, NPlusOneDetector]
+    :param codec: JSON codec of the request and response bodies. Default: orjson when installed, else the stdlib json
+    :type codec: JSONCodec
+    :param transport: Send the HTTP requests, like a `RecordingTransport` or a `ReplayTransport` (the pool settings are then ignored). Default: a keep-alive `requests.Session`
+    :type transport: Transport
     """
 
     OBJECTS_MODULE = "tfc_client.tfc_objects"
+    # Type -> object class (like "workspaces" -> TFCWorkspace), from OBJECTS_MODULE
+    object_classes = TypeRegistry(OBJECTS_MODULE, prefix="TFC", base=TFCObject)
 
-    def __init__(self, token: str, url: str = "https://app.terraform.io"):
+    def __init__(
+        self,
+        token: str,
+        url: str = "https://app.terraform.io",
+        *,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        timeout: Union[float, Tuple[float, float], None] = None,
+        prewarm: int = 0,
+        page_workers: int = 4,
+        page_size: Optional[int] = None,
+        rate_limit: Optional[float] = 30,
+        max_retries: int = 5,
+        conditional_cache_size: int = 256,
+        conditional_cache_bytes: int = 16 * 1024 * 1024,
+        response_cache: ResponseCache = None,
+        identity_map: Union[bool, IdentityMap] = False,
+        detect_n_plus_one: Union[bool, NPlusOneDetector] = False,
+        codec: JSONCodec = None,
+        transport: Transport = None,
+    ):
         headers = {
             "Content-Type": "application/vnd.api+json",
             "Authorization": "Bearer {}".format(token),
         }
-        self._api = APICaller(host=url, base_url="api/v2", headers=headers)
+        self.rate_limiter = (
+            RateLimiter(rate=rate_limit, max_retries=max_retries)
+            if rate_limit
+            else None
+        )
+        self._api = APICaller(
+            host=url,
+            base_url="api/v2",
+            headers=headers,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            timeout=timeout,
+            page_workers=page_workers,
+            page_size=page_size,
+            codec=codec,
+            rate_limiter=self.rate_limiter,
+            conditional_cache_size=conditional_cache_size,
+            conditional_cache_bytes=conditional_cache_bytes,
+            response_cache=response_cache,
+            transport=transport,
+        )
+        self.codec = self._api.codec
+        self.request_stats = RequestStats()
+        self._api.add_listener(self.request_stats)
+        if detect_n_plus_one is True:
+            detect_n_plus_one = NPlusOneDetector()
+        if isinstance(detect_n_plus_one, NPlusOneDetector):
+            self._api.add_listener(detect_n_plus_one)
+        if prewarm:
+            self._api.prewarm(connections=prewarm)
+        if identity_map is True:
+            identity_map = IdentityMap()
+        self.identity_map = (
+            identity_map if isinstance(identity_map, IdentityMap) else None
+        )
+
+    def close(self) -> NoReturn:
+        self._api.close()
+
+    def add_listener(self, listener: Callable[[RequestEvent], None]) -> NoReturn:
+        """Call `listener` with a `RequestEvent` after each request of the client
+        (method, templated path, status, bytes, latency, retries, cache hit), like to
+        feed a tracing or metrics backend
+        """
+        self._api.add_listener(listener)
+
+    def remove_listener(self, listener: Callable[[RequestEvent], None]) -> NoReturn:
+        self._api.remove_listener(listener)
+
+    def stats(self, reset: bool = False) -> dict:
+        """Counts and latency histograms of the requests of the client, by method and
+        templated path (like "GET workspaces/{id}/runs")
 
-    def get(self, object_type: str, id: str) -> TFCObject:
-        object_type = InflectionStr(object_type).dasherize.pluralize
+        :param reset: Start new aggregates after this snapshot. Default: False
+        :type reset: bool
+        """
+        snapshot = self.request_stats.snapshot()
+        if reset:
+            self.request_stats.reset()
+        return snapshot
+
+    def __enter__(self) -> "TFCClient":
+        return self
+
+    def __exit__(self, *exc_info) -> NoReturn:
+        self.close()
+
+    def get(
+        self, object_type: str, id: str, include: Union[str, Iterable[str]] = None
+    ) -> TFCObject:
+        """Get an object by id: its attributes are fetched on first access, or at once
+        with the related resources of `include` (like "plan,apply" for a run)
+        """
+        object_type = type_name(object_type)
+        if include:
+            api_response = self._api.get(
+                path=f"{object_type}/{id}", params={"include": include_param(include)}
+            )
+            return self.factory(
+                api_response.data, include=index_included(api_response.included)
+            )
         return self.factory({"type": object_type, "id": id})
 
     def create_organization(self, **kwargs) -> TFCOrganization:
@@ -48,11 +183,15 @@ class TFCClient(object):
         payload = RootModel(
             data=DataModel(type="organizations", attributes=organization_model)
         )
-        api_response = self._api.post(path=f"organizations", data=payload.json())
+        api_response = self._api.post(
+            path=f"organizations", data=self.codec.encode(payload)
+        )
         return self.factory(api_response.data)
 
     def destroy_organization(self, organization_name: str) -> NoReturn:
         self._api.delete(path=f"organizations/{organization_name}")
+        if self.identity_map is not None:
+            self.identity_map.discard("organizations", organization_name)
 
     @property
     def organizations(self) -> Generator[TFCObject, None, None]:
@@ -60,14 +199,28 @@ class TFCClient(object):
             for org_data in api_response.data:
                 yield self.factory(org_data)
 
-    def factory(self, data: dict, include: str = None) -> TFCObject:
+    def wait_runs(self, runs: Iterable, **kwargs) -> RunWaiter:
+        """Wait for many runs at once: iterate on the result to get each run as soon
+        as it reaches a target status (see `RunWaiter` for the options)
+        """
+        return RunWaiter(self, runs, **kwargs)
+
+    def factory(
+        self, data: dict, include: Union[List[dict], Mapping] = None
+    ) -> TFCObject:
         if "id" not in data or "type" not in data:
             raise UnmanagedObjectTypeException("No type and/or id in data")
-        object_type = InflectionStr(data["type"]).singularize.underscore.camelize
-        class_name = "TFC{type}".format(type=object_type)
-        module = importlib.import_module(TFCClient.OBJECTS_MODULE)
-        try:
-            tfc_class = getattr(module, class_name)
-            return tfc_class(client=self, data=data, include=include)
-        except AttributeError:
-            return TFCObject(client=self, data=data, include=include)
+        if self.identity_map is not None:
+            tfc_object = self.identity_map.get(data["type"], data["id"])
+            if tfc_object is not None:
+                # Fresher data for a shared instance
+                tfc_object._init_from_data(data)
+                if include:
+                    tfc_object._include(include)
+                return tfc_object
+
+        tfc_class = self.object_classes.get(data["type"]) or TFCObject
+        tfc_object = tfc_class(client=self, data=data, include=include)
+        if self.identity_map is not None:
+            tfc_object = self.identity_map.add(tfc_object)
+        return tfc_object
@@ -1,12 +1,26 @@
-from collections.abc import Mapping, Iterable
-import importlib
-from typing import Any, Dict, Generator, List, NoReturn, Optional, TYPE_CHECKING
-
-from .util import InflectionStr
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    NoReturn,
+    Optional,
+    TYPE_CHECKING,
+    Union,
+)
+
+from .models.data import AttributesModel
+from .util import TypeRegistry, dasherize, index_included
 
 if TYPE_CHECKING:
     from .tfc_client import TFCClient
 
+# Shared by all the objects without children of a given type, never mutated
+EMPTY_MAPPING: Mapping = MappingProxyType({})
+
 
 class TFCObject(object):
     """Represent a TFC object (workspace, run, variable, plan, apply, organization, ...)
@@ -20,13 +34,31 @@ class TFCObject(object):
     :type client: TFCClient
     :param data: Data to initialize the object (content of the "data" object in a API response)
     :type data: dict
-    :param include: sub-element to include in the object (like run referenced for a workspace). Valid value depends on the TFC API and the object initialized.
-    :type include: str
+    :param include: Included resources of the API response (like the current run of a workspace), as a list or indexed by (type, id): the matching related objects are built from them
+    :type include: Union[List[dict], Mapping[Tuple[str, str], dict]]
     :param init_from_data: Fill attributes informations from the data dict. Use False here to init an object from an API patch response, because the returned object is not complete.
     :type init_from_data: bool
+
+    The attributes are kept as sent by the API: the pydantic model is only built on
+    the first access to one of its fields, without validation (the API data is
+    trusted), and a typed value (like a datetime) is parsed on the first access to
+    its field. Only the payloads sent to the API (`create`, `modify`) are validated.
+    Subclasses should declare `__slots__` to stay compact.
     """
 
+    __slots__ = (
+        "client",
+        "attrs",
+        "id",
+        "_type",
+        "_model",
+        "_unparsed",
+        "__weakref__",
+    )
+
     MODELS_MODULE = "tfc_client.models"
+    # Type -> model class (like "workspaces" -> WorkspaceModel), from MODELS_MODULE
+    model_classes = TypeRegistry(MODELS_MODULE, suffix="Model", base=AttributesModel)
     can_create = None
     url_prefix = ""
 
@@ -34,42 +66,55 @@ class TFCObject(object):
         self,
         client: "TFCClient",
         data: Mapping,
-        include: List[Dict[str, dict]] = None,
+        include: Union[List[Dict[str, dict]], Mapping] = None,
         init_from_data=True,
     ):
         self.client = client
-        self.attrs: Dict[str, Dict[str, TFCObject]] = dict()
-        self.attrs["workspaces"] = dict()
-        self.attrs["runs"] = dict()
-        self.attrs["vars"] = dict()
-        self.attrs["ssh-keys"] = dict()
+        self.attrs: Dict[str, Any] = dict()
         self.id = data["id"]
-        self.type = data["type"]
+        self._type = data["type"]
         self._model = None
+        self._unparsed = None
 
         if init_from_data:
             self._init_from_data(data)
 
-        if include and isinstance(include, Iterable):
-            for included_data in include:
-                for rel_name, rel in self.relationships.items():
-                    if rel.id == included_data["id"]:
-                        self.relationships[rel_name] = self.client.factory(
-                            included_data
-                        )
+        if include:
+            self._include(include)
+
+    def _include(self, include: Union[Mapping, Iterable[Mapping]]) -> NoReturn:
+        """Replace the related objects by the matching included resources
+
+        :param include: "included" resources of an API response, or their index by (type, id) (see `index_included`)
+        """
+        if not isinstance(include, Mapping):
+            include = index_included(include)
+        if not include:
+            return
+        # Only the relationships already loaded: don't fetch them for that
+        relationships = self.attrs.get("relationships")
+        for rel_name, rel in (relationships or {}).items():
+            if isinstance(rel, list):
+                relationships[rel_name] = [
+                    (
+                        self._build_related(include[(item.type, item.id)])
+                        if (item.type, item.id) in include
+                        else item
+                    )
+                    for item in rel
+                ]
+            elif (rel.type, rel.id) in include:
+                relationships[rel_name] = self._build_related(
+                    include[(rel.type, rel.id)]
+                )
+
+    def _build_related(self, data: Mapping) -> "TFCObject":
+        return self.client.factory(data)
 
     def _init_from_data(self, data: Mapping) -> NoReturn:
         if "attributes" in data:
             self.attributes = data["attributes"]
-            model_class_name = "{}Model".format(
-                InflectionStr(self.type).underscore.singularize.camelize
-            )
-            module = importlib.import_module(TFCObject.MODELS_MODULE)
-            try:
-                model_class = getattr(module, model_class_name)
-                self._model = model_class(**data["attributes"])
-            except AttributeError:
-                pass
+            self._model = None
 
         if "relationships" in data:
             self.relationships = data["relationships"]
@@ -90,10 +135,43 @@ class TFCObject(object):
     def refresh(self) -> NoReturn:
         self.attrs = dict()
         self._model = None
-        self.attrs["workspaces"] = dict()
-        self.attrs["runs"] = dict()
-        self.attrs["vars"] = dict()
-        self.attrs["ssh-keys"] = dict()
+        identity_map = getattr(self.client, "identity_map", None)
+        if identity_map is not None:
+            # Everybody sharing this instance will see the reloaded data
+            identity_map.touch(self)
+
+    @property
+    def type(self) -> str:
+        return self._type
+
+    def _trusted_model(self) -> Optional[AttributesModel]:
+        if self._model is None:
+            model_class = self.model_classes.get(self.type)
+            if model_class:
+                model = model_class.construct_trusted(self.attributes)
+                parsed = model_class.trusted_maps().parsed
+                self._unparsed = set(parsed & model.__fields_set__)
+                self._model = model
+        return self._model
+
+    def _model_value(self, name: str) -> Any:
+        model = self._trusted_model()
+        if name in self._unparsed:
+            value = model.parse_field(name)
+            self._unparsed.discard(name)
+            return value
+        return getattr(model, name)
+
+    @property
+    def model(self) -> Optional[AttributesModel]:
+        """The attributes in the model of the object type (built on first access, all
+        values parsed)
+        """
+        model = self._trusted_model()
+        if model is not None:
+            for name in list(self._unparsed):
+                self._model_value(name)
+        return model
 
     @property
     def attributes(self) -> Mapping:
@@ -117,14 +195,14 @@ class TFCObject(object):
         for relationship_key, relationship_value in relationships.items():
             if "data" in relationship_value:
                 if isinstance(relationship_value["data"], Mapping):
-                    self.attrs["relationships"][relationship_key] = self.client.factory(
+                    self.attrs["relationships"][relationship_key] = self._build_related(
                         relationship_value["data"]
                     )
                 elif isinstance(relationship_value["data"], Iterable):
                     self.attrs["relationships"][relationship_key] = list()
                     for data in relationship_value["data"]:
                         self.attrs["relationships"][relationship_key].append(
-                            self.client.factory(data)
+                            self._build_related(data)
                         )
 
     @property
@@ -139,10 +217,18 @@ class TFCObject(object):
         return self.id
 
     def __getattr__(self, key):
-        key_dash = InflectionStr(key).dasherize
-
-        if self._model and key in self._model.__fields_set__:
-            return getattr(self._model, key)
+        if key.startswith("_"):
+            # Private and special names are never API attributes: don't fetch for them
+            raise AttributeError(key)
+        key_dash = dasherize(key)
+
+        model_class = self.model_classes.get(self.type)
+        if (
+            model_class
+            and key in model_class.__fields__
+            and key in self._trusted_model().__fields_set__
+        ):
+            return self._model_value(key)
         elif key_dash in self.attributes:
             return self.attributes[key_dash]
         elif self.relationships and key_dash in self.relationships:
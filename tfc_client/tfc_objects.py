@@ -1,25 +1,51 @@
-from collections.abc import Mapping, Iterable
+from collections.abc import Mapping
+import codecs
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import hashlib
-import importlib
-import re
+import json
 import time
-from typing import BinaryIO, Generator, List, Callable, TYPE_CHECKING, Union
+from typing import (
+    BinaryIO,
+    Generator,
+    Iterable,
+    List,
+    Callable,
+    Dict,
+    NamedTuple,
+    NoReturn,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
 
 import requests
 
+from .exception import APIException, TFCObjectException
+from .export import Exporter
 from .models.data import RootModel, DataModel, AssignModel
 from .models.run import RunModel
 from .models.relationship import RelationshipsModel
 from .models.ssh_key import SshKeyModel
 from .models.var import VarModel
 from .models.workspace import WorkspaceModel
-from .tfc_object import TFCObject
-from .util import InflectionStr
+from .plan_log import PlanLogSummary
+from .tfc_object import EMPTY_MAPPING, TFCObject
+from .util import (
+    ANSI_ESCAPE,
+    AnsiStripper,
+    InflectionStr,
+    include_param,
+    index_included,
+    type_name,
+)
 
 from .enums import RunStatus, VarCat, WorkspaceSort
 
 
 if TYPE_CHECKING:
+    from .notification_receiver import NotificationReceiver
     from .tfc_client import TFCClient
 
     Mixin = TFCObject
@@ -28,67 +54,155 @@ else:
 
 
 class Paginable(Mixin):
+    __slots__ = ()
+    # Type of the children collection described by `pagination`
+    paginated_type = None
+
     @property
     def pagination(self) -> Mapping:
-        if "pagination" not in self.attrs:
-            api_response = self.client._api.get(
-                path=f"organizations/{self.name}/workspaces", params={"page[size]": 1}
-            )
-            if "pagination" in api_response.meta:
-                self.attrs["pagination"] = api_response.meta["pagination"]
-        return self.attrs.get("pagination", {})
+        return self.meta(self.paginated_type).get("pagination", {})
 
     @pagination.setter
     def pagination(self, pagination: Mapping):
-        self.attrs["pagination"] = pagination
+        self._set_meta_item(self.paginated_type, "pagination", pagination)
 
 
 class Creatable(Mixin):
+    __slots__ = ()
+    # Seconds the meta of a collection (like its counts) is reused
+    meta_ttl = 10
+
+    def _collection_path(self, object_type: str, url_prefix: str = None) -> str:
+        if url_prefix is None:
+            url_prefix = self.url_prefix
+        return "/".join(filter(None, [url_prefix, type_name(object_type)]))
+
+    @staticmethod
+    def _meta_key(path: str, filters: Mapping = None, search: str = None) -> str:
+        return json.dumps([path, filters, search], sort_keys=True, default=str)
+
+    def _store_meta(self, key: str, meta: Mapping) -> Mapping:
+        if "meta" not in self.attrs:
+            self.attrs["meta"] = dict()
+        self.attrs["meta"][key] = (time.monotonic(), meta)
+        return meta
+
+    def _set_meta_item(self, object_type: str, name: str, value: Mapping) -> None:
+        """Replace an item (like "pagination") of the meta of a children collection"""
+        key = self._meta_key(self._collection_path(object_type))
+        _, meta = self.attrs.get("meta", EMPTY_MAPPING).get(key, (None, None))
+        self._store_meta(key, {**(meta or {}), name: value})
+
+    def meta(
+        self,
+        object_type: str,
+        filters: Mapping = None,
+        url_prefix: str = None,
+        search: str = None,
+        max_age: float = None,
+    ) -> Mapping:
+        """Meta of a children collection, without listing it: its "pagination" (with
+        the "total-count") and, for workspaces, the "status-counts".
+
+        Read with a page of one object (or from the first page of a listing), then
+        reused for `meta_ttl` seconds.
+
+        :param max_age: Seconds a meta already read can be reused. Default: `meta_ttl`
+        :type max_age: float
+        """
+        path = self._collection_path(object_type, url_prefix)
+        key = self._meta_key(path, filters, search)
+        max_age = self.meta_ttl if max_age is None else max_age
+        read_at, meta = self.attrs.get("meta", EMPTY_MAPPING).get(key, (None, None))
+        if read_at is not None and time.monotonic() - read_at < max_age:
+            return meta
+        api_response = self.client._api.get(
+            path=path,
+            params=self.client._api._list_params(
+                page_size=1, search=search, filters=filters
+            ),
+        )
+        meta = api_response.meta if isinstance(api_response.meta, Mapping) else {}
+        return self._store_meta(key, meta)
+
+    def count(
+        self,
+        object_type: str,
+        filters: Mapping = None,
+        url_prefix: str = None,
+        search: str = None,
+        max_age: float = None,
+    ) -> int:
+        """Number of objects of a children collection, like `org.count("workspaces")`
+        (see `meta`)
+        """
+        pagination = self.meta(
+            object_type,
+            filters=filters,
+            url_prefix=url_prefix,
+            search=search,
+            max_age=max_age,
+        ).get("pagination", {})
+        # Pages of one object
+        return pagination.get("total-count", pagination.get("total-pages", 0))
+
     def get_list(
-        self, object_type: str, filters: str = None, url_prefix: str = None
+        self,
+        object_type: str,
+        filters: str = None,
+        url_prefix: str = None,
+        include: Union[str, Iterable[str]] = None,
+        page_size: int = None,
+        limit: int = None,
     ) -> Generator[TFCObject, None, None]:
-        object_type = InflectionStr(object_type).dasherize.pluralize
-        path_elements = list()
-        if url_prefix is not None:
-            if url_prefix:
-                path_elements.append(url_prefix)
-        elif self.url_prefix is not None:
-            path_elements.append(self.url_prefix)
-        path_elements.append(object_type)
-        path = "/".join(path_elements)
-        for api_response in self.client._api.get_list(path=path, filters=filters):
-            if "pagination" in api_response.meta:
-                self.pagination = api_response.meta["pagination"]
-            if "status-counts" in api_response.meta:
-                self.status_counts = api_response.meta["status-counts"]
+        """List the children objects of a type
+
+        :param include: Related resources sent with the objects (like "plan,apply" for runs): their relationships are loaded without any other call
+        :type include: Union[str, Iterable[str]]
+        :param page_size: Number of objects by page (max 100). Default: the client one
+        :type page_size: int
+        :param limit: Maximum number of objects listed (no page is fetched past it)
+        :type limit: int
+        """
+        object_type = type_name(object_type)
+        path = self._collection_path(object_type, url_prefix)
+        first_page = True
+        for api_response in self.client._api.get_list(
+            path=path,
+            filters=filters,
+            include=include_param(include),
+            page_size=page_size,
+            limit=limit,
+        ):
+            if first_page and isinstance(api_response.meta, Mapping):
+                # Also the `pagination` (and `status_counts`) of an unfiltered listing
+                self._store_meta(self._meta_key(path, filters), api_response.meta)
+            first_page = False
+            included = index_included(api_response.included)
             for element in api_response.data:
-                tfc_object = self.client.factory(element)
-                if tfc_object.type not in self.attrs:
-                    self.attrs[tfc_object.type] = dict()
-                self.attrs[tfc_object.type][tfc_object.id] = tfc_object
-                yield self.attrs[tfc_object.type][tfc_object.id]
+                yield self._add_child(self.client.factory(element, include=included))
+
+    def _add_child(self, tfc_object: TFCObject) -> TFCObject:
+        """Keep a listed or created child object in `attrs` (by type, then id)"""
+        if tfc_object.type not in self.attrs:
+            self.attrs[tfc_object.type] = dict()
+        self.attrs[tfc_object.type][tfc_object.id] = tfc_object
+        return tfc_object
+
+    def _remove_child(self, tfc_object: TFCObject) -> NoReturn:
+        children = self.attrs.get(tfc_object.type)
+        if children and tfc_object.id in children:
+            del children[tfc_object.id]
 
     def create(self, object_type: str, url_prefix: str = None, **kwargs) -> TFCObject:
         if self.can_create:
-            object_type = InflectionStr(object_type).dasherize.pluralize
-            path_elements = list()
-            if url_prefix is not None:
-                if url_prefix:
-                    path_elements.append(url_prefix)
-            elif self.url_prefix is not None:
-                path_elements.append(self.url_prefix)
-            path_elements.append(object_type)
-            path = "/".join(path_elements)
-
-            object_class_name = "TFC{type}".format(
-                type=InflectionStr(object_type).underscore.camelize.singularize
-            )
+            object_type = type_name(object_type)
+            path = self._collection_path(object_type, url_prefix)
+
             if object_type in self.can_create:
-                model_class_name = "{type}Model".format(
-                    type=InflectionStr(object_type).underscore.camelize.singularize
-                )
-                module = importlib.import_module(TFCObject.MODELS_MODULE)
-                model_class = getattr(module, model_class_name)
+                model_class = self.model_classes.get(object_type)
+                if model_class is None:
+                    raise AttributeError(f"No model to create {object_type}")
                 object_attributes = dict()
                 relationships = dict()
                 for attr_name, attr_value in kwargs.items():
@@ -109,34 +223,38 @@ class Creatable(Mixin):
                         else None,
                     )
                 )
-                api_response = self.client._api.post(path=path, data=payload.json())
-                tfc_object = self.client.factory(api_response.data)
-                if object_type not in self.attrs:
-                    self.attrs[object_type] = dict()
-                self.attrs[object_type][tfc_object.id] = tfc_object
-                return tfc_object
+                api_response = self.client._api.post(
+                    path=path, data=self.client.codec.encode(payload)
+                )
+                # The counts changed
+                self.attrs.pop("meta", None)
+                return self._add_child(self.client.factory(api_response.data))
             else:
                 raise AttributeError(f"Can create {object_type} from {self.type}")
 
     def delete(self, tfc_object: TFCObject):
         id = str(tfc_object)
-        if id in self.attrs.get(tfc_object.type, []):
-            del self.attrs[tfc_object.type][id]
+        self._remove_child(tfc_object)
+        self.attrs.pop("meta", None)
+        if self.client.identity_map is not None:
+            self.client.identity_map.discard(tfc_object.type, id)
         return self.client._api.delete(path=f"{tfc_object.type}/{id}")
 
 
 class Modifiable(Mixin):
+    __slots__ = ()
+
     def modify(self, **kwargs) -> TFCObject:
-        model_class_name = "{type}Model".format(
-            type=InflectionStr(self.type).underscore.camelize.singularize
-        )
-        module = importlib.import_module(TFCObject.MODELS_MODULE)
-        model_class = getattr(module, model_class_name)
+        model_class = self.model_classes.get(self.type)
+        if model_class is None:
+            raise AttributeError(f"No model to modify {self.type}")
 
         model = model_class(**kwargs)
         payload = RootModel(data=DataModel(type=self.type, attributes=model))
         path = f"{self.type}/{self.id}"
-        api_response = self.client._api.patch(path=path, data=payload.json())
+        api_response = self.client._api.patch(
+            path=path, data=self.client.codec.encode(payload)
+        )
         # Special case for organizations renaming ...
         # For organization, id == name
         if (
@@ -144,13 +262,18 @@ class Modifiable(Mixin):
             and "id" in api_response.data
             and api_response.data["id"] != self.id
         ):
+            old_id = self.id
             self.id = api_response.data["id"]
+            if self.client.identity_map is not None:
+                self.client.identity_map.rekey(self, old_id)
 
         self.refresh()
         return self
 
 
 class Assignable(Mixin):
+    __slots__ = ()
+
     def assign(self, relation_name: str = None, assigned_object: TFCObject = None):
         if relation_name:
             relation_name = InflectionStr(relation_name).singularize
@@ -159,7 +282,9 @@ class Assignable(Mixin):
         model = AssignModel(id=assigned_object.id)
         payload = RootModel(data=DataModel(type=self.type, attributes=model))
         path = f"{self.type}/{self.id}/relationships/{relation_name}"
-        api_response = self.client._api.patch(path=path, data=payload.json())
+        api_response = self.client._api.patch(
+            path=path, data=self.client.codec.encode(payload)
+        )
         self.refresh()
         return self
 
@@ -168,12 +293,19 @@ class Assignable(Mixin):
         model = AssignModel(id=None)
         payload = RootModel(data=DataModel(type=self.type, attributes=model))
         path = f"{self.type}/{self.id}/relationships/{relation_name}"
-        api_response = self.client._api.patch(path=path, data=payload.json())
+        api_response = self.client._api.patch(
+            path=path, data=self.client.codec.encode(payload)
+        )
         self.refresh()
         return self
 
 
 class Loggable(Mixin):
+    __slots__ = ()
+
+    # Statuses after which the log doesn't grow anymore
+    LOG_FINAL_STATUS = ["finished", "errored", "canceled", "unreachable"]
+
     @property
     def log_colored(self) -> str:
         if "log" not in self.attrs:
@@ -183,14 +315,85 @@ class Loggable(Mixin):
 
     @property
     def log(self) -> str:
-        return re.sub(r"\x1b(\[.*?[@-~]|\].*?(\x07|\x1b\\))", "", self.log_colored)
+        if "log-stripped" not in self.attrs:
+            self.attrs["log-stripped"] = ANSI_ESCAPE.sub("", self.log_colored)
+        return self.attrs["log-stripped"]
+
+    def tail_log(
+        self,
+        colored: bool = False,
+        sleep_time=3,
+        timeout=600,
+        max_retries: int = 5,
+    ) -> Generator[str, None, None]:
+        """Follow the log while it is written: yield its lines as they come.
+
+        Each poll only downloads the new bytes of the log, and only the current
+        incomplete line is kept in memory. Transient download failures are retried
+        (with a refresh, to renew the expiring `log_read_url`).
+        Stops when the log is complete, or after `timeout` seconds.
+
+        :param colored: Keep the ANSI escape sequences
+        :type colored: bool
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        stripper = None if colored else AnsiStripper()
+        offset = 0
+        line = ""
+        failures = 0
+        start_time = time.time()
+        while True:
+            try:
+                chunk = self.client._api.get_raw_range(
+                    path=self.log_read_url, offset=offset
+                )
+                failures = 0
+            except (APIException, requests.RequestException):
+                failures += 1
+                if failures > max_retries:
+                    raise
+                time.sleep(sleep_time)
+                self.refresh()
+                continue
+
+            text = decoder.decode(chunk)
+            if offset == 0 and text.startswith("\x02"):
+                text = text[1:]
+            offset += len(chunk)
+            complete = "\x03" in text
+            if complete:
+                text = text[: text.index("\x03")]
+            if stripper:
+                text = stripper.feed(text)
+
+            line += text
+            *lines, line = line.split("\n")
+            for full_line in lines:
+                yield full_line.rstrip("\r")
+
+            if not chunk:
+                if self.status in self.LOG_FINAL_STATUS:
+                    complete = True
+                elif time.time() - start_time > timeout:
+                    return
+                else:
+                    time.sleep(sleep_time)
+                    self.refresh()
+            if complete:
+                if stripper:
+                    line += stripper.flush()
+                if line:
+                    yield line.rstrip("\r")
+                return
 
 
 class TFCVar(TFCObject, Modifiable):
+    __slots__ = ()
     type = "vars"
 
 
 class TFCNotificationConfiguration(TFCObject, Modifiable):
+    __slots__ = ()
     type = "notification-configurations"
 
     def do_verify(self) -> bool:
@@ -205,7 +408,14 @@ class TFCNotificationConfiguration(TFCObject, Modifiable):
 
 
 class TFCRun(TFCObject):
+    __slots__ = ()
     type = "runs"
+    PLAN_TARGET_STATUS = [
+        RunStatus.planned,
+        RunStatus.planned_and_finished,
+        RunStatus.errored,
+    ]
+    APPLY_TARGET_STATUS = [RunStatus.errored, RunStatus.applied]
 
     def wait_run(
         self,
@@ -213,7 +423,14 @@ class TFCRun(TFCObject):
         sleep_time=3,
         timeout=600,
         progress_callback: Callable = None,
+        receiver: "NotificationReceiver" = None,
     ) -> bool:
+        """Wait for the run to reach one of the `target_status`
+
+        With a `receiver` (registered on the workspace of the run), the wait ends on
+        its notification, and the run is only polled every `receiver.fallback_sleep_time`
+        seconds in case a notification is lost.
+        """
         if not progress_callback or not callable(progress_callback):
             progress_callback = None
 
@@ -226,35 +443,49 @@ class TFCRun(TFCObject):
             if duration <= timeout:
                 if progress_callback:
                     progress_callback(run=self, duration=duration)
-                time.sleep(sleep_time)
+                if receiver is not None:
+                    receiver.wait(
+                        self.id,
+                        target_status,
+                        timeout=min(
+                            receiver.fallback_sleep_time,
+                            max(timeout - duration, 0) + 1,
+                        ),
+                    )
+                else:
+                    time.sleep(sleep_time)
                 self.refresh()
             else:
                 return False
 
     def wait_plan(
-        self, sleep_time=3, timeout=600, progress_callback: Callable = None
+        self,
+        sleep_time=3,
+        timeout=600,
+        progress_callback: Callable = None,
+        receiver: "NotificationReceiver" = None,
     ) -> bool:
-        target_status = [
-            RunStatus.planned,
-            RunStatus.planned_and_finished,
-            RunStatus.errored,
-        ]
         return self.wait_run(
             sleep_time=sleep_time,
             timeout=timeout,
-            target_status=target_status,
+            target_status=self.PLAN_TARGET_STATUS,
             progress_callback=progress_callback,
+            receiver=receiver,
         )
 
     def wait_apply(
-        self, sleep_time=3, timeout=600, progress_callback: Callable = None
+        self,
+        sleep_time=3,
+        timeout=600,
+        progress_callback: Callable = None,
+        receiver: "NotificationReceiver" = None,
     ) -> bool:
-        target_status = [RunStatus.errored, RunStatus.applied]
         return self.wait_run(
             sleep_time=sleep_time,
             timeout=timeout,
-            target_status=target_status,
+            target_status=self.APPLY_TARGET_STATUS,
             progress_callback=progress_callback,
+            receiver=receiver,
         )
 
     def do_apply(self, comment: str = None) -> bool:
@@ -290,17 +521,30 @@ class TFCRun(TFCObject):
             return True
 
 
+class VarSyncReport(NamedTuple):
+    """Outcome of `TFCWorkspace.sync_vars`"""
+
+    created: List[TFCVar]
+    updated: List[TFCVar]
+    deleted: List[TFCVar]
+    unchanged: List[TFCVar]
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.created or self.updated or self.deleted)
+
+
 class TFCWorkspace(TFCObject, Paginable, Modifiable, Creatable, Assignable):
+    __slots__ = ()
     type = "workspaces"
     can_create = ["vars", "runs", "notification-configurations",
                   "configuration-versions"]
 
-    def get_list(
-        self, object_type: str, filters: Mapping = None, url_prefix=None
-    ) -> Generator[TFCObject, None, None]:
-        if url_prefix is None:
-            url_prefix = f"{self.type}/{self.id}"
-        return super().get_list(object_type, filters=filters, url_prefix=url_prefix)
+    paginated_type = "runs"
+
+    @property
+    def url_prefix(self) -> str:
+        return f"{self.type}/{self.id}"
 
     @property
     def vars(self) -> Generator[TFCVar, None, None]:
@@ -324,7 +568,7 @@ class TFCWorkspace(TFCObject, Paginable, Modifiable, Creatable, Assignable):
         return {var.key: var for var in self.vars}
 
     def create(self, object_type: str, url_prefix: str = None, **kwargs) -> TFCObject:
-        object_type = InflectionStr(object_type).dasherize.pluralize
+        object_type = type_name(object_type)
         if object_type in ["vars"]:
             if "category" not in kwargs:
                 kwargs["category"] = VarCat.terraform
@@ -341,6 +585,110 @@ class TFCWorkspace(TFCObject, Paginable, Modifiable, Creatable, Assignable):
 
         return super().create(object_type, url_prefix=url_prefix, **kwargs)
 
+    @staticmethod
+    def _value_hash(value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        return hashlib.sha256(str(value).encode("utf-8")).hexdigest()
+
+    def _var_differs(
+        self, var: TFCVar, wanted: Mapping, update_sensitive: bool
+    ) -> bool:
+        if bool(var.hcl) != wanted["hcl"] or bool(var.sensitive) != wanted["sensitive"]:
+            return True
+        if var.sensitive:
+            # The API never sends the value of a sensitive variable back
+            return update_sensitive
+        return self._value_hash(var.value) != self._value_hash(wanted["value"])
+
+    def _update_var(self, var: TFCVar, wanted: Mapping) -> TFCVar:
+        payload = RootModel(
+            data=DataModel(type=var.type, id=var.id, attributes=VarModel(**wanted))
+        )
+        api_response = self.client._api.patch(
+            path=f"vars/{var.id}", data=self.client.codec.encode(payload)
+        )
+        # The response holds the whole variable: no need to fetch it again
+        var.refresh()
+        var._init_from_data(api_response.data)
+        return var
+
+    def _delete_var(self, var: TFCVar) -> TFCVar:
+        self.delete(var)
+        return var
+
+    def _replace_var(self, var: TFCVar, wanted: Mapping) -> TFCVar:
+        # A sensitive variable can't be made non-sensitive: delete and create it again
+        self.delete(var)
+        return self.create("vars", **wanted)
+
+    def sync_vars(
+        self,
+        desired: Union[Mapping, Iterable],
+        delete_missing: bool = True,
+        update_sensitive: bool = True,
+        workers: int = 8,
+    ) -> VarSyncReport:
+        """Make the variables of the workspace match `desired`, with only the needed
+        create, update and delete calls (sent concurrently, within the client rate limit).
+
+        Variables are matched by (key, category) and compared on hcl, sensitive and a hash of their value.
+
+        :param desired: Wanted variables, as mappings of `VarModel` attributes (key, value, category, hcl, sensitive), or a {key: value} mapping of terraform variables
+        :type desired: Union[Mapping, Iterable[Mapping]]
+        :param delete_missing: Delete the variables absent from `desired`. Default: True
+        :type delete_missing: bool
+        :param update_sensitive: Send the value of the sensitive variables again, as it can't be compared. Default: True
+        :type update_sensitive: bool
+        :param workers: Maximum number of simultaneous calls. Default: 8
+        :type workers: int
+        :return: The created, updated, deleted and unchanged variables
+        """
+        if isinstance(desired, Mapping):
+            desired = [{"key": key, "value": value} for key, value in desired.items()]
+        wanted_vars = dict()
+        for attributes in desired:
+            model = VarModel(**attributes)
+            if not model.key:
+                raise TFCObjectException(f"No key in variable {attributes}")
+            wanted = {
+                "key": model.key,
+                "value": model.value,
+                "category": VarCat(model.category).value,
+                "hcl": bool(model.hcl),
+                "sensitive": bool(model.sensitive),
+            }
+            wanted_vars[(wanted["key"], wanted["category"])] = wanted
+
+        existing_vars = {
+            (var.key, VarCat(var.category).value): var for var in self.vars
+        }
+        report = VarSyncReport(created=[], updated=[], deleted=[], unchanged=[])
+        calls: List[Tuple[List[TFCVar], Callable]] = []
+        for var_key, wanted in wanted_vars.items():
+            var = existing_vars.pop(var_key, None)
+            if var is None:
+                calls.append((report.created, partial(self.create, "vars", **wanted)))
+            elif var.sensitive and not wanted["sensitive"]:
+                calls.append((report.updated, partial(self._replace_var, var, wanted)))
+            elif self._var_differs(var, wanted, update_sensitive):
+                calls.append((report.updated, partial(self._update_var, var, wanted)))
+            else:
+                report.unchanged.append(var)
+        if delete_missing:
+            for var in existing_vars.values():
+                calls.append((report.deleted, partial(self._delete_var, var)))
+
+        if calls:
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(workers, len(calls))),
+                thread_name_prefix="tfc-vars",
+            ) as executor:
+                futures = [(results, executor.submit(call)) for results, call in calls]
+                for results, future in futures:
+                    results.append(future.result())
+        return report
+
     @property
     def runs(self) -> Generator[TFCRun, None, None]:
         return self.get_list("runs")
@@ -362,110 +710,103 @@ class TFCWorkspace(TFCObject, Paginable, Modifiable, Creatable, Assignable):
 
 
 class TFCApply(TFCObject, Loggable):
+    __slots__ = ()
     type = "applies"
 
 
 class TFCPlan(TFCObject, Loggable):
+    __slots__ = ()
     type = "plans"
 
+    @property
+    def log_summary(self) -> PlanLogSummary:
+        """Structured summary of the plan log, parsed once (see `PlanLogSummary`)"""
+        if "log-summary" not in self.attrs:
+            self.attrs["log-summary"] = PlanLogSummary.parse(self.log.splitlines())
+        return self.attrs["log-summary"]
+
     @property
     def log_resume(self) -> str:
-        return "\n".join(
-            [
-                line
-                for line in self.log.splitlines()
-                if line.startswith("  + ")
-                or line.startswith("  - ")
-                or line.startswith("-/+ ")
-                or line.startswith("  ~ ")
-            ]
-        )
+        return self.log_summary.resume
 
     @property
     def log_changes(self) -> str:
-        return_lines = False
-        filtered_log = ""
-        for line in self.log.splitlines():
-            if re.match("Terraform will perform the following actions", line):
-                return_lines = True
-            if return_lines:
-                filtered_log += line + "\n"
-        return filtered_log
+        return self.log_summary.changes
 
     @property
     def log_signature(self) -> str:
-        return hashlib.sha256(bytes(self.log_resume, encoding="utf-8")).hexdigest()
+        return self.log_summary.signature
 
 
 class TFCSshKey(TFCObject, Modifiable):
+    __slots__ = ()
     type = "ssh-keys"
 
 
 class TFCEntitlementSet(TFCObject):
+    __slots__ = ()
     type = "entitlement-sets"
 
 
 class TFCComment(TFCObject):
+    __slots__ = ()
     type = "comments"
 
 
 class TFCOauthToken(TFCObject):
-    type = "oauth-token"
+    __slots__ = ()
+    type = "oauth-tokens"
 
 
 class TFCOauthClient(TFCObject):
-    type = "oauth-client"
+    __slots__ = ()
+    type = "oauth-clients"
 
 
 class TFCStateVersion(TFCObject):
+    __slots__ = ()
     type = "state-versions"
 
 
 class TFCConfigurationVersion(TFCObject):
+    __slots__ = ()
     type = "configuration-versions"
 
     def upload(self, data: Union[bytes, BinaryIO]) -> None:
-        resp = requests.put(
+        resp = self.client._api.put_raw(
             self.upload_url, data,
             headers={'Content-Type': 'application/octet-stream'})
         resp.raise_for_status()
 
 
 class TFCUser(TFCObject):
+    __slots__ = ()
     type = "users"
 
 
 class TFCRunEvent(TFCObject):
+    __slots__ = ()
     type = "run-events"
 
 
 class TFCOrganization(TFCObject, Paginable, Modifiable, Creatable):
+    __slots__ = ()
     type = "organizations"
     can_create = ["workspaces", "ssh-keys"]
+    paginated_type = "workspaces"
 
-    def __init__(
-        self,
-        client: "TFCClient",
-        data: Mapping,
-        include: str = None,
-        init_from_data: bool = True,
-    ):
-        self.url_prefix = f"organizations/{data['id']}"
-        super().__init__(client, data, include, init_from_data)
+    @property
+    def url_prefix(self) -> str:
+        return f"organizations/{self.id}"
 
     @property
     def status_counts(self) -> Mapping:
-        if "status-counts" not in self.attrs:
-            api_response = self.client._api.get(
-                path=f"organizations/{self.name}/workspaces", params={"page[size]": 1}
-            )
-            if "status-counts" in api_response.meta:
-                self.attrs["status-counts"] = api_response.meta["status-counts"]
-        return self.attrs.get("status-counts", {})
+        # Same request as the pagination
+        return self.meta(self.paginated_type).get("status-counts", {})
 
     @status_counts.setter
     def status_counts(self, status_counts: Mapping):
-        self.attrs["status-counts"] = status_counts
+        self._set_meta_item(self.paginated_type, "status-counts", status_counts)
 
     @property
     def workspaces(self) -> Generator[TFCWorkspace, None, None]:
@@ -483,69 +824,142 @@ class TFCOrganization(TFCObject, Paginable, Modifiable, Creatable):
         *,
         search: str = None,
         filters: str = None,
-        include: str = None,
+        include: Union[str, Iterable[str]] = None,
         sort: WorkspaceSort = None,
         limit: int = None,
+        page_size: int = None,
     ) -> Generator[TFCWorkspace, None, None]:
+        """Search the workspaces of the organization
+
+        :param include: Related resources sent with the workspaces, like "current_run,organization" (or a list of names)
+        :type include: Union[str, Iterable[str]]
+        :param limit: Maximum number of workspaces: no page is fetched past it, and the last page is shrunk to the remaining workspaces
+        :type limit: int
+        :param page_size: Number of workspaces by page (max 100). Default: the client one
+        :type page_size: int
+        """
         organization = self.name
+        path = f"organizations/{organization}/workspaces"
 
         if sort and not isinstance(sort, WorkspaceSort):
             sort = WorkspaceSort(sort)
 
-        count = 0
+        first_page = True
         for api_response in self.client._api.get_list(
-            path=f"organizations/{organization}/workspaces",
-            include=InflectionStr(include).underscore if include else None,
+            path=path,
+            include=include_param(include),
             search=search,
             filters=filters,
             sort=sort,
+            page_size=page_size,
+            limit=limit if isinstance(limit, int) else None,
         ):
-            if "pagination" in api_response.meta:
-                self.pagination = api_response.meta["pagination"]
-            if "status-counts" in api_response.meta:
-                self.status_counts = api_response.meta["status-counts"]
+            if first_page and isinstance(api_response.meta, Mapping):
+                # The meta of this search: the `pagination` and `status_counts` of
+                # the organization when unfiltered
+                self._store_meta(
+                    self._meta_key(path, filters, search), api_response.meta
+                )
+            first_page = False
 
+            # Indexed once per page, for all the workspaces of the page
+            included = index_included(api_response.included)
             for ws in api_response.data:
-                if isinstance(limit, int) and count >= limit:
-                    return
-                ws_id = ws["id"]
+                yield self._add_child(self.client.factory(ws, include=included))
 
-                try:
-                    included_rel_id = ws["relationships"][include]["data"]["id"]
-
-                    included_rel_data = [
-                        included
-                        for included in api_response.included
-                        if included["id"] == included_rel_id
-                    ]
-                except (KeyError, TypeError):
-                    included_rel_data = None
-
-                if "workspaces" not in self.attrs:
-                    self.attrs["workspaces"] = dict()
-                self.attrs["workspaces"][ws_id] = self.client.factory(
-                    ws, include=included_rel_data if included_rel_data else None
-                )
+    def export_workspaces(
+        self,
+        fields: Union[Iterable[str], Mapping],
+        include: Union[str, Iterable[str]] = None,
+        filters: Mapping = None,
+        search: str = None,
+    ) -> Exporter:
+        """Exporter of the workspaces of the organization, to stream them as NDJSON
+        or CSV rows without building any object (see `Exporter`)
+        """
+        return Exporter(
+            self.client,
+            f"organizations/{self.id}/workspaces",
+            fields,
+            include=include,
+            filters=filters,
+            search=search,
+        )
 
-                yield self.attrs["workspaces"][ws_id]
-                count += 1
+    @property
+    def _workspace_ids(self) -> Dict[str, str]:
+        # Name -> id of the workspaces in attrs["workspaces"]
+        if "workspace-ids" not in self.attrs:
+            self.attrs["workspace-ids"] = dict()
+        return self.attrs["workspace-ids"]
+
+    def _add_child(self, tfc_object: TFCObject) -> TFCObject:
+        super()._add_child(tfc_object)
+        if tfc_object.type == "workspaces":
+            # Only index loaded workspaces: a stub would be fetched to get its name
+            name = tfc_object.attrs.get("attributes", EMPTY_MAPPING).get("name")
+            if name:
+                self._workspace_ids[name] = tfc_object.id
+        return tfc_object
+
+    def _remove_child(self, tfc_object: TFCObject) -> NoReturn:
+        super()._remove_child(tfc_object)
+        if tfc_object.type == "workspaces":
+            workspace_ids = self._workspace_ids
+            for name in [n for n, id in workspace_ids.items() if id == tfc_object.id]:
+                del workspace_ids[name]
+
+    def _cached_workspace(self, name: str) -> Optional[TFCWorkspace]:
+        workspace_id = self._workspace_ids.get(name)
+        if workspace_id is None:
+            return None
+        ws = self.attrs.get("workspaces", EMPTY_MAPPING).get(workspace_id)
+        # The workspace may have been renamed since it was indexed
+        if ws is None or ws.name != name:
+            del self._workspace_ids[name]
+            return None
+        return ws
 
     def workspace(self, name: str) -> TFCWorkspace:
-        workspace_id = None
-        ws_ids = [
-            ws_id for ws_id, ws in self.attrs["workspaces"].items() if ws.name == name
-        ]
-        if ws_ids:
-            workspace_id = ws_ids[0]
-
-        if workspace_id:
-            return self.attrs["workspaces"][workspace_id]
-        else:
+        ws = self._cached_workspace(name)
+        if ws is None:
             api_response = self.client._api.get(
                 path=f"organizations/{self.name}/workspaces/{name}"
             )
-            ws = self.client.factory(api_response.data)
-            if "workspaces" not in self.attrs:
-                self.attrs["workspaces"] = dict()
-            self.attrs["workspaces"][ws.id] = ws
-            return ws
+            ws = self._add_child(self.client.factory(api_response.data))
+        return ws
+
+    def workspaces_by_name(
+        self, names: Iterable, max_single_gets: int = 3
+    ) -> Dict[str, TFCWorkspace]:
+        """Find many workspaces by name in one pass: the known ones from the index of
+        the organization, the others by listing the workspaces until all are found
+        (or one by one, when at most `max_single_gets` are missing)
+
+        :return: The workspaces by name (the unknown names are left out)
+        """
+        found = dict()
+        missing = set()
+        for name in names:
+            ws = self._cached_workspace(name)
+            if ws is None:
+                missing.add(name)
+            else:
+                found[name] = ws
+
+        if len(missing) > max_single_gets:
+            for ws in self.workspaces:
+                name = ws.attrs.get("attributes", EMPTY_MAPPING).get("name")
+                if name in missing:
+                    found[name] = ws
+                    missing.discard(name)
+                    if not missing:
+                        break
+        else:
+            for name in missing:
+                try:
+                    found[name] = self.workspace(name)
+                except APIException as error:
+                    if getattr(error.response, "status_code", None) != 404:
+                        raise
+        return found
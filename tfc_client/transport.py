@@ -0,0 +1,193 @@
+import abc
+import base64
+from collections import defaultdict, deque
+import gzip
+import hashlib
+import json
+import threading
+import time
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .exception import TransportException
+
+# Never written in a cassette
+SECRET_HEADERS = ("authorization", "set-cookie", "cookie")
+# Request headers changing the response: part of the match of a recorded call
+MATCHED_HEADERS = ("range", "if-none-match", "if-modified-since")
+
+
+class Transport(abc.ABC):
+    """Send the HTTP requests of an APICaller: the `requests.Session` interface
+    subset used by the client (`request` and `close`). Subclasses must implement
+    `request`.
+
+    A `requests.Session` is a transport: it's the default one.
+    """
+
+    @abc.abstractmethod
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def _read_body(kwargs: Dict) -> None:
+    """Read a stream body (like an uploaded file) into bytes, in place: a stream can
+    be hashed and sent only once
+    """
+    if hasattr(kwargs.get("data"), "read"):
+        kwargs["data"] = kwargs["data"].read()
+
+
+def _interaction_key(
+    method: str, url: str, params, headers, data, json_body
+) -> Tuple[str, str, str, str]:
+    split = urlsplit(url)
+    query = parse_qsl(split.query, keep_blank_values=True)
+    if params:
+        query += [(str(key), str(value)) for key, value in dict(params).items()]
+    url = urlunsplit(split._replace(query=urlencode(sorted(query))))
+    matched = sorted(
+        (name.lower(), str(value))
+        for name, value in (headers or {}).items()
+        if name.lower() in MATCHED_HEADERS
+    )
+    if json_body is not None:
+        data = json.dumps(json_body, sort_keys=True)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    body = hashlib.sha256(data).hexdigest()[:16] if data else ""
+    return (method.upper(), url, json.dumps(matched), body)
+
+
+class RecordingTransport(Transport):
+    """Send the requests through another transport and record them, with their
+    responses and durations, in a cassette (gzipped JSON lines), for a `ReplayTransport`.
+
+    The secret headers (Authorization, cookies) are not recorded, but the bodies and
+    the URLs are (pre-signed URLs included): keep the cassettes private.
+
+    :param path: Path of the cassette file, written by `save` (and `close`)
+    :type path: str
+    :param transport: Transport sending the requests. Default: a new `requests.Session`
+    :type transport: Transport
+    """
+
+    def __init__(self, path: str, transport: Transport = None):
+        self.path = path
+        self.transport = transport or requests.Session()
+        self.interactions: List[dict] = []
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        _read_body(kwargs)
+        start = time.perf_counter()
+        response = self.transport.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+        content = response.content
+        try:
+            body = {"text": content.decode("utf-8")}
+        except UnicodeDecodeError:
+            body = {"base64": base64.b64encode(content).decode("ascii")}
+        interaction = {
+            "key": _interaction_key(
+                method,
+                url,
+                kwargs.get("params"),
+                kwargs.get("headers"),
+                kwargs.get("data"),
+                kwargs.get("json"),
+            ),
+            "status": response.status_code,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in SECRET_HEADERS
+            },
+            "elapsed": round(elapsed, 6),
+            **body,
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+        return response
+
+    def save(self) -> None:
+        with self._lock:
+            interactions = list(self.interactions)
+        with gzip.open(self.path, "wt", encoding="utf-8") as cassette:
+            for interaction in interactions:
+                cassette.write(json.dumps(interaction, separators=(",", ":")))
+                cassette.write("\n")
+
+    def close(self) -> None:
+        self.save()
+        self.transport.close()
+
+
+class ReplayTransport(Transport):
+    """Serve the responses recorded in a cassette by a `RecordingTransport`, without
+    any network. Calls are matched on method, URL (query included), the headers
+    changing the response (like Range) and the body. The responses of a call repeated
+    (like a poll) are served in the recorded order, the last one again once exhausted.
+
+    :param path: Path of the cassette file
+    :type path: str
+    :param latency: Wait the recorded duration of each call (multiplied by this factor: 1 for the recorded timing). Default: 0 (no wait)
+    :type latency: float
+    """
+
+    def __init__(self, path: str, latency: float = 0):
+        self.path = path
+        self.latency = latency
+        self.calls = 0
+        self._interactions: Dict[Tuple, Deque[dict]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        with gzip.open(path, "rt", encoding="utf-8") as cassette:
+            for line in cassette:
+                interaction = json.loads(line)
+                self._interactions[tuple(interaction["key"])].append(interaction)
+
+    def _next(self, key: Tuple) -> Optional[dict]:
+        with self._lock:
+            self.calls += 1
+            responses = self._interactions.get(key)
+            if not responses:
+                return None
+            if len(responses) > 1:
+                return responses.popleft()
+            return responses[0]
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        _read_body(kwargs)
+        key = _interaction_key(
+            method,
+            url,
+            kwargs.get("params"),
+            kwargs.get("headers"),
+            kwargs.get("data"),
+            kwargs.get("json"),
+        )
+        interaction = self._next(key)
+        if interaction is None:
+            raise TransportException(f"No recorded response for {key[0]} {key[1]}")
+        if self.latency:
+            time.sleep(interaction["elapsed"] * self.latency)
+
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        if "base64" in interaction:
+            response._content = base64.b64decode(interaction["base64"])
+        else:
+            response._content = interaction["text"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = key[1]
+        response.reason = requests.status_codes._codes.get(response.status_code, ("",))[
+            0
+        ].upper()
+        return response
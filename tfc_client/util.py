@@ -1,3 +1,8 @@
+from functools import lru_cache
+import importlib
+import re
+from typing import Dict, Iterable, Mapping, Optional, Tuple, Union
+
 import inflection
 
 
@@ -12,6 +17,118 @@ class InflectionStr(str):
         # return super().__getattr__(name)
 
 
+@lru_cache(maxsize=1024)
+def dasherize(name: str) -> str:
+    return inflection.dasherize(name)
+
+
+def include_param(include: Union[str, Iterable[str], None]) -> Optional[str]:
+    """Return the "include" query parameter for relationship names given in any form
+    (like "current_run,organization" for "current-run,organization" or ["current-run", "organization"])
+    """
+    if not include:
+        return None
+    if isinstance(include, str):
+        include = include.split(",")
+    names = [inflection.underscore(name.strip()) for name in include if name.strip()]
+    return ",".join(names) or None
+
+
+def index_included(
+    included: Optional[Iterable[Mapping]],
+) -> Dict[Tuple[str, str], Mapping]:
+    """Index the "included" resources of an API response by (type, id)"""
+    return {(data["type"], data["id"]): data for data in included or ()}
+
+
+@lru_cache(maxsize=1024)
+def type_name(name: str) -> str:
+    """Return the API type of an object type given in any form
+    (like "ssh-keys" for "ssh-key", "ssh_key" or "ssh-keys")
+    """
+    return inflection.pluralize(inflection.dasherize(name))
+
+
+class TypeRegistry(object):
+    """Map the API types ("workspaces", "ssh-keys", ...) to the classes named after them
+    in a module (like TFCWorkspace and TFCSshKey, or WorkspaceModel and SshKeyModel).
+
+    The classes of the module are indexed once, at init. A type without a matching
+    class in the index is resolved by name once, then memoized (missing classes too).
+
+    :param module_name: Module containing the classes
+    :type module_name: str
+    :param prefix: Prefix of the class names (like "TFC")
+    :type prefix: str
+    :param suffix: Suffix of the class names (like "Model")
+    :type suffix: str
+    :param base: Only index the subclasses of this class
+    :type base: type
+    """
+
+    def __init__(
+        self, module_name: str, prefix: str = "", suffix: str = "", base: type = object
+    ):
+        self._module = importlib.import_module(module_name)
+        self._prefix = prefix
+        self._suffix = suffix
+        self._classes: Dict[str, Optional[type]] = dict()
+        for name, value in vars(self._module).items():
+            if (
+                name.startswith(prefix)
+                and name.endswith(suffix)
+                and isinstance(value, type)
+                and issubclass(value, base)
+                and value is not base
+            ):
+                self._classes[self._type_of(name)] = value
+
+    def _type_of(self, class_name: str) -> str:
+        name = class_name[len(self._prefix) : len(class_name) - len(self._suffix)]
+        return inflection.pluralize(inflection.dasherize(inflection.underscore(name)))
+
+    def get(self, object_type: str) -> Optional[type]:
+        try:
+            return self._classes[object_type]
+        except KeyError:
+            class_name = "{prefix}{name}{suffix}".format(
+                prefix=self._prefix,
+                name=InflectionStr(object_type).underscore.singularize.camelize,
+                suffix=self._suffix,
+            )
+            self._classes[object_type] = getattr(self._module, class_name, None)
+            return self._classes[object_type]
+
+
+ANSI_ESCAPE = re.compile(r"\x1b(\[.*?[@-~]|\].*?(\x07|\x1b\\))")
+
+
+class AnsiStripper(object):
+    """Remove the ANSI escape sequences of a text received in chunks.
+
+    An escape sequence cut between two chunks is held back until the next one.
+    """
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        text = self._pending + text
+        self._pending = ""
+        last_escape = text.rfind("\x1b")
+        if (
+            last_escape != -1
+            and "\n" not in text[last_escape:]
+            and not ANSI_ESCAPE.match(text, last_escape)
+        ):
+            text, self._pending = text[:last_escape], text[last_escape:]
+        return ANSI_ESCAPE.sub("", text)
+
+    def flush(self) -> str:
+        text, self._pending = self._pending, ""
+        return ANSI_ESCAPE.sub("", text)
+
+
 if __name__ == "__main__":
     test = InflectionStr("people")
     print(test.camelize.singularize)